@@ -0,0 +1,142 @@
+#!/usr/bin/env node
+// Runs a benchmark page in headless Chrome with software GL and prints its
+// JSON report. Talks to Chrome over --remote-debugging-pipe, so no extra
+// dependencies are needed.
+//
+//   ENABLE_BENCH=1 npm run build && ENABLE_BENCH=1 npm start
+//   npm run bench -- hero [--out report.json] [--base http://localhost:3000]
+//   npm run bench -- fusion seconds=600
+//   npm run bench -- track-index
+//   npm run bench -- pipeline 'seconds=600&circuits=karting,club'
+//
+// The pipeline suite runs at least 300 seconds per circuit, enough for each
+// to finish a lap; results are checked against known digests at 300 and 600.
+//
+// Exits non-zero if the page reports `failed: true` or does not finish.
+
+import { spawn } from 'node:child_process'
+import { existsSync, writeFileSync } from 'node:fs'
+
+const args = process.argv.slice(2)
+const option = (name, fallback) => {
+  const index = args.indexOf(`--${name}`)
+  return index === -1 ? fallback : args.splice(index, 2)[1]
+}
+
+const base = option('base', 'http://localhost:3000')
+const out = option('out')
+const timeout = Number(option('timeout', 300)) * 1000
+const suite = args[0] ?? 'hero'
+const query = args[1] ?? ''
+const url = `${base}/bench/${suite}${query ? `?${query}` : ''}`
+
+const chromeCandidates = [
+  process.env.CHROME_PATH,
+  '/usr/bin/google-chrome',
+  '/usr/bin/chromium',
+  '/usr/bin/chromium-browser',
+  '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
+].filter(Boolean)
+const chromePath = chromeCandidates.find((candidate) => existsSync(candidate))
+if (!chromePath) {
+  console.error('Chrome not found; set CHROME_PATH')
+  process.exit(2)
+}
+
+const chrome = spawn(
+  chromePath,
+  [
+    '--headless=new',
+    '--use-angle=swiftshader',
+    '--enable-unsafe-swiftshader',
+    '--enable-precise-memory-info',
+    '--remote-debugging-pipe',
+    '--no-first-run',
+    '--no-default-browser-check',
+    'about:blank',
+  ],
+  // fd 3 is Chrome's command input, fd 4 its output
+  { stdio: ['ignore', 'ignore', 'inherit', 'pipe', 'pipe'] }
+)
+
+const input = chrome.stdio[3]
+const output = chrome.stdio[4]
+const pending = new Map()
+const waiters = []
+let nextId = 1
+let buffered = ''
+
+output.on('data', (data) => {
+  buffered += data.toString()
+  let end
+  while ((end = buffered.indexOf('\0')) !== -1) {
+    const message = JSON.parse(buffered.slice(0, end))
+    buffered = buffered.slice(end + 1)
+    if (message.method) {
+      const index = waiters.findIndex((waiter) => waiter.method === message.method)
+      if (index !== -1) waiters.splice(index, 1)[0].resolve(message.params)
+      continue
+    }
+    const request = pending.get(message.id)
+    if (!request) continue
+    pending.delete(message.id)
+    if (message.error) request.reject(new Error(message.error.message))
+    else request.resolve(message.result)
+  }
+})
+
+function send(method, params = {}, sessionId) {
+  const id = nextId++
+  input.write(JSON.stringify({ id, method, params, sessionId }) + '\0')
+  return new Promise((resolve, reject) => pending.set(id, { resolve, reject }))
+}
+
+function waitFor(method) {
+  return new Promise((resolve) => waiters.push({ method, resolve }))
+}
+
+function finish(code) {
+  chrome.kill()
+  process.exit(code)
+}
+
+setTimeout(() => {
+  console.error(`Timed out after ${timeout / 1000}s waiting for ${url}`)
+  finish(1)
+}, timeout).unref()
+
+try {
+  const { targetInfos } = await send('Target.getTargets')
+  const page = targetInfos.find((target) => target.type === 'page')
+  const { sessionId } = await send('Target.attachToTarget', {
+    targetId: page.targetId,
+    flatten: true,
+  })
+  await send('Page.enable', {}, sessionId)
+  const loaded = waitFor('Page.loadEventFired')
+  await send('Page.navigate', { url }, sessionId)
+  await loaded
+
+  // The page publishes a promise on window.__benchResults once it starts
+  const { result, exceptionDetails } = await send(
+    'Runtime.evaluate',
+    {
+      expression: `new Promise((resolve) => {
+        const poll = () => (window.__benchResults ? resolve(window.__benchResults) : setTimeout(poll, 100))
+        poll()
+      })`,
+      awaitPromise: true,
+      returnByValue: true,
+    },
+    sessionId
+  )
+  if (exceptionDetails) throw new Error(exceptionDetails.exception?.description ?? exceptionDetails.text)
+
+  const json = JSON.stringify(result.value, null, 2)
+  if (out) writeFileSync(out, json + '\n')
+  else console.log(json)
+  finish(result.value?.failed ? 1 : 0)
+} catch (error) {
+  console.error(error.message)
+  finish(1)
+}
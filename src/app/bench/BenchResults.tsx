@@ -0,0 +1,35 @@
+'use client'
+
+import { useEffect, useState } from 'react'
+import { publishBenchResults } from '@/lib/bench/results'
+
+interface BenchResultsProps<T> {
+  title: string
+  // Runs the benchmark with the page's query parameters; keep it stable
+  run: (params: URLSearchParams) => Promise<T>
+}
+
+// Runs a benchmark once on mount, publishes the promise for scripts/bench.mjs
+// and shows the report when it settles
+export function BenchResults<T>({ title, run }: BenchResultsProps<T>) {
+  const [report, setReport] = useState<T>()
+  const [error, setError] = useState<string>()
+
+  useEffect(() => {
+    const params = new URLSearchParams(window.location.search)
+    publishBenchResults(run(params)).then(setReport, (reason) => setError(String(reason)))
+  }, [run])
+
+  return (
+    <>
+      <h1 className="text-white text-lg mb-4">{title}</h1>
+      {error && <p className="text-racing-red">{error}</p>}
+      {!report && !error && <p>Running…</p>}
+      {report && (
+        <pre id="bench-results" className="whitespace-pre-wrap">
+          {JSON.stringify(report, null, 2)}
+        </pre>
+      )}
+    </>
+  )
+}
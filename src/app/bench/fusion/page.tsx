@@ -0,0 +1,12 @@
+'use client'
+
+import { runFusionBenchmark } from '@/lib/telemetry/fusionBenchmark'
+import { BenchResults } from '../BenchResults'
+
+function run(params: URLSearchParams) {
+  return runFusionBenchmark({ seconds: Number(params.get('seconds')) || undefined })
+}
+
+export default function FusionBenchmarkPage() {
+  return <BenchResults title="Sensor fusion benchmark" run={run} />
+}
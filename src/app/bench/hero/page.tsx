@@ -0,0 +1,12 @@
+'use client'
+
+import { runHeroBenchmark } from '@/components/three/heroBenchmark'
+import { BenchResults } from '../BenchResults'
+
+function run(params: URLSearchParams) {
+  return runHeroBenchmark({ frames: Number(params.get('frames')) || undefined })
+}
+
+export default function HeroBenchmarkPage() {
+  return <BenchResults title="Hero render benchmark" run={run} />
+}
@@ -0,0 +1,22 @@
+import type { Metadata } from 'next'
+import { notFound } from 'next/navigation'
+
+export const metadata: Metadata = {
+  title: 'Benchmarks',
+  robots: { index: false, follow: false },
+}
+
+// Benchmark pages only exist in builds made with ENABLE_BENCH=1
+export default function BenchLayout({
+  children,
+}: {
+  children: React.ReactNode
+}) {
+  if (process.env.ENABLE_BENCH !== '1') notFound()
+
+  return (
+    <main className="min-h-screen bg-carbon-950 text-steel-400 font-mono text-sm p-8">
+      {children}
+    </main>
+  )
+}
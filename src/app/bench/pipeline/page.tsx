@@ -0,0 +1,16 @@
+'use client'
+
+import { runPipelineBenchmark } from '@/lib/telemetry/pipelineBenchmark'
+import { BenchResults } from '../BenchResults'
+
+// seconds below 300 are raised to it, so every circuit finishes a lap
+function run(params: URLSearchParams) {
+  return runPipelineBenchmark({
+    seconds: Number(params.get('seconds')) || undefined,
+    circuits: params.get('circuits')?.split(','),
+  })
+}
+
+export default function PipelineBenchmarkPage() {
+  return <BenchResults title="Pipeline stage benchmark" run={run} />
+}
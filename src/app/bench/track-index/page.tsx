@@ -0,0 +1,12 @@
+'use client'
+
+import { runTrackIndexBenchmark } from '@/lib/telemetry/trackIndexBenchmark'
+import { BenchResults } from '../BenchResults'
+
+function run(params: URLSearchParams) {
+  return runTrackIndexBenchmark({ seconds: Number(params.get('seconds')) || undefined })
+}
+
+export default function TrackIndexBenchmarkPage() {
+  return <BenchResults title="Track position lookup benchmark" run={run} />
+}
@@ -10,10 +10,11 @@ import { Tech } from '@/components/Tech'
 import { FinalCTA } from '@/components/FinalCTA'
 import { Navigation } from '@/components/Navigation'
 import { Footer } from '@/components/Footer'
+import { MotionPolicyProvider } from '@/components/MotionPolicy'
 
 export default function Home() {
   return (
-    <>
+    <MotionPolicyProvider>
       {/* Skip to main content link for accessibility */}
       <a 
         href="#main-content" 
@@ -53,6 +54,6 @@ export default function Home() {
       </main>
       
       <Footer />
-    </>
+    </MotionPolicyProvider>
   )
 }
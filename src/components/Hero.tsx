@@ -1,11 +1,14 @@
 'use client'
 
-import { useRef } from 'react'
-import { motion, useScroll, useTransform } from 'framer-motion'
-import { RacingLineCanvas } from './three/RacingLineCanvas'
+import { useRef, useState } from 'react'
+import { motion, useMotionValueEvent, useScroll, useTransform } from 'framer-motion'
+import { useMotionPolicy } from './MotionPolicy'
+import { DeferredRacingLineCanvas } from './three/DeferredRacingLineCanvas'
+import { RacingLinePoster } from './three/RacingLinePoster'
 
 export function Hero() {
   const containerRef = useRef<HTMLDivElement>(null)
+  const { staticMode } = useMotionPolicy()
   const { scrollYProgress } = useScroll({
     target: containerRef,
     offset: ['start start', 'end start'],
@@ -14,6 +17,12 @@ export function Hero() {
   const opacity = useTransform(scrollYProgress, [0, 0.5], [1, 0])
   const y = useTransform(scrollYProgress, [0, 0.5], [0, 100])
 
+  // Progress reaches 1 once the bottom of the hero has left the viewport
+  const [canvasActive, setCanvasActive] = useState(true)
+  useMotionValueEvent(scrollYProgress, 'change', (latest) => {
+    setCanvasActive(latest < 1)
+  })
+
   return (
     <section
       ref={containerRef}
@@ -26,9 +35,9 @@ export function Hero() {
       {/* Background Grid */}
       <div className="absolute inset-0 grid-overlay opacity-40" />
 
-      {/* 3D Racing Line Background */}
+      {/* 3D Racing Line Background, or its precomputed first frame when motion is off */}
       <div className="absolute inset-0">
-        <RacingLineCanvas />
+        {staticMode ? <RacingLinePoster /> : <DeferredRacingLineCanvas active={canvasActive} />}
       </div>
 
       {/* Gradient Overlays */}
@@ -0,0 +1,91 @@
+'use client'
+
+import { createContext, useContext, useEffect, useState } from 'react'
+import { MotionConfig } from 'framer-motion'
+
+export type StaticReason = 'reduced-motion' | 'low-battery' | 'save-data'
+
+export interface MotionPolicy {
+  // True when continuous animation should stop: no 3D hero, no infinite loops
+  staticMode: boolean
+  reason: StaticReason | null
+}
+
+// Battery Status API, not in the DOM typings
+interface BatteryManager extends EventTarget {
+  charging: boolean
+  level: number
+}
+
+const LOW_BATTERY_LEVEL = 0.2
+
+const MotionPolicyContext = createContext<MotionPolicy>({ staticMode: false, reason: null })
+
+export function useMotionPolicy() {
+  return useContext(MotionPolicyContext)
+}
+
+export function MotionPolicyProvider({ children }: { children: React.ReactNode }) {
+  const [reducedMotion, setReducedMotion] = useState(false)
+  const [lowBattery, setLowBattery] = useState(false)
+  const [saveData, setSaveData] = useState(false)
+
+  useEffect(() => {
+    const query = window.matchMedia('(prefers-reduced-motion: reduce)')
+    const handleChange = () => setReducedMotion(query.matches)
+    handleChange()
+    query.addEventListener('change', handleChange)
+    return () => query.removeEventListener('change', handleChange)
+  }, [])
+
+  useEffect(() => {
+    const connection = (navigator as Navigator & { connection?: { saveData?: boolean } }).connection
+    setSaveData(!!connection?.saveData)
+
+    const getBattery = (navigator as Navigator & { getBattery?: () => Promise<BatteryManager> })
+      .getBattery
+    if (!getBattery) return
+
+    let battery: BatteryManager | null = null
+    let cancelled = false
+    const handleChange = () => {
+      if (battery) setLowBattery(!battery.charging && battery.level <= LOW_BATTERY_LEVEL)
+    }
+    getBattery
+      .call(navigator)
+      .then((manager) => {
+        if (cancelled) return
+        battery = manager
+        handleChange()
+        manager.addEventListener('chargingchange', handleChange)
+        manager.addEventListener('levelchange', handleChange)
+      })
+      .catch(() => {})
+
+    return () => {
+      cancelled = true
+      battery?.removeEventListener('chargingchange', handleChange)
+      battery?.removeEventListener('levelchange', handleChange)
+    }
+  }, [])
+
+  const reason: StaticReason | null = reducedMotion
+    ? 'reduced-motion'
+    : lowBattery
+      ? 'low-battery'
+      : saveData
+        ? 'save-data'
+        : null
+  const staticMode = reason !== null
+
+  // Lets globals.css stop CSS keyframe loops (e.g. animate-pulse) as well
+  useEffect(() => {
+    document.documentElement.toggleAttribute('data-static-motion', staticMode)
+  }, [staticMode])
+
+  return (
+    <MotionPolicyContext.Provider value={{ staticMode, reason }}>
+      <MotionConfig reducedMotion={staticMode ? 'always' : 'user'}>{children}</MotionConfig>
+    </MotionPolicyContext.Provider>
+  )
+}
@@ -2,27 +2,30 @@
 
 import { useRef, useState, useEffect } from 'react'
 import { motion, useInView, AnimatePresence } from 'framer-motion'
+import { useMotionPolicy } from './MotionPolicy'
+import { coachPhrases } from '@/lib/telemetry/coach'
 
 const voiceCommands = [
-  { text: 'Brake earlier next lap.', type: 'instruction' },
-  { text: 'Smooth steering.', type: 'reminder' },
-  { text: 'Good exit.', type: 'confirmation' },
-  { text: 'Trail brake into apex.', type: 'instruction' },
-  { text: 'Hold this line.', type: 'confirmation' },
+  coachPhrases.brakeEarlier,
+  coachPhrases.smoothSteering,
+  coachPhrases.goodExit,
+  coachPhrases.trailBrake,
+  coachPhrases.holdLine,
 ]
 
 export function Voice() {
   const sectionRef = useRef<HTMLDivElement>(null)
   const isInView = useInView(sectionRef, { once: true, margin: '-100px' })
   const [currentIndex, setCurrentIndex] = useState(0)
+  const { staticMode } = useMotionPolicy()
 
   useEffect(() => {
-    if (!isInView) return
+    if (!isInView || staticMode) return
     const interval = setInterval(() => {
       setCurrentIndex((prev) => (prev + 1) % voiceCommands.length)
     }, 3000)
     return () => clearInterval(interval)
-  }, [isInView])
+  }, [isInView, staticMode])
 
   return (
     <section ref={sectionRef} className="relative py-32 lg:py-48 overflow-hidden">
@@ -140,15 +143,17 @@ export function Voice() {
             {[...Array(5)].map((_, i) => (
               <motion.div
                 key={i}
-                animate={{
-                  height: [8, 20 + i * 2, 8],
-                }}
-                transition={{
-                  duration: 0.8,
-                  repeat: Infinity,
-                  delay: i * 0.1,
-                  ease: 'easeInOut',
-                }}
+                animate={staticMode ? { height: 8 + i * 2 } : { height: [8, 20 + i * 2, 8] }}
+                transition={
+                  staticMode
+                    ? { duration: 0 }
+                    : {
+                        duration: 0.8,
+                        repeat: Infinity,
+                        delay: i * 0.1,
+                        ease: 'easeInOut',
+                      }
+                }
                 className="w-1 bg-racing-orange/60 rounded-full"
                 style={{ height: 8 }}
               />
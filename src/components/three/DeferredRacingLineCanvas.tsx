@@ -0,0 +1,38 @@
+'use client'
+
+import { useEffect, useState } from 'react'
+import { OffscreenRacingLineCanvas } from './OffscreenRacingLineCanvas'
+import { RacingLinePoster } from './RacingLinePoster'
+import type { RacingLineCanvasProps } from './RacingLineCanvas'
+
+// Shows the static poster through first paint, then starts the 3D scene once
+// the browser is idle and swaps it in after the WebGL context is created.
+// three.js is only ever fetched by the worker or the main-thread fallback chunk.
+export function DeferredRacingLineCanvas(props: RacingLineCanvasProps) {
+  const [idle, setIdle] = useState(false)
+  const [ready, setReady] = useState(false)
+
+  useEffect(() => {
+    if (typeof window.requestIdleCallback === 'function') {
+      const handle = window.requestIdleCallback(() => setIdle(true), { timeout: 2000 })
+      return () => window.cancelIdleCallback(handle)
+    }
+    const handle = window.setTimeout(() => setIdle(true), 200)
+    return () => window.clearTimeout(handle)
+  }, [])
+
+  return (
+    <div className="relative w-full h-full">
+      {!ready && (
+        <div className="absolute inset-0">
+          <RacingLinePoster />
+        </div>
+      )}
+      {idle && (
+        <div className="absolute inset-0">
+          <OffscreenRacingLineCanvas {...props} onReady={() => setReady(true)} />
+        </div>
+      )}
+    </div>
+  )
+}
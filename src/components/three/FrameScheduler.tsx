@@ -0,0 +1,66 @@
+'use client'
+
+import { useEffect, useRef } from 'react'
+import { addAfterEffect, addEffect, useThree } from '@react-three/fiber'
+import { usePageVisible } from './usePageVisible'
+
+interface FrameSchedulerProps {
+  active: boolean
+  maxFps: number
+  // Called with every display frame interval while active, rendered or not
+  onFrame?: (deltaMs: number) => void
+  // Called with the time each rendered frame took, from R3F's frame start to
+  // the end of its render
+  onRender?: (workMs: number) => void
+}
+
+// Drives a frameloop="demand" canvas: invalidates at most maxFps times per
+// second while active, and schedules nothing while suspended or hidden.
+export function FrameScheduler({ active, maxFps, onFrame, onRender }: FrameSchedulerProps) {
+  const invalidate = useThree((state) => state.invalidate)
+  const visible = usePageVisible()
+  const onFrameRef = useRef(onFrame)
+  onFrameRef.current = onFrame
+  const onRenderRef = useRef(onRender)
+  onRenderRef.current = onRender
+
+  useEffect(() => {
+    let start = NaN
+    const removeBefore = addEffect(() => {
+      start = performance.now()
+    })
+    const removeAfter = addAfterEffect(() => {
+      if (!Number.isNaN(start)) onRenderRef.current?.(performance.now() - start)
+      start = NaN
+    })
+    return () => {
+      removeBefore()
+      removeAfter()
+    }
+  }, [])
+
+  useEffect(() => {
+    if (!active || !visible) return
+
+    const interval = 1000 / maxFps
+    let last = performance.now()
+    let previous = last
+    let frame = requestAnimationFrame(function tick(now) {
+      onFrameRef.current?.(now - previous)
+      previous = now
+
+      const elapsed = now - last
+      if (elapsed >= interval) {
+        // Keep the remainder so a 30 fps cap on a 60 Hz display stays on every other vsync
+        last = now - (elapsed % interval)
+        invalidate()
+      }
+      frame = requestAnimationFrame(tick)
+    })
+    invalidate()
+
+    return () => cancelAnimationFrame(frame)
+  }, [active, visible, maxFps, invalidate])
+
+  return null
+}
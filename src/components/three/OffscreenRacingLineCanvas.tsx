@@ -0,0 +1,138 @@
+'use client'
+
+import { useEffect, useRef, useState } from 'react'
+import dynamic from 'next/dynamic'
+import type { TraceChunk } from '@/lib/telemetry/trace'
+import type { RacingLineCanvasProps } from './RacingLineCanvas'
+import type { HeroWorkerEvent, HeroWorkerMessage } from './heroScene.worker'
+import { qualityTiers } from './quality'
+import { usePageVisible } from './usePageVisible'
+
+const RacingLineCanvas = dynamic(
+  () => import('./RacingLineCanvas').then((mod) => mod.RacingLineCanvas),
+  { ssr: false }
+)
+
+export function supportsOffscreenCanvas() {
+  return (
+    typeof Worker !== 'undefined' &&
+    typeof OffscreenCanvas !== 'undefined' &&
+    typeof HTMLCanvasElement.prototype.transferControlToOffscreen === 'function'
+  )
+}
+
+// Renders the hero scene in a Web Worker through an OffscreenCanvas, keeping
+// three.js off the main thread entirely. Falls back to RacingLineCanvas when
+// the browser can't transfer the canvas or the worker fails to start.
+export function OffscreenRacingLineCanvas({
+  active = true,
+  maxFps = 30,
+  trace,
+  onQualityChange,
+  onReady,
+}: RacingLineCanvasProps) {
+  const containerRef = useRef<HTMLDivElement>(null)
+  const workerRef = useRef<Worker | null>(null)
+  const [supported] = useState(supportsOffscreenCanvas)
+  const [failed, setFailed] = useState(false)
+  const [tierName, setTierName] = useState<string>(qualityTiers[qualityTiers.length - 1].name)
+  const visible = usePageVisible()
+
+  const callbacksRef = useRef({ onQualityChange, onReady })
+  callbacksRef.current = { onQualityChange, onReady }
+
+  const fallback = !supported || failed
+
+  useEffect(() => {
+    const container = containerRef.current
+    if (!container || fallback) return
+
+    // A canvas can only be transferred once, so each mount gets a fresh element
+    const canvas = document.createElement('canvas')
+    canvas.className = 'block w-full h-full'
+    container.appendChild(canvas)
+
+    const worker = new Worker(new URL('./heroScene.worker.ts', import.meta.url))
+    const post = (message: HeroWorkerMessage, transfer: Transferable[] = []) => {
+      worker.postMessage(message, transfer)
+    }
+
+    worker.onmessage = (event: MessageEvent<HeroWorkerEvent>) => {
+      const message = event.data
+      if (message.type === 'ready') {
+        callbacksRef.current.onReady?.()
+      } else if (message.type === 'quality') {
+        setTierName(message.report.name)
+        callbacksRef.current.onQualityChange?.(message.report)
+      } else {
+        setFailed(true)
+      }
+    }
+    worker.onerror = () => setFailed(true)
+
+    const offscreen = canvas.transferControlToOffscreen()
+    post(
+      {
+        type: 'init',
+        canvas: offscreen,
+        width: canvas.clientWidth,
+        height: canvas.clientHeight,
+        pixelRatio: window.devicePixelRatio,
+        maxFps,
+      },
+      [offscreen]
+    )
+
+    const observer = new ResizeObserver(([entry]) => {
+      post({ type: 'resize', width: entry.contentRect.width, height: entry.contentRect.height })
+    })
+    observer.observe(canvas)
+    workerRef.current = worker
+
+    return () => {
+      observer.disconnect()
+      worker.terminate()
+      container.removeChild(canvas)
+      workerRef.current = null
+    }
+    // maxFps is forwarded by the effect below; only the initial value matters here
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [fallback])
+
+  useEffect(() => {
+    workerRef.current?.postMessage({
+      type: 'active',
+      active: active && visible,
+      maxFps,
+    } satisfies HeroWorkerMessage)
+  }, [active, visible, maxFps, fallback])
+
+  // The worker keeps its own copy of the trace: send what exists, then each new chunk
+  useEffect(() => {
+    const worker = workerRef.current
+    if (!worker || !trace) return
+    const post = (chunk: TraceChunk | null) => {
+      worker.postMessage({ type: 'trace', chunk } satisfies HeroWorkerMessage)
+    }
+    post(trace.snapshot())
+    const unsubscribe = trace.subscribe(post)
+    return () => {
+      unsubscribe()
+      post(null)
+    }
+  }, [trace, fallback])
+
+  if (fallback) {
+    return (
+      <RacingLineCanvas
+        active={active}
+        maxFps={maxFps}
+        trace={trace}
+        onQualityChange={onQualityChange}
+        onReady={onReady}
+      />
+    )
+  }
+
+  return <div ref={containerRef} className="w-full h-full opacity-60" data-quality-tier={tierName} />
+}
@@ -1,132 +1,140 @@
 'use client'
 
-import { useRef } from 'react'
+import { useCallback, useEffect, useMemo, useRef, useState } from 'react'
 import { Canvas, useFrame } from '@react-three/fiber'
-import { Line } from '@react-three/drei'
-import * as THREE from 'three'
+import { TelemetryTraceBuffer } from '@/lib/telemetry/trace'
+import { FrameScheduler } from './FrameScheduler'
+import { animateRacingLine, MAX_TRACE_POINTS } from './heroScene'
+import { QualityGovernor, QualityReport, qualityTiers } from './quality'
+import { createRacingLine } from './racingLine'
+import { HERO_CAMERA } from './racingLinePath'
+import { createTelemetryDots } from './telemetryDots'
+import { createTelemetryGrid } from './telemetryGrid'
+import { createTelemetryTrace, TRACE_REBUILD_INTERVAL } from './telemetryTrace'
 
-function RacingLine() {
-  const lineRef = useRef<THREE.Group>(null)
+function RacingLine({ segments }: { segments: number }) {
+  // One shared geometry for all three layers, rebuilt only when the quality tier changes
+  const racingLine = useMemo(() => createRacingLine(segments), [segments])
 
-  // Generate a smooth racing line curve
-  const points: [number, number, number][] = []
-  const segments = 200
+  useEffect(() => () => racingLine.dispose(), [racingLine])
 
-  for (let i = 0; i <= segments; i++) {
-    const t = (i / segments) * Math.PI * 2
-    // Create a flowing racing line shape
-    const x = Math.sin(t) * 4 + Math.sin(t * 2) * 1.5
-    const y = Math.cos(t * 3) * 0.3
-    const z = Math.cos(t) * 3 + Math.cos(t * 2) * 1
-    points.push([x, y, z])
-  }
+  useFrame((state) => {
+    animateRacingLine(racingLine.group, state.clock.elapsedTime)
+  })
+
+  return <primitive object={racingLine.group} />
+}
+
+function TelemetryTrace({ trace, budget }: { trace: TelemetryTraceBuffer; budget: number }) {
+  const [traceLine] = useState(() => createTelemetryTrace(MAX_TRACE_POINTS))
+  const builtAt = useRef(-Infinity)
+
+  useEffect(() => () => traceLine.dispose(), [traceLine])
+  useEffect(() => {
+    builtAt.current = -Infinity
+  }, [trace, budget])
 
   useFrame((state) => {
-    if (lineRef.current) {
-      lineRef.current.rotation.y = state.clock.elapsedTime * 0.03
-      lineRef.current.rotation.x = Math.sin(state.clock.elapsedTime * 0.02) * 0.1
+    const elapsed = state.clock.elapsedTime
+    // Streamed samples are folded in at a fixed rate rather than per append
+    if (elapsed - builtAt.current >= TRACE_REBUILD_INTERVAL) {
+      traceLine.update(trace, budget)
+      builtAt.current = elapsed
     }
+    animateRacingLine(traceLine.line, elapsed)
   })
 
-  return (
-    <group ref={lineRef} position={[0, 0, 0]}>
-      {/* Main racing line */}
-      <Line
-        points={points}
-        color="#EA580C"
-        lineWidth={2}
-        transparent
-        opacity={0.6}
-      />
-      {/* Ghost line for depth */}
-      <Line
-        points={points.map(([x, y, z]) => [x * 1.02, y * 1.02, z * 1.02] as [number, number, number])}
-        color="#EA580C"
-        lineWidth={1}
-        transparent
-        opacity={0.2}
-      />
-      {/* Inner reference line */}
-      <Line
-        points={points.map(([x, y, z]) => [x * 0.95, y, z * 0.95] as [number, number, number])}
-        color="#4B5563"
-        lineWidth={0.5}
-        transparent
-        opacity={0.3}
-      />
-    </group>
-  )
+  return <primitive object={traceLine.line} />
 }
 
 function TelemetryGrid() {
-  const gridRef = useRef<THREE.GridHelper>(null)
+  const [grid] = useState(createTelemetryGrid)
+
+  useEffect(() => () => grid.dispose(), [grid])
 
   useFrame((state) => {
-    if (gridRef.current) {
-      gridRef.current.position.z = (state.clock.elapsedTime * 0.5) % 2
-    }
+    grid.time.value = state.clock.elapsedTime
   })
 
-  return (
-    <gridHelper
-      ref={gridRef}
-      args={[40, 40, '#1C1F23', '#151719']}
-      position={[0, -3, 0]}
-      rotation={[0, 0, 0]}
-    />
-  )
+  return <primitive object={grid.mesh} />
 }
 
-function TelemetryDots() {
-  const dotsRef = useRef<THREE.Points>(null)
+function TelemetryDots({ count }: { count: number }) {
+  // Seeded, shared point buffer; tier changes only move the draw range
+  const [dots] = useState(() => createTelemetryDots(count))
 
-  // Create random dot positions
-  const positions = new Float32Array(100 * 3)
-  for (let i = 0; i < 100; i++) {
-    positions[i * 3] = (Math.random() - 0.5) * 20
-    positions[i * 3 + 1] = (Math.random() - 0.5) * 10
-    positions[i * 3 + 2] = (Math.random() - 0.5) * 20
-  }
+  useEffect(() => dots.setCount(count), [dots, count])
+  useEffect(() => () => dots.dispose(), [dots])
 
   useFrame((state) => {
-    if (dotsRef.current) {
-      dotsRef.current.rotation.y = state.clock.elapsedTime * 0.01
-    }
+    dots.time.value = state.clock.elapsedTime
   })
 
-  return (
-    <points ref={dotsRef}>
-      <bufferGeometry>
-        <bufferAttribute
-          attach="attributes-position"
-          count={100}
-          array={positions}
-          itemSize={3}
-        />
-      </bufferGeometry>
-      <pointsMaterial
-        color="#06B6D4"
-        size={0.03}
-        transparent
-        opacity={0.4}
-        sizeAttenuation
-      />
-    </points>
-  )
+  return <primitive object={dots.points} />
+}
+
+export interface RacingLineCanvasProps {
+  // False suspends rendering entirely, e.g. once the hero has scrolled away
+  active?: boolean
+  maxFps?: number
+  // Recorded lap to draw instead of the parametric racing line; may keep growing
+  trace?: TelemetryTraceBuffer
+  // Called whenever the adaptive quality governor changes tier
+  onQualityChange?: (report: QualityReport) => void
+  // Called once the WebGL context exists and the first frame is scheduled
+  onReady?: () => void
 }
 
-export function RacingLineCanvas() {
+export function RacingLineCanvas({
+  active = true,
+  maxFps = 30,
+  trace,
+  onQualityChange,
+  onReady,
+}: RacingLineCanvasProps) {
+  const [governor] = useState(() => new QualityGovernor())
+  const [tierIndex, setTierIndex] = useState(governor.tier)
+  const tier = qualityTiers[tierIndex]
+
+  const onQualityChangeRef = useRef(onQualityChange)
+  onQualityChangeRef.current = onQualityChange
+
+  const handleFrame = useCallback(
+    (deltaMs: number) => {
+      if (governor.sample(deltaMs)) {
+        setTierIndex(governor.tier)
+        onQualityChangeRef.current?.(governor.report)
+      }
+    },
+    [governor]
+  )
+  const handleRender = useCallback((workMs: number) => governor.sampleRender(workMs), [governor])
+
   return (
-    <div className="w-full h-full opacity-60">
+    <div className="w-full h-full opacity-60" data-quality-tier={tier.name}>
       <Canvas
-        camera={{ position: [0, 2, 12], fov: 45 }}
-        dpr={[1, 2]}
-        gl={{ antialias: true, alpha: true }}
+        // antialias is fixed at context creation, so changing it remounts the canvas
+        key={tier.antialias ? 'antialias' : 'aliased'}
+        camera={HERO_CAMERA}
+        dpr={[1, tier.dpr]}
+        gl={{ antialias: tier.antialias, alpha: true }}
+        frameloop="demand"
+        onCreated={onReady}
       >
+        <FrameScheduler
+          active={active}
+          maxFps={maxFps}
+          onFrame={handleFrame}
+          onRender={handleRender}
+        />
         <ambientLight intensity={0.5} />
-        <RacingLine />
+        {trace ? (
+          <TelemetryTrace trace={trace} budget={tier.tracePoints} />
+        ) : (
+          <RacingLine segments={tier.segments} />
+        )}
         <TelemetryGrid />
-        <TelemetryDots />
+        <TelemetryDots count={tier.dots} />
       </Canvas>
     </div>
   )
@@ -0,0 +1,32 @@
+import { racingLineLayers, racingLineSvgPath } from './racingLinePath'
+
+const layerPaths = racingLineLayers.map((layer) => racingLineSvgPath(layer.scale))
+
+// Static stand-in for RacingLineCanvas while the three.js chunk loads. The
+// viewBox is only as tall as the camera's vertical field of view and the
+// overflow is left visible, which crops horizontally like the 3D camera does
+// at any aspect ratio.
+export function RacingLinePoster() {
+  return (
+    <div className="w-full h-full opacity-60" aria-hidden="true">
+      <svg
+        viewBox="-1 -50 2 100"
+        preserveAspectRatio="xMidYMid meet"
+        className="w-full h-full overflow-visible"
+        fill="none"
+      >
+        {racingLineLayers.map((layer, index) => (
+          <path
+            key={index}
+            d={layerPaths[index]}
+            stroke={layer.color}
+            strokeWidth={layer.lineWidth}
+            strokeOpacity={layer.opacity}
+            strokeLinejoin="round"
+            vectorEffect="non-scaling-stroke"
+          />
+        ))}
+      </svg>
+    </div>
+  )
+}
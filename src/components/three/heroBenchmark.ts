@@ -0,0 +1,152 @@
+import * as THREE from 'three'
+import { BenchEnvironment, benchEnvironment } from '@/lib/bench/results'
+import { SampleSummary, summarize, usedHeapBytes } from '@/lib/bench/stats'
+import { HeroScene } from './heroScene'
+import { qualityTiers, SceneQuality } from './quality'
+import { HERO_CAMERA } from './racingLinePath'
+
+export interface HeroBenchmarkConfig extends SceneQuality {
+  name: string
+}
+
+export const heroBenchmarkConfigs: HeroBenchmarkConfig[] = [
+  ...qualityTiers.map((tier) => ({ ...tier })),
+  { ...qualityTiers[2], name: 'high-dpr1', dpr: 1 },
+  { ...qualityTiers[2], name: 'segments-1000', segments: 1000 },
+]
+
+export interface HeroBenchmarkResult {
+  config: HeroBenchmarkConfig
+  // Time to update the scene and submit the frame
+  cpuMs: SampleSummary
+  // Same, plus gl.finish(); with software GL this is the full render cost
+  frameMs: SampleSummary
+  drawCalls: number
+  triangles: number
+  lines: number
+  points: number
+  vertices: number
+  // JS heap growth across the measured frames, when the browser exposes it
+  heapDeltaBytes: number | null
+}
+
+export interface HeroBenchmarkReport {
+  environment: BenchEnvironment
+  glRenderer: string
+  width: number
+  height: number
+  frames: number
+  results: HeroBenchmarkResult[]
+}
+
+interface HeroBenchmarkOptions {
+  configs?: HeroBenchmarkConfig[]
+  frames?: number
+  warmupFrames?: number
+  width?: number
+  height?: number
+}
+
+// Vertices submitted per frame, counting instanced line segments and draw ranges
+function countVertices(scene: THREE.Scene) {
+  let vertices = 0
+  scene.traverseVisible((object) => {
+    const geometry = (object as THREE.Mesh).geometry as THREE.BufferGeometry | undefined
+    const position = geometry?.getAttribute('position')
+    if (!geometry || !position) return
+    if (geometry instanceof THREE.InstancedBufferGeometry) {
+      // Fat lines leave instanceCount at Infinity and draw one instance per segment
+      const instances = Number.isFinite(geometry.instanceCount)
+        ? geometry.instanceCount
+        : geometry.getAttribute('instanceStart')?.count ?? 1
+      vertices += position.count * instances
+    } else {
+      vertices += Math.min(position.count, geometry.drawRange.count)
+    }
+  })
+  return vertices
+}
+
+function glRendererName(gl: WebGLRenderingContext | WebGL2RenderingContext) {
+  const info = gl.getExtension('WEBGL_debug_renderer_info')
+  return String(gl.getParameter(info ? info.UNMASKED_RENDERER_WEBGL : gl.RENDERER))
+}
+
+// Renders the hero scene off-DOM for a fixed number of frames per config at a
+// fixed timestep, so runs are comparable between builds and machines.
+export async function runHeroBenchmark({
+  configs = heroBenchmarkConfigs,
+  frames = 300,
+  warmupFrames = 30,
+  width = 1280,
+  height = 720,
+}: HeroBenchmarkOptions = {}): Promise<HeroBenchmarkReport> {
+  const results: HeroBenchmarkResult[] = []
+  const cpu = new Float64Array(frames)
+  const total = new Float64Array(frames)
+  let rendererName = ''
+
+  for (const config of configs) {
+    // antialias is fixed per context, so every config gets a fresh canvas
+    const canvas = document.createElement('canvas')
+    const renderer = new THREE.WebGLRenderer({ canvas, antialias: config.antialias, alpha: true })
+    renderer.toneMapping = THREE.ACESFilmicToneMapping
+    renderer.setPixelRatio(config.dpr)
+    renderer.setSize(width, height, false)
+    const gl = renderer.getContext()
+    rendererName ||= glRendererName(gl)
+
+    const camera = new THREE.PerspectiveCamera(HERO_CAMERA.fov, width / height, 0.1, 1000)
+    camera.position.set(...HERO_CAMERA.position)
+    camera.lookAt(0, 0, 0)
+    const heroScene = new HeroScene(config)
+
+    // Compile programs and upload buffers before measuring
+    for (let frame = 0; frame < warmupFrames; frame++) {
+      heroScene.update(frame / 60)
+      renderer.render(heroScene.scene, camera)
+    }
+    gl.finish()
+    // Let the event loop breathe between configs so GC can run outside the window
+    await new Promise((resolve) => setTimeout(resolve, 50))
+
+    const heapBefore = usedHeapBytes()
+    for (let frame = 0; frame < frames; frame++) {
+      const start = performance.now()
+      heroScene.update((warmupFrames + frame) / 60)
+      renderer.render(heroScene.scene, camera)
+      const submitted = performance.now()
+      gl.finish()
+      cpu[frame] = submitted - start
+      total[frame] = performance.now() - start
+    }
+    const heapAfter = usedHeapBytes()
+
+    const { calls, triangles, lines, points } = renderer.info.render
+    results.push({
+      config,
+      cpuMs: summarize(cpu, frames),
+      frameMs: summarize(total, frames),
+      drawCalls: calls,
+      triangles,
+      lines,
+      points,
+      vertices: countVertices(heroScene.scene),
+      heapDeltaBytes:
+        heapBefore !== undefined && heapAfter !== undefined ? heapAfter - heapBefore : null,
+    })
+
+    heroScene.dispose()
+    renderer.dispose()
+    renderer.forceContextLoss()
+  }
+
+  return {
+    environment: benchEnvironment(),
+    glRenderer: rendererName,
+    width,
+    height,
+    frames,
+    results,
+  }
+}
@@ -0,0 +1,85 @@
+import * as THREE from 'three'
+import { TelemetryTraceBuffer } from '@/lib/telemetry/trace'
+import { qualityTiers, SceneQuality } from './quality'
+import { createRacingLine, RacingLineObject } from './racingLine'
+import { createTelemetryDots, TelemetryDotsObject } from './telemetryDots'
+import { createTelemetryGrid } from './telemetryGrid'
+import { createTelemetryTrace, TelemetryTraceObject, TRACE_REBUILD_INTERVAL } from './telemetryTrace'
+
+export const MAX_TRACE_POINTS = Math.max(...qualityTiers.map((tier) => tier.tracePoints))
+
+// Scene builders and per-frame animation shared by the React Three Fiber
+// canvas and the OffscreenCanvas worker, so both paths draw the same hero.
+
+export function animateRacingLine(object: THREE.Object3D, elapsed: number) {
+  object.rotation.y = elapsed * 0.03
+  object.rotation.x = Math.sin(elapsed * 0.02) * 0.1
+}
+
+// Imperative version of the hero scene for renderers without React
+export class HeroScene {
+  readonly scene = new THREE.Scene()
+  private racingLine: RacingLineObject | null = null
+  private grid = createTelemetryGrid()
+  private dots: TelemetryDotsObject
+  private tier: SceneQuality | null = null
+  private trace: TelemetryTraceBuffer | null = null
+  private traceLine: TelemetryTraceObject | null = null
+  private traceBuiltAt = -Infinity
+
+  constructor(tier: SceneQuality) {
+    this.dots = createTelemetryDots(tier.dots)
+    this.scene.add(new THREE.AmbientLight(0xffffff, 0.5))
+    this.scene.add(this.grid.mesh)
+    this.scene.add(this.dots.points)
+    this.setTier(tier)
+  }
+
+  setTier(tier: SceneQuality) {
+    if (this.tier?.segments !== tier.segments) {
+      if (this.racingLine) {
+        this.scene.remove(this.racingLine.group)
+        this.racingLine.dispose()
+      }
+      this.racingLine = createRacingLine(tier.segments)
+      this.racingLine.group.visible = !this.trace
+      this.scene.add(this.racingLine.group)
+    }
+    this.dots.setCount(tier.dots)
+    this.tier = tier
+    this.traceBuiltAt = -Infinity
+  }
+
+  // Replaces the parametric racing line with a recorded trace, or restores it
+  setTrace(trace: TelemetryTraceBuffer | null) {
+    this.trace = trace
+    if (trace && !this.traceLine) {
+      this.traceLine = createTelemetryTrace(MAX_TRACE_POINTS)
+      this.scene.add(this.traceLine.line)
+    }
+    if (this.traceLine) this.traceLine.line.visible = !!trace
+    if (this.racingLine) this.racingLine.group.visible = !trace
+    this.traceBuiltAt = -Infinity
+  }
+
+  update(elapsed: number) {
+    if (this.trace && this.traceLine && this.tier) {
+      if (elapsed - this.traceBuiltAt >= TRACE_REBUILD_INTERVAL) {
+        this.traceLine.update(this.trace, this.tier.tracePoints)
+        this.traceBuiltAt = elapsed
+      }
+      animateRacingLine(this.traceLine.line, elapsed)
+    } else if (this.racingLine) {
+      animateRacingLine(this.racingLine.group, elapsed)
+    }
+    this.grid.time.value = elapsed
+    this.dots.time.value = elapsed
+  }
+
+  dispose() {
+    this.racingLine?.dispose()
+    this.traceLine?.dispose()
+    this.dots.dispose()
+    this.grid.dispose()
+  }
+}
@@ -0,0 +1,151 @@
+import * as THREE from 'three'
+import { TelemetryTraceBuffer, TraceChunk } from '@/lib/telemetry/trace'
+import { HeroScene } from './heroScene'
+import { QualityGovernor, QualityReport, qualityTiers } from './quality'
+import { HERO_CAMERA } from './racingLinePath'
+
+export type HeroWorkerMessage =
+  | {
+      type: 'init'
+      canvas: OffscreenCanvas
+      width: number
+      height: number
+      pixelRatio: number
+      maxFps: number
+    }
+  | { type: 'resize'; width: number; height: number }
+  | { type: 'active'; active: boolean; maxFps: number }
+  // Appends samples to the worker's copy of the trace; null drops the trace
+  | { type: 'trace'; chunk: TraceChunk | null }
+
+export type HeroWorkerEvent =
+  | { type: 'ready' }
+  | { type: 'quality'; report: QualityReport }
+  | { type: 'error'; message: string }
+
+// Worker-side renderer for the hero. Mirrors RacingLineCanvas: capped-rate
+// rendering, suspended while inactive, and the same quality governor, except
+// that antialias stays as chosen when the context was created.
+
+let renderer: THREE.WebGLRenderer | null = null
+let camera: THREE.PerspectiveCamera | null = null
+let heroScene: HeroScene | null = null
+let trace: TelemetryTraceBuffer | null = null
+const governor = new QualityGovernor()
+const clock = new THREE.Clock()
+
+let pixelRatio = 1
+let interval = 1000 / 30
+let active = false
+let frame = 0
+let last = 0
+let previous = 0
+
+const requestFrame: (callback: FrameRequestCallback) => number =
+  typeof self.requestAnimationFrame === 'function'
+    ? (callback) => self.requestAnimationFrame(callback)
+    : (callback) => self.setTimeout(() => callback(performance.now()), 1000 / 60)
+const cancelFrame: (handle: number) => void =
+  typeof self.cancelAnimationFrame === 'function'
+    ? (handle) => self.cancelAnimationFrame(handle)
+    : (handle) => self.clearTimeout(handle)
+
+function post(event: HeroWorkerEvent) {
+  self.postMessage(event)
+}
+
+function applyTier() {
+  const tier = qualityTiers[governor.tier]
+  heroScene?.setTier(tier)
+  renderer?.setPixelRatio(Math.min(pixelRatio, tier.dpr))
+}
+
+function tick(now: number) {
+  if (governor.sample(now - previous)) {
+    applyTier()
+    post({ type: 'quality', report: governor.report })
+  }
+  previous = now
+
+  const elapsed = now - last
+  if (elapsed >= interval && renderer && camera && heroScene) {
+    last = now - (elapsed % interval)
+    const start = performance.now()
+    heroScene.update(clock.getElapsedTime())
+    renderer.render(heroScene.scene, camera)
+    governor.sampleRender(performance.now() - start)
+  }
+  frame = requestFrame(tick)
+}
+
+function setActive(next: boolean) {
+  if (next === active) return
+  active = next
+  if (active) {
+    last = previous = performance.now()
+    frame = requestFrame(tick)
+  } else {
+    cancelFrame(frame)
+  }
+}
+
+function init(message: Extract<HeroWorkerMessage, { type: 'init' }>) {
+  const tier = qualityTiers[governor.tier]
+  pixelRatio = message.pixelRatio
+  interval = 1000 / message.maxFps
+
+  renderer = new THREE.WebGLRenderer({
+    canvas: message.canvas,
+    antialias: tier.antialias,
+    alpha: true,
+  })
+  // Match the React Three Fiber defaults the main-thread canvas renders with
+  renderer.toneMapping = THREE.ACESFilmicToneMapping
+  renderer.setPixelRatio(Math.min(pixelRatio, tier.dpr))
+  renderer.setSize(message.width, message.height, false)
+
+  camera = new THREE.PerspectiveCamera(HERO_CAMERA.fov, message.width / message.height, 0.1, 1000)
+  camera.position.set(...HERO_CAMERA.position)
+  camera.lookAt(0, 0, 0)
+
+  heroScene = new HeroScene(tier)
+  heroScene.setTrace(trace)
+  renderer.render(heroScene.scene, camera)
+  post({ type: 'ready' })
+}
+
+self.addEventListener('message', (event: MessageEvent<HeroWorkerMessage>) => {
+  const message = event.data
+  try {
+    switch (message.type) {
+      case 'init':
+        init(message)
+        break
+      case 'resize':
+        if (!renderer || !camera || message.width === 0 || message.height === 0) break
+        renderer.setSize(message.width, message.height, false)
+        camera.aspect = message.width / message.height
+        camera.updateProjectionMatrix()
+        break
+      case 'active':
+        interval = 1000 / message.maxFps
+        setActive(message.active)
+        break
+      case 'trace':
+        if (message.chunk) {
+          if (!trace) {
+            trace = new TelemetryTraceBuffer()
+            heroScene?.setTrace(trace)
+          }
+          trace.append(message.chunk)
+        } else {
+          trace = null
+          heroScene?.setTrace(null)
+        }
+        break
+    }
+  } catch (error) {
+    setActive(false)
+    post({ type: 'error', message: error instanceof Error ? error.message : String(error) })
+  }
+})
@@ -0,0 +1,143 @@
+export const FRAME_BUDGET_MS = 1000 / 60
+
+// Ordered from cheapest to most expensive. antialias only changes on the top
+// tier because toggling it means recreating the WebGL context.
+export const qualityTiers = [
+  { name: 'low', dpr: 1, antialias: false, dots: 2000, segments: 64, tracePoints: 1024 },
+  { name: 'medium', dpr: 1.5, antialias: false, dots: 6000, segments: 120, tracePoints: 2048 },
+  { name: 'high', dpr: 2, antialias: true, dots: 16000, segments: 200, tracePoints: 4096 },
+] as const
+
+export type QualityTier = (typeof qualityTiers)[number]
+
+// What the scene builders read from a tier; benchmarks pass their own values
+export interface SceneQuality {
+  dpr: number
+  antialias: boolean
+  dots: number
+  segments: number
+  tracePoints: number
+}
+
+export interface QualityReport {
+  tier: number
+  name: QualityTier['name']
+  // Mean frame interval over the last sample window, in ms
+  frameTime: number
+  // Shortest interval in that window: the display's own cadence, e.g. ~33 ms
+  // where the browser throttles rAF to 30 Hz to save power
+  displayInterval: number
+  // Mean time spent rendering a frame, in ms; NaN when not measured
+  renderTime: number
+  frameBudget: number
+}
+
+const SAMPLE_WINDOW = 60
+const SETTLE_FRAMES = 30
+const MAX_FRAME_MS = 250
+const DOWNGRADE_RATIO = 1.25
+const UPGRADE_RATIO = 1.1
+const MAX_UPGRADE_PATIENCE = 48
+
+// Samples frame intervals and render times and steps the hero scene between
+// quality tiers. Intervals are judged against the display's cadence rather
+// than a fixed 60 Hz, so a browser throttling rAF to 30 Hz doesn't read as an
+// overloaded device; render time is judged against the frame budget. Each
+// downgrade doubles the number of good windows needed before trying the next
+// tier up again, so a device on the edge of a tier doesn't oscillate.
+export class QualityGovernor {
+  tier: number
+  frameTime = FRAME_BUDGET_MS
+  displayInterval = FRAME_BUDGET_MS
+  renderTime = NaN
+
+  private samples = new Float32Array(SAMPLE_WINDOW)
+  private count = 0
+  private renderTotal = 0
+  private renders = 0
+  private settle = SETTLE_FRAMES
+  private goodWindows = 0
+  private upgradePatience = 3
+
+  constructor(initialTier: number = qualityTiers.length - 1) {
+    this.tier = initialTier
+  }
+
+  get report(): QualityReport {
+    return {
+      tier: this.tier,
+      name: qualityTiers[this.tier].name,
+      frameTime: this.frameTime,
+      displayInterval: this.displayInterval,
+      renderTime: this.renderTime,
+      frameBudget: FRAME_BUDGET_MS,
+    }
+  }
+
+  // Feed the time spent rendering one frame; frames that weren't rendered
+  // are simply not reported
+  sampleRender(workMs: number) {
+    if (this.settle > 0 || workMs > MAX_FRAME_MS) return
+    this.renderTotal += workMs
+    this.renders++
+  }
+
+  // Feed one display frame interval; returns true when the tier changed
+  sample(deltaMs: number) {
+    // Long gaps are tab switches or debugger pauses, not render cost
+    if (deltaMs > MAX_FRAME_MS) return false
+    if (this.settle > 0) {
+      this.settle--
+      return false
+    }
+
+    this.samples[this.count++] = deltaMs
+    if (this.count < SAMPLE_WINDOW) return false
+    this.count = 0
+
+    let total = 0
+    let shortest = Infinity
+    for (let i = 0; i < SAMPLE_WINDOW; i++) {
+      total += this.samples[i]
+      shortest = Math.min(shortest, this.samples[i])
+    }
+    this.frameTime = total / SAMPLE_WINDOW
+    // Faster displays still get the 60 Hz budget
+    this.displayInterval = Math.max(FRAME_BUDGET_MS, shortest)
+    this.renderTime = this.renders > 0 ? this.renderTotal / this.renders : NaN
+    this.renderTotal = 0
+    this.renders = 0
+
+    // How far over budget the window was: frames arriving later than the
+    // display cadence, or rendering taking longer than a 60 Hz frame
+    let load = this.frameTime / this.displayInterval
+    if (this.renderTime > 0) load = Math.max(load, this.renderTime / FRAME_BUDGET_MS)
+
+    if (load > DOWNGRADE_RATIO) {
+      this.goodWindows = 0
+      if (this.tier === 0) return false
+      this.upgradePatience = Math.min(this.upgradePatience * 2, MAX_UPGRADE_PATIENCE)
+      return this.setTier(this.tier - 1)
+    }
+
+    if (load < UPGRADE_RATIO) {
+      this.goodWindows++
+      if (this.goodWindows >= this.upgradePatience && this.tier < qualityTiers.length - 1) {
+        return this.setTier(this.tier + 1)
+      }
+    } else {
+      this.goodWindows = 0
+    }
+    return false
+  }
+
+  private setTier(tier: number) {
+    this.tier = tier
+    this.goodWindows = 0
+    this.count = 0
+    this.renderTotal = 0
+    this.renders = 0
+    this.settle = SETTLE_FRAMES
+    return true
+  }
+}
@@ -0,0 +1,46 @@
+import * as THREE from 'three'
+import { Line2 } from 'three/examples/jsm/lines/Line2.js'
+import { LineGeometry } from 'three/examples/jsm/lines/LineGeometry.js'
+import { LineMaterial } from 'three/examples/jsm/lines/LineMaterial.js'
+import { RACING_LINE_SEGMENTS, racingLineLayers, racingLinePositions } from './racingLinePath'
+
+export function createRacingLineGeometry(segments: number = RACING_LINE_SEGMENTS) {
+  const geometry = new LineGeometry()
+  geometry.setPositions(racingLinePositions(segments))
+  return geometry
+}
+
+export interface RacingLineObject {
+  group: THREE.Group
+  dispose: () => void
+}
+
+// Builds the three racing line layers around a single shared geometry, so the
+// vertex buffer is uploaded once no matter how many layers reference it.
+export function createRacingLine(segments: number = RACING_LINE_SEGMENTS): RacingLineObject {
+  const group = new THREE.Group()
+  const geometry = createRacingLineGeometry(segments)
+  const materials = racingLineLayers.map(
+    (layer) =>
+      new LineMaterial({
+        color: layer.color,
+        linewidth: layer.lineWidth,
+        transparent: true,
+        opacity: layer.opacity,
+      })
+  )
+
+  racingLineLayers.forEach((layer, index) => {
+    const line = new Line2(geometry, materials[index])
+    line.scale.set(layer.scale[0], layer.scale[1], layer.scale[2])
+    group.add(line)
+  })
+
+  return {
+    group,
+    dispose: () => {
+      geometry.dispose()
+      materials.forEach((material) => material.dispose())
+    },
+  }
+}
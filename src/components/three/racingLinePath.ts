@@ -0,0 +1,64 @@
+// Plain-math description of the hero racing line. Kept free of three.js so
+// the static poster can draw the same curve without pulling in the 3D chunk.
+
+export const RACING_LINE_SEGMENTS = 200
+
+// Main line, ghost line for depth and inner reference line. All three are
+// drawn from the same geometry; the offsets are applied as per-object scale.
+export const racingLineLayers = [
+  { color: '#EA580C', lineWidth: 2, opacity: 0.6, scale: [1, 1, 1] },
+  { color: '#EA580C', lineWidth: 1, opacity: 0.2, scale: [1.02, 1.02, 1.02] },
+  { color: '#4B5563', lineWidth: 0.5, opacity: 0.3, scale: [0.95, 1, 0.95] },
+] as const
+
+// Flowing racing line shape, written as packed xyz triples
+export function racingLinePositions(
+  segments: number = RACING_LINE_SEGMENTS,
+  out: Float32Array = new Float32Array((segments + 1) * 3)
+) {
+  for (let i = 0; i <= segments; i++) {
+    const t = (i / segments) * Math.PI * 2
+    out[i * 3] = Math.sin(t) * 4 + Math.sin(t * 2) * 1.5
+    out[i * 3 + 1] = Math.cos(t * 3) * 0.3
+    out[i * 3 + 2] = Math.cos(t) * 3 + Math.cos(t * 2) * 1
+  }
+  return out
+}
+
+export const HERO_CAMERA = { position: [0, 2, 12] as [number, number, number], fov: 45 }
+
+// Projects the racing line at t = 0 through the hero camera (looking at the
+// origin) into an SVG path. The viewBox spans the camera's vertical field of
+// view as -50..50, so the poster lines up with the first rendered frame.
+export function racingLineSvgPath(
+  scale: readonly [number, number, number],
+  segments: number = RACING_LINE_SEGMENTS
+) {
+  const [cx, cy, cz] = HERO_CAMERA.position
+  const focal = 50 / Math.tan(((HERO_CAMERA.fov / 2) * Math.PI) / 180)
+
+  // Camera basis: forward towards the origin, right = forward x up, up = right x forward
+  const length = Math.hypot(cx, cy, cz)
+  const fx = -cx / length
+  const fy = -cy / length
+  const fz = -cz / length
+  const rightLength = Math.hypot(fz, fx)
+  const rx = -fz / rightLength
+  const rz = fx / rightLength
+  const ux = -rz * fy
+  const uy = rz * fx - rx * fz
+  const uz = rx * fy
+
+  const positions = racingLinePositions(segments)
+  let path = ''
+  for (let i = 0; i <= segments; i++) {
+    const dx = positions[i * 3] * scale[0] - cx
+    const dy = positions[i * 3 + 1] * scale[1] - cy
+    const dz = positions[i * 3 + 2] * scale[2] - cz
+    const depth = dx * fx + dy * fy + dz * fz
+    const x = ((dx * rx + dz * rz) / depth) * focal
+    const y = (-(dx * ux + dy * uy + dz * uz) / depth) * focal
+    path += `${i === 0 ? 'M' : 'L'}${x.toFixed(2)} ${y.toFixed(2)}`
+  }
+  return path
+}
@@ -0,0 +1,79 @@
+import * as THREE from 'three'
+import { seededRandom } from '@/lib/random'
+import { qualityTiers } from './quality'
+
+export const TELEMETRY_DOTS_SEED = 0x7e1e
+export const MAX_TELEMETRY_DOTS = Math.max(...qualityTiers.map((tier) => tier.dots))
+
+const ROTATION_SPEED = 0.01
+
+// Fills packed xyz triples in place. Point i only depends on the seed and i,
+// so any prefix of the buffer is a valid smaller cloud.
+export function fillTelemetryPoints(out: Float32Array, seed: number = TELEMETRY_DOTS_SEED) {
+  const random = seededRandom(seed)
+  for (let i = 0; i < out.length; i += 3) {
+    out[i] = (random() - 0.5) * 20
+    out[i + 1] = (random() - 0.5) * 10
+    out[i + 2] = (random() - 0.5) * 20
+  }
+  return out
+}
+
+let sharedPositions: Float32Array | null = null
+
+// Generated once per page and shared by every TelemetryDots instance
+function telemetryPointPositions() {
+  sharedPositions ??= fillTelemetryPoints(new Float32Array(MAX_TELEMETRY_DOTS * 3))
+  return sharedPositions
+}
+
+export interface TelemetryDotsObject {
+  points: THREE.Points
+  // Seconds since start; the vertex shader turns this into the cloud's rotation
+  time: THREE.IUniform<number>
+  setCount: (count: number) => void
+  dispose: () => void
+}
+
+// One buffer sized for the densest tier; smaller tiers just shorten the draw
+// range, and the slow spin happens in the vertex shader instead of on the CPU.
+export function createTelemetryDots(count: number): TelemetryDotsObject {
+  const geometry = new THREE.BufferGeometry()
+  geometry.setAttribute('position', new THREE.BufferAttribute(telemetryPointPositions(), 3))
+  geometry.computeBoundingSphere()
+
+  const time: THREE.IUniform<number> = { value: 0 }
+  const material = new THREE.PointsMaterial({
+    color: '#06B6D4',
+    size: 0.03,
+    transparent: true,
+    opacity: 0.4,
+    sizeAttenuation: true,
+  })
+  material.onBeforeCompile = (shader) => {
+    shader.uniforms.uTime = time
+    shader.vertexShader = `uniform float uTime;\n${shader.vertexShader}`.replace(
+      '#include <begin_vertex>',
+      `#include <begin_vertex>
+      float angle = uTime * ${ROTATION_SPEED.toFixed(3)};
+      transformed.xz = mat2(cos(angle), -sin(angle), sin(angle), cos(angle)) * transformed.xz;`
+    )
+  }
+  material.customProgramCacheKey = () => 'telemetry-dots'
+
+  const points = new THREE.Points(geometry, material)
+  const setCount = (next: number) => {
+    geometry.setDrawRange(0, Math.min(next, MAX_TELEMETRY_DOTS))
+  }
+  setCount(count)
+
+  return {
+    points,
+    time,
+    setCount,
+    dispose: () => {
+      geometry.dispose()
+      material.dispose()
+    },
+  }
+}
@@ -0,0 +1,87 @@
+import * as THREE from 'three'
+
+const GRID_SIZE = 40
+const GRID_Y = -3
+// Units per second the grid scrolls towards the camera
+const SCROLL_SPEED = 0.5
+
+const vertexShader = /* glsl */ `
+  varying vec3 vWorld;
+
+  void main() {
+    vec4 world = modelMatrix * vec4(position, 1.0);
+    vWorld = world.xyz;
+    gl_Position = projectionMatrix * viewMatrix * world;
+  }
+`
+
+const fragmentShader = /* glsl */ `
+  uniform float uTime;
+  uniform float uScrollSpeed;
+  uniform float uFadeDistance;
+  uniform vec3 uColor;
+  uniform vec3 uCenterColor;
+  varying vec3 vWorld;
+
+  // 1 on a unit grid line, 0 elsewhere, antialiased to about one pixel
+  float gridLine(float coord) {
+    float width = fwidth(coord);
+    return 1.0 - min(abs(fract(coord - 0.5) - 0.5) / width, 1.0);
+  }
+
+  void main() {
+    float z = vWorld.z - uTime * uScrollSpeed;
+    float line = max(gridLine(vWorld.x), gridLine(z));
+    float center = 1.0 - min(abs(vWorld.x) / fwidth(vWorld.x), 1.0);
+    float fade = 1.0 - smoothstep(uFadeDistance * 0.5, uFadeDistance, length(vWorld.xz));
+    float alpha = max(line, center) * fade;
+    if (alpha <= 0.0) discard;
+
+    gl_FragColor = vec4(mix(uColor, uCenterColor, center), alpha);
+    #include <tonemapping_fragment>
+    #include <colorspace_fragment>
+  }
+`
+
+export interface TelemetryGridObject {
+  mesh: THREE.Mesh
+  // Seconds since start; scrolls the grid in the fragment shader
+  time: THREE.IUniform<number>
+  dispose: () => void
+}
+
+// Procedural replacement for a scrolling GridHelper: one quad, lines drawn
+// in the fragment shader and faded out with distance, so the scroll is
+// seamless and only a time uniform changes per frame.
+export function createTelemetryGrid(): TelemetryGridObject {
+  const geometry = new THREE.PlaneGeometry(GRID_SIZE, GRID_SIZE)
+  geometry.rotateX(-Math.PI / 2)
+
+  const time: THREE.IUniform<number> = { value: 0 }
+  const material = new THREE.ShaderMaterial({
+    uniforms: {
+      uTime: time,
+      uScrollSpeed: { value: SCROLL_SPEED },
+      uFadeDistance: { value: GRID_SIZE / 2 },
+      uColor: { value: new THREE.Color('#151719') },
+      uCenterColor: { value: new THREE.Color('#1C1F23') },
+    },
+    vertexShader,
+    fragmentShader,
+    transparent: true,
+    depthWrite: false,
+    extensions: { derivatives: true },
+  })
+
+  const mesh = new THREE.Mesh(geometry, material)
+  mesh.position.y = GRID_Y
+
+  return {
+    mesh,
+    time,
+    dispose: () => {
+      geometry.dispose()
+      material.dispose()
+    },
+  }
+}
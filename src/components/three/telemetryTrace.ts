@@ -0,0 +1,165 @@
+import * as THREE from 'three'
+import { projectToPlane, TelemetryTraceBuffer, TraceDecimator } from '@/lib/telemetry/trace'
+
+// Half-width the trace is fitted to, roughly the extent of the parametric racing line
+const SCENE_EXTENT = 5
+// Metres of lateral error one m/s of unexpected speed change is worth when decimating
+const SPEED_WEIGHT = 0.5
+// How often a growing trace is re-decimated while samples stream in
+export const TRACE_REBUILD_INTERVAL = 0.5
+
+const vertexShader = /* glsl */ `
+  attribute float speed;
+  uniform float uMinSpeed;
+  uniform float uMaxSpeed;
+  varying float vSpeed;
+
+  void main() {
+    vSpeed = clamp((speed - uMinSpeed) / max(uMaxSpeed - uMinSpeed, 0.001), 0.0, 1.0);
+    gl_Position = projectionMatrix * modelViewMatrix * vec4(position, 1.0);
+  }
+`
+
+const fragmentShader = /* glsl */ `
+  uniform vec3 uSlow;
+  uniform vec3 uMid;
+  uniform vec3 uFast;
+  uniform float uOpacity;
+  varying float vSpeed;
+
+  void main() {
+    vec3 color = vSpeed < 0.5
+      ? mix(uSlow, uMid, vSpeed * 2.0)
+      : mix(uMid, uFast, vSpeed * 2.0 - 1.0);
+    gl_FragColor = vec4(color, uOpacity);
+    #include <tonemapping_fragment>
+    #include <colorspace_fragment>
+  }
+`
+
+export interface TelemetryTraceObject {
+  line: THREE.Line
+  // Re-decimates the trace if it has changed since the last build
+  update: (trace: TelemetryTraceBuffer, budget: number) => void
+  dispose: () => void
+}
+
+// A recorded trace drawn as a single line whose colour is mapped from speed
+// in the fragment shader. Vertex buffers are sized for `maxBudget` points up
+// front and rewritten in place, so streaming samples never reallocate them.
+export function createTelemetryTrace(maxBudget: number): TelemetryTraceObject {
+  const positions = new Float32Array(maxBudget * 3)
+  const speeds = new Float32Array(maxBudget)
+  const positionAttribute = new THREE.BufferAttribute(positions, 3)
+  const speedAttribute = new THREE.BufferAttribute(speeds, 1)
+  positionAttribute.setUsage(THREE.DynamicDrawUsage)
+  speedAttribute.setUsage(THREE.DynamicDrawUsage)
+
+  const geometry = new THREE.BufferGeometry()
+  geometry.setAttribute('position', positionAttribute)
+  geometry.setAttribute('speed', speedAttribute)
+  geometry.setDrawRange(0, 0)
+
+  const uniforms = {
+    uMinSpeed: { value: 0 },
+    uMaxSpeed: { value: 1 },
+    uSlow: { value: new THREE.Color('#4B5563') },
+    uMid: { value: new THREE.Color('#06B6D4') },
+    uFast: { value: new THREE.Color('#EA580C') },
+    uOpacity: { value: 0.8 },
+  }
+  const material = new THREE.ShaderMaterial({
+    uniforms,
+    vertexShader,
+    fragmentShader,
+    transparent: true,
+  })
+  const line = new THREE.Line(geometry, material)
+  line.frustumCulled = false
+
+  // Scratch space, grown as the trace grows
+  let east = new Float64Array(0)
+  let north = new Float64Array(0)
+  const kept = new Uint32Array(maxBudget)
+  // Keeps the significance of everything but the newest samples between rebuilds
+  const decimator = new TraceDecimator()
+  let builtTrace: TelemetryTraceBuffer | null = null
+  let builtVersion = -1
+  let builtBudget = 0
+
+  const update = (trace: TelemetryTraceBuffer, budget: number) => {
+    budget = Math.min(budget, maxBudget)
+    if (trace === builtTrace && trace.version === builtVersion && budget === builtBudget) return
+    if (trace !== builtTrace) decimator.reset()
+    builtTrace = trace
+    builtVersion = trace.version
+    builtBudget = budget
+
+    const count = trace.length
+    if (count < 2) {
+      geometry.setDrawRange(0, 0)
+      return
+    }
+    if (east.length < count) {
+      east = new Float64Array(trace.lat.length)
+      north = new Float64Array(trace.lat.length)
+    }
+    projectToPlane(trace.lat, trace.lon, count, east, north)
+    const keptCount = decimator.decimate(
+      east,
+      north,
+      trace.speed,
+      count,
+      budget,
+      kept,
+      SPEED_WEIGHT
+    )
+
+    let minX = Infinity
+    let maxX = -Infinity
+    let minY = Infinity
+    let maxY = -Infinity
+    let minSpeed = Infinity
+    let maxSpeed = -Infinity
+    for (let k = 0; k < keptCount; k++) {
+      const i = kept[k]
+      minX = Math.min(minX, east[i])
+      maxX = Math.max(maxX, east[i])
+      minY = Math.min(minY, north[i])
+      maxY = Math.max(maxY, north[i])
+      minSpeed = Math.min(minSpeed, trace.speed[i])
+      maxSpeed = Math.max(maxSpeed, trace.speed[i])
+    }
+
+    // Centre on the bounding box and fit its longer side to the scene; north maps to -z
+    const centerX = (minX + maxX) / 2
+    const centerY = (minY + maxY) / 2
+    const scale = SCENE_EXTENT / Math.max((maxX - minX) / 2, (maxY - minY) / 2, 1)
+    for (let k = 0; k < keptCount; k++) {
+      const i = kept[k]
+      positions[k * 3] = (east[i] - centerX) * scale
+      positions[k * 3 + 1] = 0
+      positions[k * 3 + 2] = -(north[i] - centerY) * scale
+      speeds[k] = trace.speed[i]
+    }
+
+    uniforms.uMinSpeed.value = minSpeed
+    uniforms.uMaxSpeed.value = maxSpeed
+    positionAttribute.clearUpdateRanges()
+    positionAttribute.addUpdateRange(0, keptCount * 3)
+    positionAttribute.needsUpdate = true
+    speedAttribute.clearUpdateRanges()
+    speedAttribute.addUpdateRange(0, keptCount)
+    speedAttribute.needsUpdate = true
+    geometry.setDrawRange(0, keptCount)
+  }
+
+  return {
+    line,
+    update,
+    dispose: () => {
+      geometry.dispose()
+      material.dispose()
+    },
+  }
+}
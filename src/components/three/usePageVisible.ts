@@ -0,0 +1,18 @@
+'use client'
+
+import { useEffect, useState } from 'react'
+
+export function usePageVisible() {
+  const [visible, setVisible] = useState(true)
+
+  useEffect(() => {
+    const handleVisibility = () => {
+      setVisible(document.visibilityState !== 'hidden')
+    }
+    handleVisibility()
+    document.addEventListener('visibilitychange', handleVisibility)
+    return () => document.removeEventListener('visibilitychange', handleVisibility)
+  }, [])
+
+  return visible
+}
@@ -0,0 +1,25 @@
+declare global {
+  interface Window {
+    // Read by scripts/bench.mjs once the page has finished running
+    __benchResults?: Promise<unknown>
+  }
+}
+
+export interface BenchEnvironment {
+  userAgent: string
+  hardwareConcurrency: number
+  timestamp: string
+}
+
+export function benchEnvironment(): BenchEnvironment {
+  return {
+    userAgent: navigator.userAgent,
+    hardwareConcurrency: navigator.hardwareConcurrency,
+    timestamp: new Date().toISOString(),
+  }
+}
+
+export function publishBenchResults<T>(results: Promise<T>) {
+  window.__benchResults = results
+  return results
+}
@@ -0,0 +1,33 @@
+export interface SampleSummary {
+  count: number
+  mean: number
+  p50: number
+  p95: number
+  p99: number
+  max: number
+}
+
+// Nearest-rank percentiles over the first `count` samples; sorts a copy
+export function summarize(samples: Float64Array, count: number = samples.length): SampleSummary {
+  if (count === 0) return { count: 0, mean: 0, p50: 0, p95: 0, p99: 0, max: 0 }
+
+  const sorted = samples.slice(0, count).sort()
+  let total = 0
+  for (let i = 0; i < count; i++) total += sorted[i]
+  const rank = (p: number) => sorted[Math.min(count - 1, Math.ceil(p * count) - 1)]
+
+  return {
+    count,
+    mean: total / count,
+    p50: rank(0.5),
+    p95: rank(0.95),
+    p99: rank(0.99),
+    max: sorted[count - 1],
+  }
+}
+
+// Chrome-only; undefined elsewhere
+export function usedHeapBytes(): number | undefined {
+  const memory = (performance as Performance & { memory?: { usedJSHeapSize: number } }).memory
+  return memory?.usedJSHeapSize
+}
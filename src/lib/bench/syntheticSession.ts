@@ -0,0 +1,346 @@
+// Deterministic synthetic track sessions for benchmarks: a closed circuit,
+// a physically plausible speed profile, and noisy GPS + IMU streams generated
+// chunk by chunk, so hour-long sessions never sit in memory at once.
+
+import type { GpsChunk, ImuChunk } from '@/lib/telemetry/ingest'
+import { TrackModel, trackGate } from '@/lib/telemetry/track'
+import { DEG_TO_RAD, EARTH_RADIUS_M } from '@/lib/telemetry/trace'
+import { gaussianRandom, seededRandom } from '@/lib/random'
+
+export interface SyntheticCircuit {
+  name: string
+  // Centreline length, metres
+  length: number
+  // Closed loop r(θ) = 1 + Σ a·cos(kθ + φ), as [k, a, φ]; always simple while r > 0
+  harmonics: [number, number, number][]
+  // m/s
+  maxSpeed: number
+  // m/s²
+  lateralGrip: number
+  braking: number
+  acceleration: number
+}
+
+export const syntheticCircuits: SyntheticCircuit[] = [
+  {
+    name: 'karting',
+    length: 1200,
+    harmonics: [
+      [2, 0.3, 0],
+      [3, 0.2, 1.1],
+      [5, 0.1, 2.3],
+      [7, 0.04, 0.5],
+    ],
+    maxSpeed: 28,
+    lateralGrip: 15,
+    braking: 11,
+    acceleration: 5,
+  },
+  {
+    name: 'club',
+    length: 3000,
+    harmonics: [
+      [2, 0.25, 0.4],
+      [3, 0.18, 2],
+      [5, 0.1, 0.7],
+      [8, 0.04, 1.5],
+    ],
+    maxSpeed: 55,
+    lateralGrip: 13,
+    braking: 12,
+    acceleration: 5,
+  },
+  {
+    name: 'long',
+    length: 7000,
+    harmonics: [
+      [2, 0.2, 1],
+      [3, 0.2, 0.2],
+      [5, 0.1, 2.8],
+      [9, 0.05, 0.9],
+      [12, 0.015, 2],
+    ],
+    maxSpeed: 80,
+    lateralGrip: 14,
+    braking: 14,
+    acceleration: 4,
+  },
+]
+
+// Centreline sampled every metre, starting at the start/finish line
+export interface SyntheticTrack {
+  circuit: SyntheticCircuit
+  length: number
+  x: Float64Array
+  y: Float64Array
+  heading: Float64Array
+  curvature: Float64Array
+  // Physics-limited speed for a car on the centreline
+  speed: Float64Array
+}
+
+export function buildSyntheticTrack(circuit: SyntheticCircuit): SyntheticTrack {
+  // Trace the polar curve finely, then resample at 1 m by arc length
+  const fine = 20000
+  const fx = new Float64Array(fine + 1)
+  const fy = new Float64Array(fine + 1)
+  const distance = new Float64Array(fine + 1)
+  for (let i = 0; i <= fine; i++) {
+    const theta = (i / fine) * 2 * Math.PI
+    let r = 1
+    for (const [k, a, phase] of circuit.harmonics) r += a * Math.cos(k * theta + phase)
+    fx[i] = r * Math.cos(theta)
+    fy[i] = r * Math.sin(theta)
+    if (i > 0) distance[i] = distance[i - 1] + Math.hypot(fx[i] - fx[i - 1], fy[i] - fy[i - 1])
+  }
+  const scale = circuit.length / distance[fine]
+
+  const count = Math.round(circuit.length)
+  const x = new Float64Array(count)
+  const y = new Float64Array(count)
+  for (let i = 0, j = 0; i < count; i++) {
+    const target = (i * distance[fine]) / count
+    while (distance[j + 1] < target) j++
+    const f = (target - distance[j]) / (distance[j + 1] - distance[j])
+    x[i] = (fx[j] + (fx[j + 1] - fx[j]) * f) * scale
+    y[i] = (fy[j] + (fy[j + 1] - fy[j]) * f) * scale
+  }
+
+  const step = circuit.length / count
+  const heading = new Float64Array(count)
+  const curvature = new Float64Array(count)
+  for (let i = 0; i < count; i++) {
+    const next = (i + 1) % count
+    heading[i] = Math.atan2(y[next] - y[i], x[next] - x[i])
+  }
+  for (let i = 0; i < count; i++) {
+    let turn = heading[(i + 1) % count] - heading[(i + count - 1) % count]
+    turn -= Math.round(turn / (2 * Math.PI)) * 2 * Math.PI
+    curvature[i] = turn / (2 * step)
+  }
+
+  // Corner-limited speed, then acceleration and braking limits; two laps of
+  // each pass so the profile is continuous across the start/finish line
+  const speed = new Float64Array(count)
+  for (let i = 0; i < count; i++) {
+    const limit = Math.sqrt(circuit.lateralGrip / Math.max(Math.abs(curvature[i]), 1e-6))
+    speed[i] = Math.min(circuit.maxSpeed, limit)
+  }
+  for (let pass = 0; pass < 2 * count; pass++) {
+    const i = pass % count
+    const previous = speed[(i + count - 1) % count]
+    speed[i] = Math.min(speed[i], Math.sqrt(previous * previous + 2 * circuit.acceleration * step))
+  }
+  for (let pass = 2 * count - 1; pass >= 0; pass--) {
+    const i = pass % count
+    const next = speed[(i + 1) % count]
+    speed[i] = Math.min(speed[i], Math.sqrt(next * next + 2 * circuit.braking * step))
+  }
+
+  return { circuit, length: circuit.length, x, y, heading, curvature, speed }
+}
+
+// The synthetic centreline as a TrackModel, for benchmarks that need a map
+// without building one from laps first
+export function syntheticTrackModel(track: SyntheticTrack, halfWidth = 6): TrackModel {
+  const count = track.x.length
+  const geometry = {
+    x: track.x,
+    y: track.y,
+    heading: Float32Array.from(track.heading),
+    curvature: Float32Array.from(track.curvature),
+    widthLeft: new Float32Array(count).fill(halfWidth),
+    widthRight: new Float32Array(count).fill(halfWidth),
+  }
+  return {
+    origin: null,
+    step: track.length / count,
+    length: track.length,
+    ...geometry,
+    startFinish: trackGate(geometry, 0),
+    sectors: [1, 2].map((k) => trackGate(geometry, Math.round((k * count) / 3))),
+    laps: 0,
+    version: 0,
+  }
+}
+
+// 1/s; how quickly the car settles into a new lap's pace
+const PACE_RESPONSE = 0.2
+
+export interface SyntheticSessionOptions {
+  seed?: number
+  // Hz; imuRate must be a multiple of gpsRate
+  imuRate?: number
+  gpsRate?: number
+  // Seconds of data per chunk
+  chunkDuration?: number
+  // Standard deviations
+  gpsNoise?: number
+  gpsSpeedNoise?: number
+  gyroNoise?: number
+  accelNoise?: number
+  // Constant sensor biases the fusion filter has to learn
+  gyroBias?: number
+  accelBias?: number
+  origin?: { lat: number; lon: number }
+}
+
+export interface SyntheticChunk {
+  imu: ImuChunk
+  gps: GpsChunk
+  // True position at each IMU sample, metres east/north of the origin
+  truth: { east: Float64Array; north: Float64Array }
+}
+
+// Drives the car around the circuit with a little lap-to-lap variation in
+// line and pace. Chunks are views into buffers reused by the next call.
+export class SyntheticSession {
+  readonly track: SyntheticTrack
+  readonly imuRate: number
+  readonly gpsRate: number
+  readonly origin: { lat: number; lon: number }
+  // Seconds and metres driven so far
+  time = 0
+  distance = 0
+  lap = 0
+
+  private readonly options: Required<Omit<SyntheticSessionOptions, 'origin'>>
+  private readonly uniform: () => number
+  private readonly gaussian: () => number
+  private readonly imu: {
+    t: Float64Array
+    ax: Float64Array
+    ay: Float64Array
+    yawRate: Float64Array
+  }
+  private readonly gps: {
+    t: Float64Array
+    lat: Float64Array
+    lon: Float64Array
+    speed: Float64Array
+    hdop: Float64Array
+  }
+  private readonly truth: { east: Float64Array; north: Float64Array }
+  private tick = 0
+  private speed: number
+  private pace = 1
+  private lapPace = 1
+  private lineAmplitude = 0
+
+  constructor(circuit: SyntheticCircuit, options: SyntheticSessionOptions = {}) {
+    this.track = buildSyntheticTrack(circuit)
+    this.options = {
+      seed: 1,
+      imuRate: 1000,
+      gpsRate: 25,
+      chunkDuration: 1,
+      gpsNoise: 0.5,
+      gpsSpeedNoise: 0.1,
+      gyroNoise: 0.005,
+      accelNoise: 0.05,
+      gyroBias: 0.01,
+      accelBias: 0.1,
+      ...options,
+    }
+    this.imuRate = this.options.imuRate
+    this.gpsRate = this.options.gpsRate
+    this.origin = options.origin ?? { lat: 52.0786, lon: -1.0169 }
+    this.uniform = seededRandom(this.options.seed)
+    this.gaussian = gaussianRandom(this.uniform)
+
+    const imuCount = Math.round(this.options.chunkDuration * this.imuRate)
+    const gpsCount = Math.ceil(this.options.chunkDuration * this.gpsRate)
+    this.imu = {
+      t: new Float64Array(imuCount),
+      ax: new Float64Array(imuCount),
+      ay: new Float64Array(imuCount),
+      yawRate: new Float64Array(imuCount),
+    }
+    this.gps = {
+      t: new Float64Array(gpsCount),
+      lat: new Float64Array(gpsCount),
+      lon: new Float64Array(gpsCount),
+      speed: new Float64Array(gpsCount),
+      hdop: new Float64Array(gpsCount),
+    }
+    this.truth = { east: new Float64Array(imuCount), north: new Float64Array(imuCount) }
+    this.startLap()
+    this.pace = this.lapPace
+    this.speed = this.track.speed[0] * this.pace
+  }
+
+  next(): SyntheticChunk {
+    const { track, options, imu, gps, truth } = this
+    const count = track.x.length
+    const dt = 1 / this.imuRate
+    const gpsEvery = Math.round(this.imuRate / this.gpsRate)
+    const kx = Math.cos(this.origin.lat * DEG_TO_RAD) * EARTH_RADIUS_M * DEG_TO_RAD
+    const ky = EARTH_RADIUS_M * DEG_TO_RAD
+    let fixes = 0
+
+    for (let i = 0; i < imu.t.length; i++, this.tick++) {
+      this.time = this.tick * dt
+      const along = this.distance - this.lap * track.length
+      const index = Math.floor(along) % count
+      const f = along - Math.floor(along)
+      const nextIndex = (index + 1) % count
+      // Eases towards the lap's pace so lap changes don't show up as g spikes
+      this.pace += (this.lapPace - this.pace) * dt * PACE_RESPONSE
+      const targetSpeed =
+        (track.speed[index] + (track.speed[nextIndex] - track.speed[index]) * f) * this.pace
+      const accel = (targetSpeed - this.speed) / dt
+      this.speed = targetSpeed
+      const curvature = track.curvature[index]
+      const heading = track.heading[index]
+
+      // The driven line wanders a little either side of the centreline, back
+      // on it at the start/finish line so laps join up
+      const offset = this.lineAmplitude * Math.sin((2 * Math.PI * 3 * along) / track.length)
+      const east =
+        track.x[index] + (track.x[nextIndex] - track.x[index]) * f - Math.sin(heading) * offset
+      const north =
+        track.y[index] + (track.y[nextIndex] - track.y[index]) * f + Math.cos(heading) * offset
+      truth.east[i] = east
+      truth.north[i] = north
+
+      imu.t[i] = this.time
+      imu.ax[i] = accel + options.accelBias + options.accelNoise * this.gaussian()
+      imu.ay[i] = this.speed * this.speed * curvature + options.accelNoise * this.gaussian()
+      imu.yawRate[i] =
+        this.speed * curvature + options.gyroBias + options.gyroNoise * this.gaussian()
+
+      if (this.tick % gpsEvery === 0 && fixes < gps.t.length) {
+        const hdop = 0.7 + 0.3 * this.uniform()
+        gps.t[fixes] = this.time
+        gps.lat[fixes] = this.origin.lat + (north + options.gpsNoise * hdop * this.gaussian()) / ky
+        gps.lon[fixes] = this.origin.lon + (east + options.gpsNoise * hdop * this.gaussian()) / kx
+        gps.speed[fixes] = Math.max(0, this.speed + options.gpsSpeedNoise * this.gaussian())
+        gps.hdop[fixes] = hdop
+        fixes++
+      }
+
+      this.distance += this.speed * dt
+      if (this.distance >= (this.lap + 1) * track.length) {
+        this.lap++
+        this.startLap()
+      }
+    }
+
+    return {
+      imu,
+      gps: {
+        t: gps.t.subarray(0, fixes),
+        lat: gps.lat.subarray(0, fixes),
+        lon: gps.lon.subarray(0, fixes),
+        speed: gps.speed.subarray(0, fixes),
+        hdop: gps.hdop.subarray(0, fixes),
+      },
+      truth,
+    }
+  }
+
+  private startLap() {
+    this.lapPace = 0.96 + 0.04 * this.uniform()
+    this.lineAmplitude = (this.uniform() - 0.5) * 2
+  }
+}
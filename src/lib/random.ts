@@ -0,0 +1,17 @@
+// mulberry32: small, fast and good enough for scattering points and
+// synthetic sensor noise. Same seed, same sequence, on every engine.
+export function seededRandom(seed: number) {
+  let state = seed >>> 0
+  return () => {
+    state = (state + 0x6d2b79f5) >>> 0
+    let t = state
+    t = Math.imul(t ^ (t >>> 15), t | 1)
+    t ^= t + Math.imul(t ^ (t >>> 7), t | 61)
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296
+  }
+}
+
+// Standard normal deviates from a uniform source (Box–Muller, one per call)
+export function gaussianRandom(random: () => number) {
+  return () => Math.sqrt(-2 * Math.log(1 - random())) * Math.cos(2 * Math.PI * random())
+}
@@ -0,0 +1,150 @@
+// Voice decisions. The coach watches each corner as it is driven and speaks
+// once the car is out of it, comparing the attempt with what CornerLearner
+// has learned and with the grip envelope. It stays silent about corners it
+// isn't confident in, says at most one thing per corner per lap, and leaves
+// a gap between messages. Decisions depend only on the samples, never on
+// the wall clock, so a replayed session gets the same messages every time.
+
+import type { CornerLearner } from './cornerLearning'
+import { cornerPhases } from './corners'
+import type { CornerMap } from './corners'
+import type { GripEnvelope } from './envelope'
+
+export type CoachMessageType = 'instruction' | 'reminder' | 'confirmation'
+
+export interface CoachPhrase {
+  text: string
+  type: CoachMessageType
+}
+
+export const coachPhrases = {
+  brakeEarlier: { text: 'Brake earlier next lap.', type: 'instruction' },
+  smoothSteering: { text: 'Smooth steering.', type: 'reminder' },
+  goodExit: { text: 'Good exit.', type: 'confirmation' },
+  trailBrake: { text: 'Trail brake into apex.', type: 'instruction' },
+  holdLine: { text: 'Hold this line.', type: 'confirmation' },
+} satisfies Record<string, CoachPhrase>
+
+export interface CoachMessage extends CoachPhrase {
+  // Session time it was decided, seconds
+  t: number
+  corner: number
+}
+
+// Peak grip beyond the learned mean by this many standard deviations, and
+// at least this share of it, was over the limit
+const OVER_SIGMAS = 2
+const OVER_SHARE = 0.05
+// Metres past the learned braking point that count as braking late
+const LATE_BRAKING = 5
+// Deceleration (m/s²) that counts as braking
+const BRAKING = 3
+// Seconds of entry spent neither braking nor loaded up before the apex
+const MAX_COAST = 0.3
+// Envelope share below which the car is coasting
+const COAST_UTILIZATION = 0.4
+// Faster than the learned minimum speed by this much (m/s) is a good exit
+const EXIT_GAIN = 0.5
+// Seconds between messages
+const MIN_MESSAGE_GAP = 4
+
+export class VoiceCoach {
+  readonly corners: CornerMap
+  readonly envelope: GripEnvelope
+  readonly learner: CornerLearner
+
+  private readonly listeners = new Set<(message: CoachMessage) => void>()
+  // Instruction given per corner last time, waiting to be confirmed
+  private readonly pending: Int8Array
+  // Zone in progress: the corner and the straight leading into it
+  private zone = -1
+  private lastT = NaN
+  private lastMessageT = -Infinity
+  private brakingRunFrom = NaN
+  private brakingFrom = NaN
+  private peakGrip = 0
+  private coastTime = 0
+  private minSpeed = Infinity
+
+  constructor(corners: CornerMap, envelope: GripEnvelope, learner: CornerLearner) {
+    this.corners = corners
+    this.envelope = envelope
+    this.learner = learner
+    this.pending = new Int8Array(corners.zones.count)
+  }
+
+  subscribe(listener: (message: CoachMessage) => void) {
+    this.listeners.add(listener)
+    return () => {
+      this.listeners.delete(listener)
+    }
+  }
+
+  // One sample: session time, arc length, speed and accelerations. Returns a
+  // message when one is decided.
+  push(t: number, s: number, speed: number, ax: number, ay: number): CoachMessage | null {
+    const dt = t - this.lastT
+    this.lastT = t
+    const station = this.corners.station(s)
+    const zone = this.corners.zones.zoneOf[station]
+    let message: CoachMessage | null = null
+    if (zone !== this.zone) {
+      if (this.zone >= 0) message = this.decide(t, this.zone)
+      this.zone = zone
+      this.brakingFrom = NaN
+      this.peakGrip = 0
+      this.coastTime = 0
+      this.minSpeed = Infinity
+    }
+
+    this.peakGrip = Math.max(this.peakGrip, Math.sqrt(ax * ax + ay * ay))
+    this.minSpeed = Math.min(this.minSpeed, speed)
+    // Braking points are where the braking run started, as CornerLearner
+    // measures them, even when that was in the zone before
+    if (ax < -BRAKING) {
+      if (Number.isNaN(this.brakingRunFrom)) this.brakingRunFrom = s
+      if (Number.isNaN(this.brakingFrom)) this.brakingFrom = this.brakingRunFrom
+    } else {
+      this.brakingRunFrom = NaN
+      const utilization = this.envelope.utilization(s, ax, ay)
+      const entry = cornerPhases[this.corners.phaseOf[station]] === 'entry'
+      const braked = !Number.isNaN(this.brakingFrom)
+      if (dt > 0 && entry && braked && utilization < COAST_UTILIZATION) this.coastTime += dt
+    }
+    return message
+  }
+
+  reset() {
+    this.pending.fill(0)
+    this.zone = -1
+    this.lastT = NaN
+    this.brakingRunFrom = NaN
+    this.lastMessageT = -Infinity
+  }
+
+  private decide(t: number, corner: number) {
+    if (!this.learner.isConfident(corner) || t - this.lastMessageT < MIN_MESSAGE_GAP) return null
+    const learned = this.learner
+    let phrase: CoachPhrase | null = null
+    const grip = learned.grip.mean[corner]
+    const spread = OVER_SIGMAS * Math.sqrt(learned.grip.variance(corner))
+    const margin = Math.max(spread, OVER_SHARE * grip)
+    if (this.peakGrip > grip + margin) {
+      const late = this.brakingFrom - learned.brakingPoint.mean[corner] > LATE_BRAKING
+      phrase = late ? coachPhrases.brakeEarlier : coachPhrases.smoothSteering
+    } else if (this.coastTime > MAX_COAST) {
+      phrase = coachPhrases.trailBrake
+    } else if (this.pending[corner]) {
+      // Confirm a correction once it has been made
+      const faster = this.minSpeed - learned.minSpeed.mean[corner] > EXIT_GAIN
+      phrase = faster ? coachPhrases.goodExit : coachPhrases.holdLine
+    }
+    if (!phrase) return null
+
+    this.pending[corner] = phrase.type === 'confirmation' ? 0 : 1
+    this.lastMessageT = t
+    const message: CoachMessage = { ...phrase, t, corner }
+    this.listeners.forEach((listener) => listener(message))
+    return message
+  }
+}
@@ -0,0 +1,208 @@
+// Per-corner statistics that sharpen with every accepted lap: grip used,
+// braking point, minimum speed and line at the apex. Each lap is reduced to
+// one summary per corner, and the summaries are folded into running
+// (Welford) statistics in O(corners), so old laps are never revisited.
+
+import type { EnvelopeZones } from './envelope'
+import type { TrackModel } from './track'
+
+// One lap's samples, in driving order
+export interface LapSamples {
+  // Arc length, metres
+  s: ArrayLike<number>
+  // Longitudinal and lateral acceleration, m/s²
+  ax: ArrayLike<number>
+  ay: ArrayLike<number>
+  // m/s
+  speed: ArrayLike<number>
+  // Metres from the centreline, positive left
+  offset: ArrayLike<number>
+  count: number
+}
+
+// One value per corner; NaN where the lap gave no measurement
+export interface CornerLapSummary {
+  // Peak combined acceleration, m/s²
+  grip: Float64Array
+  // Arc length braking started for the corner
+  brakingPoint: Float64Array
+  minSpeed: Float64Array
+  // Offset where the speed was lowest
+  apexOffset: Float64Array
+}
+
+// Deceleration (m/s²) that counts as braking rather than lifting
+const BRAKING_THRESHOLD = 3
+// No confidence before this many laps have a measurement
+const MIN_LAPS = 3
+// Standard errors that halve the confidence: metres of braking point and a
+// share of the mean grip
+const BRAKING_POINT_TOLERANCE = 2
+const GRIP_TOLERANCE = 0.05
+// Below this the coach stays silent about a corner
+const CONFIDENT = 0.7
+
+// Welford mean and variance per corner, for one quantity
+export class RunningStats {
+  readonly count: Uint32Array
+  readonly mean: Float64Array
+  private readonly m2: Float64Array
+
+  constructor(corners: number) {
+    this.count = new Uint32Array(corners)
+    this.mean = new Float64Array(corners)
+    this.m2 = new Float64Array(corners)
+  }
+
+  add(corner: number, value: number) {
+    if (Number.isNaN(value)) return
+    const count = ++this.count[corner]
+    const delta = value - this.mean[corner]
+    this.mean[corner] += delta / count
+    this.m2[corner] += delta * (value - this.mean[corner])
+  }
+
+  variance(corner: number) {
+    const count = this.count[corner]
+    return count > 1 ? this.m2[corner] / (count - 1) : Infinity
+  }
+
+  // Standard error of the mean
+  error(corner: number) {
+    return Math.sqrt(this.variance(corner) / this.count[corner])
+  }
+
+  clear() {
+    this.count.fill(0)
+    this.mean.fill(0)
+    this.m2.fill(0)
+  }
+}
+
+export function createLapSummary(corners: number): CornerLapSummary {
+  return {
+    grip: new Float64Array(corners),
+    brakingPoint: new Float64Array(corners),
+    minSpeed: new Float64Array(corners),
+    apexOffset: new Float64Array(corners),
+  }
+}
+
+export class CornerLearner {
+  readonly model: TrackModel
+  readonly zones: EnvelopeZones
+  readonly grip: RunningStats
+  readonly brakingPoint: RunningStats
+  readonly minSpeed: RunningStats
+  readonly apexOffset: RunningStats
+  // 0–1 per corner, refreshed by addLap
+  readonly confidence: Float32Array
+  laps = 0
+
+  private readonly summary: CornerLapSummary
+  private readonly listeners = new Set<(learner: CornerLearner) => void>()
+
+  constructor(model: TrackModel, zones: EnvelopeZones) {
+    this.model = model
+    this.zones = zones
+    const corners = zones.count
+    this.grip = new RunningStats(corners)
+    this.brakingPoint = new RunningStats(corners)
+    this.minSpeed = new RunningStats(corners)
+    this.apexOffset = new RunningStats(corners)
+    this.confidence = new Float32Array(corners)
+    this.summary = createLapSummary(corners)
+  }
+
+  get corners() {
+    return this.zones.count
+  }
+
+  subscribe(listener: (learner: CornerLearner) => void) {
+    this.listeners.add(listener)
+    return () => {
+      this.listeners.delete(listener)
+    }
+  }
+
+  // Reduces a lap to per-corner values in one pass. A corner's braking point
+  // is where the braking that reaches it started, which is usually before
+  // the corner's first station.
+  summarize(lap: LapSamples, out: CornerLapSummary = this.summary) {
+    out.grip.fill(NaN)
+    out.brakingPoint.fill(NaN)
+    out.minSpeed.fill(NaN)
+    out.apexOffset.fill(NaN)
+    const { zoneOf } = this.zones
+    const stations = zoneOf.length
+    const inverseStep = 1 / this.model.step
+
+    let brakingFrom = NaN
+    for (let i = 0; i < lap.count; i++) {
+      let station = (lap.s[i] * inverseStep) | 0
+      if (station < 0) station = 0
+      else if (station >= stations) station = stations - 1
+      const corner = zoneOf[station]
+      const ax = lap.ax[i]
+      const ay = lap.ay[i]
+
+      const combined = Math.sqrt(ax * ax + ay * ay)
+      if (!(combined <= out.grip[corner])) out.grip[corner] = combined
+      if (ax < -BRAKING_THRESHOLD) {
+        if (Number.isNaN(brakingFrom)) brakingFrom = lap.s[i]
+        if (Number.isNaN(out.brakingPoint[corner])) out.brakingPoint[corner] = brakingFrom
+      } else {
+        brakingFrom = NaN
+      }
+      if (!(lap.speed[i] >= out.minSpeed[corner])) {
+        out.minSpeed[corner] = lap.speed[i]
+        out.apexOffset[corner] = lap.offset[i]
+      }
+    }
+    return out
+  }
+
+  // Folds one accepted lap in; O(samples) to summarize, O(corners) to learn
+  addLap(lap: LapSamples) {
+    this.addSummary(this.summarize(lap))
+  }
+
+  addSummary(summary: CornerLapSummary) {
+    for (let corner = 0; corner < this.corners; corner++) {
+      this.grip.add(corner, summary.grip[corner])
+      this.brakingPoint.add(corner, summary.brakingPoint[corner])
+      this.minSpeed.add(corner, summary.minSpeed[corner])
+      this.apexOffset.add(corner, summary.apexOffset[corner])
+      this.confidence[corner] = this.estimateConfidence(corner)
+    }
+    this.laps++
+    this.listeners.forEach((listener) => listener(this))
+  }
+
+  // Whether the coach knows the corner well enough to speak about it
+  isConfident(corner: number) {
+    return this.confidence[corner] >= CONFIDENT
+  }
+
+  reset() {
+    this.grip.clear()
+    this.brakingPoint.clear()
+    this.minSpeed.clear()
+    this.apexOffset.clear()
+    this.confidence.fill(0)
+    this.laps = 0
+  }
+
+  // 1 when the means are pinned down, falling as the standard errors grow
+  // past their tolerances. Corners without braking are judged on grip alone.
+  private estimateConfidence(corner: number) {
+    if (this.grip.count[corner] < MIN_LAPS) return 0
+    const gripError = this.grip.error(corner) / (GRIP_TOLERANCE * this.grip.mean[corner])
+    let spread = gripError * gripError
+    if (this.brakingPoint.count[corner] >= MIN_LAPS) {
+      const brakingError = this.brakingPoint.error(corner) / BRAKING_POINT_TOLERANCE
+      spread += brakingError * brakingError
+    }
+    return 1 / (1 + spread)
+  }
+}
@@ -0,0 +1,202 @@
+// Corners of a track model, found from curvature with hysteresis and split
+// into entry, apex and exit. Per-station tables make "which corner, which
+// phase" an O(1) lookup by arc length while driving.
+
+import type { EnvelopeZones } from './envelope'
+import type { TrackModel } from './track'
+
+export type CornerPhase = 'straight' | 'entry' | 'apex' | 'exit'
+
+// Phase codes stored in CornerMap.phaseOf
+export const cornerPhases: readonly CornerPhase[] = ['straight', 'entry', 'apex', 'exit']
+const STRAIGHT = 0
+const ENTRY = 1
+const APEX = 2
+const EXIT = 3
+
+export interface Corner {
+  index: number
+  // Stations in driving order; a corner across the start/finish line has
+  // end < start
+  start: number
+  apexStart: number
+  apex: number
+  apexEnd: number
+  end: number
+  // 1 turning left, -1 turning right
+  direction: number
+  // Tightest smoothed curvature, 1/m
+  curvature: number
+  // Metres from start to end
+  length: number
+}
+
+// A corner starts above ENTER and ends below EXIT (1/m), so curvature noise
+// around one threshold can't split it
+const ENTER_CURVATURE = 1 / 150
+const EXIT_CURVATURE = 1 / 300
+// Curvature is averaged over ±this many metres first
+const SMOOTHING_SPAN = 5
+// Shorter bends are kinks, not corners
+const MIN_CORNER_LENGTH = 8
+// The apex phase is where curvature is within this share of its peak
+const APEX_SHARE = 0.85
+
+export class CornerMap {
+  readonly model: TrackModel
+  // Model version the corners were found for
+  readonly version: number
+  readonly corners: Corner[]
+  // Per station: corner index (-1 on straights) and phase code
+  readonly cornerOf: Int16Array
+  readonly phaseOf: Uint8Array
+  // Each corner together with the straight leading into it, where its
+  // braking happens; ready for GripEnvelope and CornerLearner
+  readonly zones: EnvelopeZones
+
+  constructor(model: TrackModel) {
+    this.model = model
+    this.version = model.version
+    const count = model.x.length
+    const halfWidth = Math.max(1, Math.round(SMOOTHING_SPAN / model.step))
+    const curvature = smoothCurvature(model.curvature, halfWidth)
+
+    // Scan from the straightest station so no corner is cut in two by the scan
+    let origin = 0
+    for (let i = 1; i < count; i++) {
+      if (Math.abs(curvature[i]) < Math.abs(curvature[origin])) origin = i
+    }
+
+    const spans: number[] = []
+    let start = -1
+    let direction = 0
+    const close = (end: number) => {
+      if ((end - start) * model.step >= MIN_CORNER_LENGTH) spans.push(start, end)
+      start = -1
+    }
+    for (let k = 0; k < count; k++) {
+      const value = curvature[(origin + k) % count]
+      const magnitude = Math.abs(value)
+      if (start >= 0) {
+        const reversed = Math.sign(value) !== direction && magnitude > ENTER_CURVATURE
+        if (magnitude < EXIT_CURVATURE || reversed) close(k)
+      }
+      if (start < 0 && magnitude > ENTER_CURVATURE) {
+        start = k
+        direction = Math.sign(value)
+      }
+    }
+    if (start >= 0) close(count)
+
+    const corners: Corner[] = []
+    for (let c = 0; c < spans.length; c += 2) {
+      corners.push(describeCorner(curvature, origin, spans[c], spans[c + 1], model.step))
+    }
+    // Number corners in driving order from the start/finish line
+    corners.sort((a, b) => a.start - b.start)
+    corners.forEach((corner, index) => (corner.index = index))
+    this.corners = corners
+
+    this.cornerOf = new Int16Array(count).fill(-1)
+    this.phaseOf = new Uint8Array(count)
+    for (const corner of corners) {
+      // Walked by offset from the start rather than start to end, because a
+      // corner that takes the whole lap (a circle) ends where it starts
+      const stations = Math.round(corner.length / model.step)
+      const apexFrom = (corner.apexStart - corner.start + count) % count
+      let apexTo = (corner.apexEnd - corner.start + count) % count
+      if (corner.apexEnd === corner.end) apexTo = stations
+      for (let k = 0; k < stations; k++) {
+        const i = (corner.start + k) % count
+        this.cornerOf[i] = corner.index
+        this.phaseOf[i] = k < apexFrom ? ENTRY : k < apexTo ? APEX : EXIT
+      }
+    }
+    this.zones = cornerZones(corners, count)
+  }
+
+  // Station at arc length s, clamped to the lap
+  station(s: number) {
+    const count = this.cornerOf.length
+    const station = (s / this.model.step) | 0
+    return station < 0 ? 0 : station >= count ? count - 1 : station
+  }
+
+  // Corner at arc length s, or -1 on a straight
+  cornerAt(s: number) {
+    return this.cornerOf[this.station(s)]
+  }
+
+  phaseAt(s: number): CornerPhase {
+    return cornerPhases[this.phaseOf[this.station(s)]]
+  }
+}
+
+// Corners are found once per model version and kept with the model
+const cache = new WeakMap<TrackModel, CornerMap>()
+
+export function trackCorners(model: TrackModel) {
+  let map = cache.get(model)
+  if (!map || map.version !== model.version) {
+    map = new CornerMap(model)
+    cache.set(model, map)
+  }
+  return map
+}
+
+function smoothCurvature(curvature: Float32Array, halfWidth: number) {
+  const count = curvature.length
+  const out = new Float32Array(count)
+  let sum = 0
+  for (let k = -halfWidth; k <= halfWidth; k++) sum += curvature[(k + count) % count]
+  for (let i = 0; i < count; i++) {
+    out[i] = sum / (2 * halfWidth + 1)
+    sum += curvature[(i + halfWidth + 1) % count] - curvature[(i - halfWidth + count) % count]
+  }
+  return out
+}
+
+// Corner from a span [from, to) of the scan that started at `origin`
+function describeCorner(
+  curvature: Float32Array,
+  origin: number,
+  from: number,
+  to: number,
+  step: number
+): Corner {
+  const count = curvature.length
+  const at = (k: number) => (origin + k) % count
+  let peak = from
+  for (let k = from; k < to; k++) {
+    if (Math.abs(curvature[at(k)]) > Math.abs(curvature[at(peak)])) peak = k
+  }
+  const threshold = APEX_SHARE * Math.abs(curvature[at(peak)])
+  let apexFrom = peak
+  let apexTo = peak
+  while (apexFrom > from && Math.abs(curvature[at(apexFrom - 1)]) >= threshold) apexFrom--
+  while (apexTo < to - 1 && Math.abs(curvature[at(apexTo + 1)]) >= threshold) apexTo++
+
+  return {
+    index: 0,
+    start: at(from),
+    apexStart: at(apexFrom),
+    apex: at(peak),
+    apexEnd: at(apexTo + 1),
+    end: at(to),
+    direction: Math.sign(curvature[at(peak)]),
+    curvature: Math.abs(curvature[at(peak)]),
+    length: (to - from) * step,
+  }
+}
+
+// Zone k runs from the end of corner k - 1 to the end of corner k; the
+// stretch after the last corner joins zone 0, as it leads into corner 0.
+// With one corner or none the whole lap is zone 0.
+function cornerZones(corners: Corner[], count: number): EnvelopeZones {
+  const zoneOf = new Uint16Array(count)
+  for (const corner of corners) {
+    const previous = corners[(corner.index + corners.length - 1) % corners.length]
+    for (let i = previous.end; i !== corner.end; i = (i + 1) % count) zoneOf[i] = corner.index
+  }
+  return { zoneOf, count: Math.max(1, corners.length) }
+}
@@ -0,0 +1,280 @@
+// Friction-circle envelopes per track zone. Each zone learns an ellipse of
+// combined g from clean laps, with separate longitudinal semi-axes for
+// braking and acceleration, and whole laps are checked against it in one
+// pass over typed arrays.
+
+import type { TrackModel } from './track'
+
+// Maps every track station to a zone: uniform bins, or one zone per corner
+// from CornerMap
+export interface EnvelopeZones {
+  zoneOf: Uint16Array
+  count: number
+}
+
+export function uniformZones(model: TrackModel, zoneLength: number = 25): EnvelopeZones {
+  const stations = model.x.length
+  const perZone = Math.max(1, Math.round(zoneLength / model.step))
+  const zoneOf = new Uint16Array(stations)
+  for (let i = 0; i < stations; i++) zoneOf[i] = Math.floor(i / perZone)
+  return { zoneOf, count: zoneOf[stations - 1] + 1 }
+}
+
+export interface EnvelopeCheck {
+  // Peak and mean share of the envelope used; above 1 is outside it
+  maxUtilization: number
+  meanUtilization: number
+  samplesOver: number
+  // Where the peak happened
+  worstZone: number
+  worstS: number
+}
+
+// Accelerations beyond this (m/s², ~3 g) are sensor faults, not grip
+const MAX_PLAUSIBLE = 30
+// Until a direction has been demonstrated, assume this much (m/s²)
+const MIN_AXIS = 3
+// A zone's axis never drops below this share of the track-wide figure, so
+// directions a zone rarely loads (braking on an exit) keep a sane limit
+const TRACK_FLOOR = 0.6
+// Axis = mean + SPREAD · σ of per-lap peaks, capped at the largest peak seen
+const SPREAD = 2
+
+// Per-zone Welford statistics of each lap's peak, for one direction
+class PeakStats {
+  readonly count: Uint32Array
+  readonly mean: Float64Array
+  readonly m2: Float64Array
+  readonly max: Float64Array
+  // The lap being added, before it is folded in
+  readonly lap: Float64Array
+
+  constructor(zones: number) {
+    this.count = new Uint32Array(zones)
+    this.mean = new Float64Array(zones)
+    this.m2 = new Float64Array(zones)
+    this.max = new Float64Array(zones)
+    this.lap = new Float64Array(zones)
+  }
+
+  commit(zone: number) {
+    const peak = this.lap[zone]
+    if (peak <= 0) return
+    const count = ++this.count[zone]
+    const delta = peak - this.mean[zone]
+    this.mean[zone] += delta / count
+    this.m2[zone] += delta * (peak - this.mean[zone])
+    this.max[zone] = Math.max(this.max[zone], peak)
+  }
+
+  estimate(zone: number) {
+    const count = this.count[zone]
+    if (count === 0) return 0
+    const sigma = count > 1 ? Math.sqrt(this.m2[zone] / (count - 1)) : 0
+    return Math.min(this.max[zone], this.mean[zone] + SPREAD * sigma)
+  }
+}
+
+export class GripEnvelope {
+  readonly model: TrackModel
+  readonly zones: EnvelopeZones
+  // Semi-axes per zone, m/s²
+  readonly braking: Float32Array
+  readonly acceleration: Float32Array
+  readonly lateral: Float32Array
+  laps = 0
+
+  private readonly brakingPeaks: PeakStats
+  private readonly accelerationPeaks: PeakStats
+  private readonly lateralPeaks: PeakStats
+  // 1/axis², what evaluate() actually reads
+  private readonly inverseBrakingSq: Float32Array
+  private readonly inverseAccelerationSq: Float32Array
+  private readonly inverseLateralSq: Float32Array
+  private readonly listeners = new Set<(envelope: GripEnvelope) => void>()
+
+  constructor(model: TrackModel, zones: EnvelopeZones = uniformZones(model)) {
+    this.model = model
+    this.zones = zones
+    const count = zones.count
+    this.braking = new Float32Array(count).fill(MIN_AXIS)
+    this.acceleration = new Float32Array(count).fill(MIN_AXIS)
+    this.lateral = new Float32Array(count).fill(MIN_AXIS)
+    this.brakingPeaks = new PeakStats(count)
+    this.accelerationPeaks = new PeakStats(count)
+    this.lateralPeaks = new PeakStats(count)
+    this.inverseBrakingSq = new Float32Array(count)
+    this.inverseAccelerationSq = new Float32Array(count)
+    this.inverseLateralSq = new Float32Array(count)
+    this.updateInverses(0, count)
+  }
+
+  // Zone of arc length s, in O(1) through the station table
+  zoneAt(s: number) {
+    const stations = this.zones.zoneOf.length
+    let station = Math.floor(s / this.model.step)
+    if (station < 0) station = 0
+    else if (station >= stations) station = stations - 1
+    return this.zones.zoneOf[station]
+  }
+
+  subscribe(listener: (envelope: GripEnvelope) => void) {
+    this.listeners.add(listener)
+    return () => {
+      this.listeners.delete(listener)
+    }
+  }
+
+  // Learns from one clean lap: arc length and (filtered) longitudinal and
+  // lateral acceleration per sample. O(samples + zones).
+  addLap(s: ArrayLike<number>, ax: ArrayLike<number>, ay: ArrayLike<number>, count: number) {
+    const braking = this.brakingPeaks.lap
+    const acceleration = this.accelerationPeaks.lap
+    const lateral = this.lateralPeaks.lap
+    braking.fill(0)
+    acceleration.fill(0)
+    lateral.fill(0)
+
+    for (let i = 0; i < count; i++) {
+      const longitudinal = ax[i]
+      const sideways = Math.abs(ay[i])
+      if (Math.abs(longitudinal) > MAX_PLAUSIBLE || sideways > MAX_PLAUSIBLE) continue
+      const zone = this.zoneAt(s[i])
+      if (longitudinal < 0) braking[zone] = Math.max(braking[zone], -longitudinal)
+      else acceleration[zone] = Math.max(acceleration[zone], longitudinal)
+      lateral[zone] = Math.max(lateral[zone], sideways)
+    }
+
+    const zones = this.zones.count
+    for (let zone = 0; zone < zones; zone++) {
+      this.brakingPeaks.commit(zone)
+      this.accelerationPeaks.commit(zone)
+      this.lateralPeaks.commit(zone)
+    }
+    this.laps++
+    this.updateAxes()
+    this.listeners.forEach((listener) => listener(this))
+  }
+
+  // Share of the envelope used by one sample; above 1 is outside it
+  utilization(s: number, ax: number, ay: number) {
+    const zone = this.zoneAt(s)
+    const inverseLongSq = ax < 0 ? this.inverseBrakingSq[zone] : this.inverseAccelerationSq[zone]
+    return Math.sqrt(ax * ax * inverseLongSq + ay * ay * this.inverseLateralSq[zone])
+  }
+
+  // Share of the envelope used by every sample, written to `out` if given;
+  // one branch-light pass with the zone lookups and divisions precomputed
+  evaluate(
+    s: ArrayLike<number>,
+    ax: ArrayLike<number>,
+    ay: ArrayLike<number>,
+    count: number,
+    out?: Float32Array,
+    check: EnvelopeCheck = {
+      maxUtilization: 0,
+      meanUtilization: 0,
+      samplesOver: 0,
+      worstZone: 0,
+      worstS: 0,
+    }
+  ): EnvelopeCheck {
+    const { zoneOf } = this.zones
+    const stations = zoneOf.length
+    const inverseStep = 1 / this.model.step
+    const inverseBrakingSq = this.inverseBrakingSq
+    const inverseAccelerationSq = this.inverseAccelerationSq
+    const inverseLateralSq = this.inverseLateralSq
+
+    let max = 0
+    let total = 0
+    let over = 0
+    let worst = 0
+    for (let i = 0; i < count; i++) {
+      let station = (s[i] * inverseStep) | 0
+      if (station < 0) station = 0
+      else if (station >= stations) station = stations - 1
+      const zone = zoneOf[station]
+      const longitudinal = ax[i]
+      const sideways = ay[i]
+      const inverseLongSq = longitudinal < 0 ? inverseBrakingSq[zone] : inverseAccelerationSq[zone]
+      const utilization = Math.sqrt(
+        longitudinal * longitudinal * inverseLongSq + sideways * sideways * inverseLateralSq[zone]
+      )
+      if (out) out[i] = utilization
+      total += utilization
+      if (utilization > 1) over++
+      if (utilization > max) {
+        max = utilization
+        worst = i
+      }
+    }
+
+    check.maxUtilization = max
+    check.meanUtilization = count > 0 ? total / count : 0
+    check.samplesOver = over
+    check.worstS = count > 0 ? s[worst] : 0
+    check.worstZone = count > 0 ? this.zoneAt(s[worst]) : 0
+    return check
+  }
+
+  private updateAxes() {
+    const zones = this.zones.count
+    let trackBraking = 0
+    let trackAcceleration = 0
+    let trackLateral = 0
+    for (let zone = 0; zone < zones; zone++) {
+      trackBraking = Math.max(trackBraking, this.brakingPeaks.estimate(zone))
+      trackAcceleration = Math.max(trackAcceleration, this.accelerationPeaks.estimate(zone))
+      trackLateral = Math.max(trackLateral, this.lateralPeaks.estimate(zone))
+    }
+    for (let zone = 0; zone < zones; zone++) {
+      this.braking[zone] = axis(this.brakingPeaks.estimate(zone), trackBraking)
+      this.acceleration[zone] = axis(this.accelerationPeaks.estimate(zone), trackAcceleration)
+      this.lateral[zone] = axis(this.lateralPeaks.estimate(zone), trackLateral)
+    }
+    this.updateInverses(0, zones)
+  }
+
+  private updateInverses(from: number, to: number) {
+    for (let zone = from; zone < to; zone++) {
+      this.inverseBrakingSq[zone] = 1 / (this.braking[zone] * this.braking[zone])
+      this.inverseAccelerationSq[zone] = 1 / (this.acceleration[zone] * this.acceleration[zone])
+      this.inverseLateralSq[zone] = 1 / (this.lateral[zone] * this.lateral[zone])
+    }
+  }
+}
+
+function axis(zone: number, track: number) {
+  return Math.max(MIN_AXIS, zone, track * TRACK_FLOOR)
+}
+
+// Centred moving average over ±halfWidth samples, e.g. to take vibration out
+// of 1 kHz IMU accelerations before learning or evaluating
+export function smoothSamples(
+  values: ArrayLike<number>,
+  count: number,
+  halfWidth: number,
+  out: Float32Array | Float64Array
+) {
+  let sum = 0
+  let width = 0
+  for (let i = 0; i < Math.min(halfWidth, count); i++) {
+    sum += values[i]
+    width++
+  }
+  for (let i = 0; i < count; i++) {
+    const enter = i + halfWidth
+    if (enter < count) {
+      sum += values[enter]
+      width++
+    }
+    const leave = i - halfWidth - 1
+    if (leave >= 0) {
+      sum -= values[leave]
+      width--
+    }
+    out[i] = sum / width
+  }
+  return out
+}
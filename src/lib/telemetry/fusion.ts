@@ -0,0 +1,292 @@
+// Extended Kalman filter fusing IMU dead reckoning with GPS fixes. State and
+// covariance live in preallocated Float64Arrays and every step works on them
+// in place, so the filter allocates nothing per sample.
+
+import type { ImuChunk, PoseBatch, PoseEstimator } from './ingest'
+
+// State layout: position east/north (m), heading (rad anticlockwise from
+// east), speed (m/s), gyro bias (rad/s) and longitudinal accelerometer bias (m/s²)
+const X = 0
+const Y = 1
+const PSI = 2
+const V = 3
+const BG = 4
+const BA = 5
+const N = 6
+
+// Below this distance between fixes the course over ground is mostly noise
+const MIN_COURSE_DISTANCE = 0.5
+// Chi-square gate on the 2-DOF position innovation (99.9%)
+const POSITION_GATE = 13.8
+// After this many gated fixes in a row the filter is assumed lost and re-anchors
+const MAX_REJECTED_FIXES = 10
+
+export interface FusionNoise {
+  // White noise densities, per √s
+  gyro: number
+  accel: number
+  // Unmodelled motion (slip, IMU misalignment) in metres per √s
+  position: number
+  // Bias random walks, per √s
+  gyroBias: number
+  accelBias: number
+  // Position error per unit of HDOP, in metres
+  gpsPosition: number
+  // Doppler speed error, m/s
+  gpsSpeed: number
+}
+
+export const defaultFusionNoise: FusionNoise = {
+  gyro: 0.01,
+  accel: 0.3,
+  position: 0.3,
+  gyroBias: 1e-4,
+  accelBias: 1e-3,
+  gpsPosition: 2,
+  gpsSpeed: 0.2,
+}
+
+// Initial standard deviations once the filter anchors on its first course
+const initialSigma = [2, 2, 0.3, 1, 0.02, 0.2]
+
+export interface FixChunk {
+  t: ArrayLike<number>
+  // Metres east/north of the same origin the filter's positions use
+  east: ArrayLike<number>
+  north: ArrayLike<number>
+  speed: ArrayLike<number>
+  hdop: ArrayLike<number>
+}
+
+export interface FusionStats {
+  predictions: number
+  fixes: number
+  rejectedFixes: number
+  // Times the filter re-anchored on GPS after too many rejected fixes
+  resets: number
+}
+
+// The per-sample API is PoseEstimator (predict / correct / write), driven by
+// SensorIngest for live use; processBatch runs a block of recorded samples
+// in one call for replay.
+export class FusionFilter implements PoseEstimator {
+  readonly state = new Float64Array(N)
+  // Row-major N×N covariance
+  readonly covariance = new Float64Array(N * N)
+  readonly stats: FusionStats = { predictions: 0, fixes: 0, rejectedFixes: 0, resets: 0 }
+  ready = false
+
+  private readonly noise: FusionNoise
+  private readonly gain = new Float64Array(N)
+  private readonly row = new Float64Array(N)
+  private t = NaN
+  private ax = 0
+  private ay = 0
+  private yawRate = 0
+  private anchorEast = NaN
+  private anchorNorth = NaN
+  private rejectedInRow = 0
+
+  constructor(noise: Partial<FusionNoise> = {}) {
+    this.noise = { ...defaultFusionNoise, ...noise }
+  }
+
+  reset() {
+    this.state.fill(0)
+    this.covariance.fill(0)
+    this.stats.predictions = this.stats.fixes = this.stats.rejectedFixes = this.stats.resets = 0
+    this.ready = false
+    this.t = NaN
+    this.ax = this.ay = this.yawRate = 0
+    this.anchorEast = this.anchorNorth = NaN
+    this.rejectedInRow = 0
+  }
+
+  predict(t: number, ax: number, ay: number, yawRate: number) {
+    const dt = t - this.t
+    this.t = t
+    this.ax = ax
+    this.ay = ay
+    this.yawRate = yawRate
+    if (!this.ready || !(dt > 0)) return
+    this.stats.predictions++
+
+    const s = this.state
+    const P = this.covariance
+    const v = s[V]
+    const cos = Math.cos(s[PSI])
+    const sin = Math.sin(s[PSI])
+
+    // P ← F P Fᵀ, with F = I plus the few non-zero Jacobian terms, applied as
+    // row then column operations instead of dense 6×6 products
+    const dxdPsi = -v * sin * dt
+    const dxdV = cos * dt
+    const dydPsi = v * cos * dt
+    const dydV = sin * dt
+    for (let j = 0; j < N; j++) {
+      P[X * N + j] += dxdPsi * P[PSI * N + j] + dxdV * P[V * N + j]
+      P[Y * N + j] += dydPsi * P[PSI * N + j] + dydV * P[V * N + j]
+      P[PSI * N + j] -= dt * P[BG * N + j]
+      P[V * N + j] -= dt * P[BA * N + j]
+    }
+    for (let i = 0; i < N; i++) {
+      const r = i * N
+      P[r + X] += dxdPsi * P[r + PSI] + dxdV * P[r + V]
+      P[r + Y] += dydPsi * P[r + PSI] + dydV * P[r + V]
+      P[r + PSI] -= dt * P[r + BG]
+      P[r + V] -= dt * P[r + BA]
+    }
+
+    const q = this.noise
+    P[X * N + X] += q.position * q.position * dt
+    P[Y * N + Y] += q.position * q.position * dt
+    P[PSI * N + PSI] += q.gyro * q.gyro * dt
+    P[V * N + V] += q.accel * q.accel * dt
+    P[BG * N + BG] += q.gyroBias * q.gyroBias * dt
+    P[BA * N + BA] += q.accelBias * q.accelBias * dt
+
+    s[X] += v * cos * dt
+    s[Y] += v * sin * dt
+    s[PSI] = wrapAngle(s[PSI] + (yawRate - s[BG]) * dt)
+    s[V] += (ax - s[BA]) * dt
+  }
+
+  correct(t: number, east: number, north: number, speed: number, hdop: number) {
+    if (!this.ready) {
+      this.anchor(t, east, north, speed)
+      return
+    }
+    this.stats.fixes++
+
+    const s = this.state
+    const P = this.covariance
+    const sigma = this.noise.gpsPosition * (hdop > 0 ? hdop : 1)
+    const r = sigma * sigma
+
+    const dEast = east - s[X]
+    const dNorth = north - s[Y]
+    const distance =
+      (dEast * dEast) / (P[X * N + X] + r) + (dNorth * dNorth) / (P[Y * N + Y] + r)
+    if (distance > POSITION_GATE) {
+      this.stats.rejectedFixes++
+      if (++this.rejectedInRow < MAX_REJECTED_FIXES) return
+      // Consistently far from the fixes: trust GPS again and widen the uncertainty
+      this.stats.resets++
+      s[X] = east
+      s[Y] = north
+      s[V] = speed
+      this.resetCovariance()
+      this.rejectedInRow = 0
+      return
+    }
+    this.rejectedInRow = 0
+
+    // R is diagonal, so the fix is applied as independent scalar updates
+    this.update(X, east, r)
+    this.update(Y, north, r)
+    if (speed >= 0) this.update(V, speed, this.noise.gpsSpeed * this.noise.gpsSpeed)
+    s[PSI] = wrapAngle(s[PSI])
+  }
+
+  write(batch: PoseBatch, index: number) {
+    const s = this.state
+    batch.t[index] = this.t
+    batch.east[index] = s[X]
+    batch.north[index] = s[Y]
+    batch.heading[index] = s[PSI]
+    batch.speed[index] = s[V]
+    batch.ax[index] = this.ax - s[BA]
+    batch.ay[index] = this.ay
+    batch.yawRate[index] = this.yawRate - s[BG]
+  }
+
+  // Consumes a block of IMU samples and fixes, each sorted by time, in
+  // timestamp order and appends one pose per IMU sample (once the filter is
+  // ready) to `out`. State carries over between calls, so a recording can be
+  // replayed in blocks. Returns the number of poses written.
+  processBatch(imu: ImuChunk, fixes: FixChunk, out: PoseBatch) {
+    const imuCount = Math.min(imu.t.length, imu.ax.length, imu.ay.length, imu.yawRate.length)
+    const fixCount = Math.min(
+      fixes.t.length,
+      fixes.east.length,
+      fixes.north.length,
+      fixes.speed.length,
+      fixes.hdop.length
+    )
+    if (out.length + imuCount > out.capacity) {
+      const room = out.capacity - out.length
+      throw new RangeError(`PoseBatch has room for ${room} of ${imuCount} poses`)
+    }
+
+    const start = out.length
+    let fix = 0
+    for (let i = 0; i < imuCount; i++) {
+      const t = imu.t[i]
+      for (; fix < fixCount && fixes.t[fix] <= t; fix++) this.correctFrom(fixes, fix)
+      this.predict(t, imu.ax[i], imu.ay[i], imu.yawRate[i])
+      if (this.ready) this.write(out, out.length++)
+    }
+    for (; fix < fixCount; fix++) this.correctFrom(fixes, fix)
+    return out.length - start
+  }
+
+  private correctFrom(fixes: FixChunk, index: number) {
+    const { t, east, north, speed, hdop } = fixes
+    this.correct(t[index], east[index], north[index], speed[index], hdop[index])
+  }
+
+  // Heading is unobservable from a single fix, so the filter starts once two
+  // fixes are far enough apart to give a course
+  private anchor(t: number, east: number, north: number, speed: number) {
+    const dEast = east - this.anchorEast
+    const dNorth = north - this.anchorNorth
+    if (!(dEast * dEast + dNorth * dNorth >= MIN_COURSE_DISTANCE ** 2)) {
+      if (Number.isNaN(dEast)) {
+        this.anchorEast = east
+        this.anchorNorth = north
+      }
+      return
+    }
+
+    const s = this.state
+    s.fill(0)
+    s[X] = east
+    s[Y] = north
+    s[PSI] = Math.atan2(dNorth, dEast)
+    s[V] = speed
+    this.resetCovariance()
+    this.t = t
+    this.ready = true
+  }
+
+  private resetCovariance() {
+    const P = this.covariance
+    P.fill(0)
+    for (let i = 0; i < N; i++) P[i * N + i] = initialSigma[i] * initialSigma[i]
+  }
+
+  // Scalar Kalman update of state component j with measurement z and variance r
+  private update(j: number, z: number, r: number) {
+    const s = this.state
+    const P = this.covariance
+    const k = this.gain
+    const row = this.row
+    const innovation = z - s[j]
+    const S = P[j * N + j] + r
+
+    for (let i = 0; i < N; i++) {
+      k[i] = P[i * N + j] / S
+      row[i] = P[j * N + i]
+    }
+    for (let i = 0; i < N; i++) {
+      s[i] += k[i] * innovation
+      for (let c = 0; c < N; c++) P[i * N + c] -= k[i] * row[c]
+    }
+  }
+}
+
+function wrapAngle(angle: number) {
+  if (angle > Math.PI) return angle - 2 * Math.PI
+  if (angle <= -Math.PI) return angle + 2 * Math.PI
+  return angle
+}
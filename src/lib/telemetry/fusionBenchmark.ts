@@ -0,0 +1,145 @@
+import { BenchEnvironment, benchEnvironment } from '@/lib/bench/results'
+import { SampleSummary, summarize, usedHeapBytes } from '@/lib/bench/stats'
+import { SyntheticSession, syntheticCircuits } from '@/lib/bench/syntheticSession'
+import { FixChunk, FusionFilter, FusionStats } from './fusion'
+import { PoseBatch } from './ingest'
+import { projectToPlane } from './trace'
+
+export type FusionBenchmarkMode = 'per-sample' | 'batch'
+
+export interface FusionBenchmarkResult {
+  circuit: string
+  mode: FusionBenchmarkMode
+  imuSamples: number
+  gpsFixes: number
+  samplesPerSecond: number
+  // Multiple of real time the filter ran at
+  realtimeFactor: number
+  // Filter time per one-second chunk of data
+  chunkMs: SampleSummary
+  // Position error against the simulated truth, after the filter settles
+  rmseMetres: number
+  // JS heap growth across the measured run, when the browser exposes it; the
+  // filter itself should allocate nothing per sample
+  heapDeltaBytes: number | null
+  filter: FusionStats
+}
+
+export interface FusionBenchmarkReport {
+  environment: BenchEnvironment
+  seconds: number
+  results: FusionBenchmarkResult[]
+}
+
+interface FusionBenchmarkOptions {
+  seconds?: number
+  modes?: FusionBenchmarkMode[]
+}
+
+// Ignore the first seconds while biases are still being learnt
+const SETTLE_SECONDS = 20
+
+// Runs each synthetic circuit through the filter, through the per-sample API
+// live use drives (predict/correct/write in timestamp order) and through
+// processBatch as replay does. Both modes get the same projected fixes and
+// time only the filter; ingest buffering is measured by the pipeline suite.
+export async function runFusionBenchmark({
+  seconds = 600,
+  modes = ['per-sample', 'batch'],
+}: FusionBenchmarkOptions = {}): Promise<FusionBenchmarkReport> {
+  const results: FusionBenchmarkResult[] = []
+  const chunkMs = new Float64Array(seconds)
+
+  for (const circuit of syntheticCircuits) {
+    for (const mode of modes) {
+      const session = new SyntheticSession(circuit)
+      const filter = new FusionFilter()
+      const rate = session.imuRate
+
+      // Truth for the last two chunks, by IMU tick
+      const window = 2 * rate
+      const truthEast = new Float64Array(window)
+      const truthNorth = new Float64Array(window)
+      let squaredError = 0
+      let errorCount = 0
+      const score = (batch: PoseBatch) => {
+        for (let i = 0; i < batch.length; i++) {
+          if (batch.t[i] < SETTLE_SECONDS) continue
+          const slot = Math.round(batch.t[i] * rate) % window
+          const dEast = batch.east[i] - truthEast[slot]
+          const dNorth = batch.north[i] - truthNorth[slot]
+          squaredError += dEast * dEast + dNorth * dNorth
+          errorCount++
+        }
+      }
+
+      const poses = new PoseBatch(rate)
+      const east = new Float64Array(session.gpsRate)
+      const north = new Float64Array(session.gpsRate)
+      let gpsFixes = 0
+
+      // Let the event loop breathe between runs so GC can run outside the window
+      await new Promise((resolve) => setTimeout(resolve, 50))
+      const heapBefore = usedHeapBytes()
+      for (let chunk = 0; chunk < seconds; chunk++) {
+        const { imu, gps, truth } = session.next()
+        truthEast.set(truth.east, (chunk % 2) * rate)
+        truthNorth.set(truth.north, (chunk % 2) * rate)
+        gpsFixes += gps.t.length
+
+        const count = gps.t.length
+        const { lat, lon } = session.origin
+        projectToPlane(gps.lat, gps.lon, count, east, north, lat, lon)
+        poses.length = 0
+        if (mode === 'per-sample') {
+          const start = performance.now()
+          let fix = 0
+          for (let i = 0; i < imu.t.length; i++) {
+            const t = imu.t[i]
+            for (; fix < count && gps.t[fix] <= t; fix++) {
+              filter.correct(gps.t[fix], east[fix], north[fix], gps.speed[fix], gps.hdop[fix])
+            }
+            filter.predict(t, imu.ax[i], imu.ay[i], imu.yawRate[i])
+            if (filter.ready) filter.write(poses, poses.length++)
+          }
+          for (; fix < count; fix++) {
+            filter.correct(gps.t[fix], east[fix], north[fix], gps.speed[fix], gps.hdop[fix])
+          }
+          chunkMs[chunk] = performance.now() - start
+        } else {
+          const fixes: FixChunk = {
+            t: gps.t,
+            east: east.subarray(0, count),
+            north: north.subarray(0, count),
+            speed: gps.speed,
+            hdop: gps.hdop,
+          }
+          const start = performance.now()
+          filter.processBatch(imu, fixes, poses)
+          chunkMs[chunk] = performance.now() - start
+        }
+        score(poses)
+      }
+      const heapAfter = usedHeapBytes()
+
+      const imuSamples = seconds * rate
+      let filterMs = 0
+      for (let chunk = 0; chunk < seconds; chunk++) filterMs += chunkMs[chunk]
+      results.push({
+        circuit: circuit.name,
+        mode,
+        imuSamples,
+        gpsFixes,
+        samplesPerSecond: Math.round((imuSamples + gpsFixes) / (filterMs / 1000)),
+        realtimeFactor: Math.round((seconds * 1000) / filterMs),
+        chunkMs: summarize(chunkMs, seconds),
+        rmseMetres: errorCount > 0 ? Math.sqrt(squaredError / errorCount) : NaN,
+        heapDeltaBytes:
+          heapBefore !== undefined && heapAfter !== undefined ? heapAfter - heapBefore : null,
+        filter: { ...filter.stats },
+      })
+    }
+  }
+
+  return { environment: benchEnvironment(), seconds, results }
+}
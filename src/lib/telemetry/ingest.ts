@@ -0,0 +1,340 @@
+// Streaming GPS + IMU ingest. Samples arrive as columnar typed-array chunks in
+// whatever order the sensors deliver them; two bounded ring buffers time-align
+// the streams and feed a PoseEstimator in timestamp order, so a session of any
+// length is processed in constant memory.
+
+import { FusionFilter } from './fusion'
+import { DEG_TO_RAD, EARTH_RADIUS_M } from './trace'
+
+export interface ImuChunk {
+  // Seconds, on the same clock as the GPS timestamps
+  t: ArrayLike<number>
+  // Vehicle frame, x forward and y left, in m/s²
+  ax: ArrayLike<number>
+  ay: ArrayLike<number>
+  // rad/s, positive when turning left
+  yawRate: ArrayLike<number>
+}
+
+export interface GpsChunk {
+  t: ArrayLike<number>
+  lat: ArrayLike<number>
+  lon: ArrayLike<number>
+  // m/s
+  speed: ArrayLike<number>
+  // Horizontal dilution of precision
+  hdop: ArrayLike<number>
+}
+
+// Fused output, one row per IMU sample once the estimator is ready. Positions are
+// metres east/north of the ingest origin; heading is radians anticlockwise
+// from east.
+export class PoseBatch {
+  t: Float64Array
+  east: Float64Array
+  north: Float64Array
+  heading: Float64Array
+  speed: Float64Array
+  ax: Float64Array
+  ay: Float64Array
+  yawRate: Float64Array
+  length = 0
+
+  constructor(readonly capacity: number) {
+    this.t = new Float64Array(capacity)
+    this.east = new Float64Array(capacity)
+    this.north = new Float64Array(capacity)
+    this.heading = new Float64Array(capacity)
+    this.speed = new Float64Array(capacity)
+    this.ax = new Float64Array(capacity)
+    this.ay = new Float64Array(capacity)
+    this.yawRate = new Float64Array(capacity)
+  }
+}
+
+export interface PoseEstimator {
+  // False until the estimator has enough fixes to report a pose
+  readonly ready: boolean
+  reset(): void
+  // Propagates the estimate to time t with one IMU sample
+  predict(t: number, ax: number, ay: number, yawRate: number): void
+  // Corrects the estimate with a fix in metres east/north of the ingest origin
+  correct(t: number, east: number, north: number, speed: number, hdop: number): void
+  // Writes the current estimate into row `index` of the batch
+  write(batch: PoseBatch, index: number): void
+}
+
+// Below this distance between fixes the course over ground is mostly noise
+const MIN_COURSE_DISTANCE = 0.5
+
+// Integrates the IMU between fixes and snaps to each fix, taking heading from
+// the course between fixes once the car has moved far enough.
+export class DeadReckoningEstimator implements PoseEstimator {
+  ready = false
+
+  private t = NaN
+  private east = 0
+  private north = 0
+  private heading = 0
+  private speed = 0
+  private ax = 0
+  private ay = 0
+  private yawRate = 0
+  private courseEast = NaN
+  private courseNorth = NaN
+
+  reset() {
+    this.ready = false
+    this.t = NaN
+    this.east = this.north = this.heading = this.speed = 0
+    this.ax = this.ay = this.yawRate = 0
+    this.courseEast = this.courseNorth = NaN
+  }
+
+  predict(t: number, ax: number, ay: number, yawRate: number) {
+    const dt = Number.isNaN(this.t) ? 0 : t - this.t
+    this.t = t
+    this.ax = ax
+    this.ay = ay
+    this.yawRate = yawRate
+    this.heading += yawRate * dt
+    this.speed = Math.max(0, this.speed + ax * dt)
+    this.east += this.speed * Math.cos(this.heading) * dt
+    this.north += this.speed * Math.sin(this.heading) * dt
+  }
+
+  correct(t: number, east: number, north: number, speed: number) {
+    const dEast = east - this.courseEast
+    const dNorth = north - this.courseNorth
+    if (Number.isNaN(dEast) || dEast * dEast + dNorth * dNorth >= MIN_COURSE_DISTANCE ** 2) {
+      if (!Number.isNaN(dEast)) this.heading = Math.atan2(dNorth, dEast)
+      this.courseEast = east
+      this.courseNorth = north
+    }
+    this.t = t
+    this.east = east
+    this.north = north
+    this.speed = speed
+    this.ready = true
+  }
+
+  write(batch: PoseBatch, index: number) {
+    batch.t[index] = this.t
+    batch.east[index] = this.east
+    batch.north[index] = this.north
+    batch.heading[index] = this.heading
+    batch.speed[index] = this.speed
+    batch.ax[index] = this.ax
+    batch.ay[index] = this.ay
+    batch.yawRate[index] = this.yawRate
+  }
+}
+
+// Fixed-capacity FIFO of parallel Float64 columns
+class SampleRing {
+  readonly columns: Float64Array[]
+  head = 0
+  length = 0
+
+  constructor(
+    readonly capacity: number,
+    width: number
+  ) {
+    this.columns = Array.from({ length: width }, () => new Float64Array(capacity))
+  }
+
+  // Slot to write the next sample into; the caller makes sure there is room
+  push() {
+    const slot = (this.head + this.length) % this.capacity
+    this.length++
+    return slot
+  }
+
+  shift() {
+    const slot = this.head
+    this.head = (this.head + 1) % this.capacity
+    this.length--
+    return slot
+  }
+
+  clear() {
+    this.head = 0
+    this.length = 0
+  }
+}
+
+export interface SensorIngestOptions {
+  estimator?: PoseEstimator
+  // How far, in samples, one stream may run ahead of the other before the
+  // ingest stops waiting for it (e.g. IMU samples during a GPS dropout)
+  imuCapacity?: number
+  gpsCapacity?: number
+  // Rows per PoseBatch handed to subscribers
+  batchSize?: number
+  // Receiver latency subtracted from GPS timestamps, in seconds
+  gpsLatency?: number
+  // Projection origin; defaults to the first fix
+  origin?: { lat: number; lon: number }
+}
+
+export interface IngestStats {
+  imu: number
+  gps: number
+  poses: number
+  // Out-of-order samples, and samples that arrived after their time had been processed
+  dropped: number
+}
+
+export class SensorIngest {
+  readonly estimator: PoseEstimator
+  readonly stats: IngestStats = { imu: 0, gps: 0, poses: 0, dropped: 0 }
+  origin: { lat: number; lon: number } | null
+
+  private readonly fixedOrigin: { lat: number; lon: number } | null
+  private readonly gpsLatency: number
+  private readonly imu: SampleRing
+  private readonly gps: SampleRing
+  private readonly batch: PoseBatch
+  private readonly listeners = new Set<(batch: PoseBatch) => void>()
+  private kx = 0
+  private ky = 0
+  private lastImuT = -Infinity
+  private lastGpsT = -Infinity
+  private processedT = -Infinity
+
+  constructor(options: SensorIngestOptions = {}) {
+    this.estimator = options.estimator ?? new FusionFilter()
+    this.imu = new SampleRing(options.imuCapacity ?? 4096, 4)
+    this.gps = new SampleRing(options.gpsCapacity ?? 128, 5)
+    this.batch = new PoseBatch(options.batchSize ?? 1024)
+    this.gpsLatency = options.gpsLatency ?? 0
+    this.fixedOrigin = options.origin ?? null
+    this.origin = null
+    if (this.fixedOrigin) this.setOrigin(this.fixedOrigin.lat, this.fixedOrigin.lon)
+  }
+
+  pushImu(chunk: ImuChunk) {
+    const count = Math.min(chunk.t.length, chunk.ax.length, chunk.ay.length, chunk.yawRate.length)
+    const [t, ax, ay, yawRate] = this.imu.columns
+    for (let i = 0; i < count; i++) {
+      const time = chunk.t[i]
+      if (!(time > this.lastImuT && time > this.processedT)) {
+        this.stats.dropped++
+        continue
+      }
+      while (this.imu.length === this.imu.capacity) this.step()
+      const slot = this.imu.push()
+      t[slot] = time
+      ax[slot] = chunk.ax[i]
+      ay[slot] = chunk.ay[i]
+      yawRate[slot] = chunk.yawRate[i]
+      this.lastImuT = time
+      this.stats.imu++
+    }
+    this.drain()
+  }
+
+  pushGps(chunk: GpsChunk) {
+    const count = Math.min(
+      chunk.t.length,
+      chunk.lat.length,
+      chunk.lon.length,
+      chunk.speed.length,
+      chunk.hdop.length
+    )
+    const [t, east, north, speed, hdop] = this.gps.columns
+    for (let i = 0; i < count; i++) {
+      const time = chunk.t[i] - this.gpsLatency
+      if (!(time > this.lastGpsT && time > this.processedT)) {
+        this.stats.dropped++
+        continue
+      }
+      if (!this.origin) this.setOrigin(chunk.lat[i], chunk.lon[i])
+      while (this.gps.length === this.gps.capacity) this.step()
+      const slot = this.gps.push()
+      t[slot] = time
+      east[slot] = (chunk.lon[i] - this.origin!.lon) * this.kx
+      north[slot] = (chunk.lat[i] - this.origin!.lat) * this.ky
+      speed[slot] = chunk.speed[i]
+      hdop[slot] = chunk.hdop[i]
+      this.lastGpsT = time
+      this.stats.gps++
+    }
+    this.drain()
+  }
+
+  // Processes everything still buffered, e.g. at the end of a session
+  flush() {
+    while (this.imu.length > 0 || this.gps.length > 0) this.step()
+    this.emit()
+  }
+
+  // Called with each batch of poses; the batch is reused, so copy what you keep
+  subscribe(listener: (batch: PoseBatch) => void) {
+    this.listeners.add(listener)
+    return () => {
+      this.listeners.delete(listener)
+    }
+  }
+
+  reset() {
+    this.imu.clear()
+    this.gps.clear()
+    this.batch.length = 0
+    this.estimator.reset()
+    this.origin = null
+    if (this.fixedOrigin) this.setOrigin(this.fixedOrigin.lat, this.fixedOrigin.lon)
+    this.lastImuT = this.lastGpsT = this.processedT = -Infinity
+    this.stats.imu = this.stats.gps = this.stats.poses = this.stats.dropped = 0
+  }
+
+  private setOrigin(lat: number, lon: number) {
+    this.origin = { lat, lon }
+    this.kx = Math.cos(lat * DEG_TO_RAD) * EARTH_RADIUS_M * DEG_TO_RAD
+    this.ky = EARTH_RADIUS_M * DEG_TO_RAD
+  }
+
+  // Everything up to the older of the two newest timestamps is in order
+  private drain() {
+    const watermark = Math.min(this.lastImuT, this.lastGpsT)
+    const imuT = this.imu.columns[0]
+    const gpsT = this.gps.columns[0]
+    while (
+      (this.imu.length > 0 && imuT[this.imu.head] <= watermark) ||
+      (this.gps.length > 0 && gpsT[this.gps.head] <= watermark)
+    ) {
+      this.step()
+    }
+    this.emit()
+  }
+
+  // Feeds the earliest buffered sample to the estimator
+  private step() {
+    const imuTime = this.imu.length > 0 ? this.imu.columns[0][this.imu.head] : Infinity
+    const gpsTime = this.gps.length > 0 ? this.gps.columns[0][this.gps.head] : Infinity
+
+    if (gpsTime <= imuTime) {
+      const [, east, north, speed, hdop] = this.gps.columns
+      const slot = this.gps.shift()
+      this.estimator.correct(gpsTime, east[slot], north[slot], speed[slot], hdop[slot])
+      this.processedT = gpsTime
+      return
+    }
+
+    const columns = this.imu.columns
+    const slot = this.imu.shift()
+    this.estimator.predict(imuTime, columns[1][slot], columns[2][slot], columns[3][slot])
+    this.processedT = imuTime
+    if (!this.estimator.ready) return
+
+    this.estimator.write(this.batch, this.batch.length++)
+    this.stats.poses++
+    if (this.batch.length === this.batch.capacity) this.emit()
+  }
+
+  private emit() {
+    if (this.batch.length === 0) return
+    this.listeners.forEach((listener) => listener(this.batch))
+    this.batch.length = 0
+  }
+}
@@ -0,0 +1,126 @@
+// Live delta to the reference (best) lap. The reference is a table of lap
+// time at every `step` metres, so the lookup per sample is one index and one
+// interpolation. The lap in progress is recorded alongside; when it becomes
+// the new best, its table is built into a fresh buffer and swapped in whole,
+// so a delta is never read from a half-built reference. Replaced references
+// are never written to again, so a caller holding one keeps a valid lap.
+
+export interface ReferenceLap {
+  // Seconds into the lap at arc length i * step
+  time: Float64Array
+  step: number
+  lapTime: number
+}
+
+// Samples recorded per lap before the buffers grow; ~2 min at 100 Hz
+const INITIAL_RECORDING = 12000
+
+export class LapDelta {
+  readonly length: number
+  readonly step: number
+  // Current reference, or null before the first lap is promoted
+  reference: ReferenceLap | null = null
+  // Latest delta, seconds; positive is slower than the reference
+  delta = NaN
+
+  private recordedS = new Float64Array(INITIAL_RECORDING)
+  private recordedT = new Float64Array(INITIAL_RECORDING)
+  private recorded = 0
+  private lapStart = NaN
+  private lastS = 0
+
+  constructor(trackLength: number, step: number = 1) {
+    this.length = trackLength
+    this.step = step
+  }
+
+  // Predicted time for the lap in progress
+  get predictedLapTime() {
+    return this.reference ? this.reference.lapTime + this.delta : NaN
+  }
+
+  startLap(t: number) {
+    this.lapStart = t
+    this.recorded = 0
+    this.lastS = 0
+    this.delta = this.reference ? 0 : NaN
+  }
+
+  // One sample of the lap in progress: session time and arc length. Returns
+  // the delta, NaN without a reference. O(1).
+  push(t: number, s: number) {
+    if (Number.isNaN(this.lapStart)) return NaN
+    // Arc length only moves forwards within a lap: steps back are noise, and
+    // a jump of more than half a lap is the end of the previous lap showing
+    // before the position catches up with the line
+    if (s < this.lastS || s - this.lastS > this.length / 2) s = this.lastS
+    if (s > this.length) s = this.length
+    this.lastS = s
+    const elapsed = t - this.lapStart
+    this.record(s, elapsed)
+
+    const reference = this.reference
+    if (!reference) return NaN
+    const table = reference.time
+    const position = s / reference.step
+    let index = position | 0
+    if (index >= table.length - 1) index = table.length - 2
+    const f = position - index
+    this.delta = elapsed - (table[index] + (table[index + 1] - table[index]) * f)
+    return this.delta
+  }
+
+  // Ends the lap at time t; a lap to `promote` (a new best) becomes the
+  // reference
+  finishLap(t: number, promote: boolean) {
+    if (Number.isNaN(this.lapStart)) return
+    const lapTime = t - this.lapStart
+    if (promote) {
+      this.record(this.length, lapTime)
+      this.promote(lapTime)
+    }
+    this.lapStart = NaN
+  }
+
+  reset() {
+    this.reference = null
+    this.lapStart = NaN
+    this.recorded = 0
+    this.delta = NaN
+  }
+
+  private record(s: number, elapsed: number) {
+    if (this.recorded === this.recordedS.length) {
+      const grownS = new Float64Array(this.recorded * 2)
+      const grownT = new Float64Array(this.recorded * 2)
+      grownS.set(this.recordedS)
+      grownT.set(this.recordedT)
+      this.recordedS = grownS
+      this.recordedT = grownT
+    }
+    this.recordedS[this.recorded] = s
+    this.recordedT[this.recorded] = elapsed
+    this.recorded++
+  }
+
+  // Resamples the recording at every step into a new table, then swaps
+  private promote(lapTime: number) {
+    const s = this.recordedS
+    const t = this.recordedT
+    const count = this.recorded
+    if (count < 2) return
+    // Once per new best, so the allocation is off the per-sample path
+    const table = new Float64Array(Math.ceil(this.length / this.step) + 1)
+    let j = 0
+    for (let i = 0; i < table.length; i++) {
+      const target = Math.min(i * this.step, this.length)
+      while (j < count - 2 && s[j + 1] < target) j++
+      const span = s[j + 1] - s[j]
+      const f = span > 0 ? Math.max(0, Math.min(1, (target - s[j]) / span)) : 0
+      table[i] = t[j] + (t[j + 1] - t[j]) * f
+    }
+    table[0] = 0
+
+    this.reference = { time: table, step: this.step, lapTime }
+  }
+}
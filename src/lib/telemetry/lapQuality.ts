@@ -0,0 +1,152 @@
+// Streaming clean-lap classifier. Every sample of the lap in progress updates
+// a handful of running counters, so the verdict at the line is O(1) and laps
+// with traffic, offs, pit stops or bad GPS never reach the learned models.
+
+import type { TrackModel } from './track'
+
+export type LapIssue =
+  // Mean HDOP too high, or fixes missing for too long
+  | 'gps'
+  // Accelerations no tyre can produce: kerb strikes, impacts, a loose phone
+  | 'g-outlier'
+  // Fused speed jumping between samples, usually a filter reset
+  | 'speed-jump'
+  | 'off-track'
+  // Part of the lap never seen, e.g. a pit lane or a cut
+  | 'incomplete'
+  // Much slower than the best clean lap: traffic, cool-down or pit laps
+  | 'slow'
+  | 'stopped'
+
+export interface LapVerdict {
+  accepted: boolean
+  // Share of the lap covered and not flagged; 1 for a spotless lap
+  score: number
+  issues: LapIssue[]
+  lapTime: number
+}
+
+const MAX_MEAN_HDOP = 2.5
+// Longest gap between fixes, seconds
+const MAX_FIX_GAP = 1
+// Combined acceleration beyond ~2.5 g, m/s²
+const MAX_ACCELERATION = 25
+// Speed changes beyond what any tyre allows (m/s²) plus room for the steps
+// GPS corrections put into the fused speed (m/s)
+const MAX_SPEED_RATE = 30
+const MAX_SPEED_STEP = 3
+// Past the edge by more than half a car, metres
+const OFF_TRACK_MARGIN = 1
+// Built models only know the spread of the lines driven so far, which after
+// a lap or two is far narrower than the track. No circuit is narrower than
+// 8 m, so the edge is taken to be at least this far from the centreline.
+const MIN_TRACK_HALF_WIDTH = 4
+// Seconds a lap may spend flagged before it is rejected for it
+const MAX_OUTLIER_TIME = 0.1
+const MAX_OFF_TRACK_TIME = 0.5
+// Arc length is checked in bins of this many metres
+const COVERAGE_BIN = 10
+const MIN_COVERAGE = 0.95
+// Laps slower than this multiple of the best clean lap are rejected
+const SLOW_LAP_RATIO = 1.1
+const STOPPED_SPEED = 2
+
+export class LapQualityClassifier {
+  readonly model: TrackModel
+  // Fastest accepted lap so far, seconds
+  bestLapTime = Infinity
+
+  private readonly covered: Uint8Array
+  private startT = NaN
+  private lastT = NaN
+  private lastSpeed = NaN
+  private lastFixT = NaN
+  private coveredBins = 0
+  private seconds = 0
+  private hdopSum = 0
+  private fixes = 0
+  private maxFixGap = 0
+  private outlierTime = 0
+  private offTrackTime = 0
+  private speedJumps = 0
+  private minSpeed = Infinity
+
+  constructor(model: TrackModel) {
+    this.model = model
+    this.covered = new Uint8Array(Math.ceil(model.length / COVERAGE_BIN))
+  }
+
+  // Starts a lap at time t, the moment the line was crossed
+  startLap(t: number) {
+    this.covered.fill(0)
+    this.startT = t
+    this.lastT = NaN
+    this.lastSpeed = NaN
+    this.lastFixT = t
+    this.coveredBins = 0
+    this.seconds = 0
+    this.hdopSum = 0
+    this.fixes = 0
+    this.maxFixGap = 0
+    this.outlierTime = 0
+    this.offTrackTime = 0
+    this.speedJumps = 0
+    this.minSpeed = Infinity
+  }
+
+  pushFix(t: number, hdop: number) {
+    this.maxFixGap = Math.max(this.maxFixGap, t - this.lastFixT)
+    this.lastFixT = t
+    this.hdopSum += hdop
+    this.fixes++
+  }
+
+  // One fused sample: arc length and offset from the track index, speed and
+  // vehicle-frame accelerations from the pose
+  push(t: number, s: number, offset: number, speed: number, ax: number, ay: number) {
+    const dt = t - this.lastT
+    this.lastT = t
+    if (dt > 0) {
+      this.seconds += dt
+      if (ax * ax + ay * ay > MAX_ACCELERATION * MAX_ACCELERATION) this.outlierTime += dt
+      if (Math.abs(speed - this.lastSpeed) > MAX_SPEED_STEP + MAX_SPEED_RATE * dt) {
+        this.speedJumps++
+      }
+      const station = Math.min(this.model.x.length - 1, Math.max(0, (s / this.model.step) | 0))
+      const width = offset > 0 ? this.model.widthLeft[station] : this.model.widthRight[station]
+      const edge = Math.max(width, MIN_TRACK_HALF_WIDTH)
+      if (Math.abs(offset) > edge + OFF_TRACK_MARGIN) this.offTrackTime += dt
+    }
+    this.lastSpeed = speed
+    this.minSpeed = Math.min(this.minSpeed, speed)
+
+    const bin = (s / COVERAGE_BIN) | 0
+    if (bin >= 0 && bin < this.covered.length && this.covered[bin] === 0) {
+      this.covered[bin] = 1
+      this.coveredBins++
+    }
+  }
+
+  // Verdict for the lap that ended at time t. Accepted laps become the
+  // reference for the slow-lap check when they are the fastest so far.
+  finishLap(t: number): LapVerdict {
+    const lapTime = t - this.startT
+    const issues: LapIssue[] = []
+    this.maxFixGap = Math.max(this.maxFixGap, t - this.lastFixT)
+    const meanHdop = this.fixes > 0 ? this.hdopSum / this.fixes : Infinity
+    if (meanHdop > MAX_MEAN_HDOP || this.maxFixGap > MAX_FIX_GAP) issues.push('gps')
+    if (this.outlierTime > MAX_OUTLIER_TIME) issues.push('g-outlier')
+    if (this.speedJumps > 0) issues.push('speed-jump')
+    if (this.offTrackTime > MAX_OFF_TRACK_TIME) issues.push('off-track')
+    if (this.coveredBins < MIN_COVERAGE * this.covered.length) issues.push('incomplete')
+    if (lapTime > SLOW_LAP_RATIO * this.bestLapTime) issues.push('slow')
+    if (this.minSpeed < STOPPED_SPEED) issues.push('stopped')
+
+    const flagged = this.seconds > 0 ? (this.outlierTime + this.offTrackTime) / this.seconds : 1
+    const score = (this.coveredBins / this.covered.length) * Math.max(0, 1 - flagged)
+
+    const accepted = issues.length === 0
+    if (accepted) this.bestLapTime = Math.min(this.bestLapTime, lapTime)
+    return { accepted, score, issues, lapTime }
+  }
+}
@@ -0,0 +1,197 @@
+// Lap and sector timing from gate crossings. Each sample tests the path
+// since the previous sample against the next gate due and the start/finish
+// line, so the cost per sample is constant however long the session runs.
+// Crossing times are interpolated between samples, using the speeds at both
+// ends when they are known.
+
+import type { TrackGate, TrackModel } from './track'
+
+export interface LapRecord {
+  // 1 for the first timed lap
+  lap: number
+  // Session time the lap started, seconds
+  start: number
+  time: number
+  // One per sector, NaN where a gate was missed
+  sectors: number[]
+  // False when a sector gate was missed, e.g. in a GPS dropout
+  complete: boolean
+}
+
+// Crossings of start/finish sooner than this after the last one (seconds)
+// are GPS jitter around the line
+const MIN_LAP_TIME = 10
+
+export class LapTimer {
+  readonly model: TrackModel
+  readonly laps: LapRecord[] = []
+  // Index into laps of the fastest complete lap, -1 until there is one
+  bestLap = -1
+  // Best time in each sector; together they make the theoretical best lap
+  readonly bestSectors: number[]
+
+  // Sector gates in driving order, then start/finish
+  private readonly gates: TrackGate[]
+  private readonly directionX: Float64Array
+  private readonly directionY: Float64Array
+  private readonly listeners = new Set<(lap: LapRecord) => void>()
+  private readonly sectorListeners = new Set<(sector: number, time: number) => void>()
+  // Gate due next; only meaningful once a lap has started
+  private nextGate = 0
+  private lapStart = NaN
+  private lastCrossing = NaN
+  private sectors: number[] = []
+  private lastT = NaN
+  private lastEast = 0
+  private lastNorth = 0
+  private lastSpeed = NaN
+
+  constructor(model: TrackModel) {
+    this.model = model
+    this.gates = [...model.sectors, model.startFinish]
+    this.bestSectors = this.gates.map(() => Infinity)
+    // Direction of travel at each gate, to ignore crossings going backwards
+    this.directionX = Float64Array.from(this.gates, (gate) => Math.cos(model.heading[gate.index]))
+    this.directionY = Float64Array.from(this.gates, (gate) => Math.sin(model.heading[gate.index]))
+  }
+
+  get timing() {
+    return !Number.isNaN(this.lapStart)
+  }
+
+  get theoreticalBest() {
+    return this.bestSectors.reduce((sum, time) => sum + time, 0)
+  }
+
+  subscribe(listener: (lap: LapRecord) => void) {
+    this.listeners.add(listener)
+    return () => {
+      this.listeners.delete(listener)
+    }
+  }
+
+  subscribeSectors(listener: (sector: number, time: number) => void) {
+    this.sectorListeners.add(listener)
+    return () => {
+      this.sectorListeners.delete(listener)
+    }
+  }
+
+  // One position, in metres east/north of the model's origin, with the
+  // speed there if known. Returns the lap it completed, if any.
+  push(t: number, east: number, north: number, speed: number = NaN): LapRecord | null {
+    const previousT = this.lastT
+    const x0 = this.lastEast
+    const y0 = this.lastNorth
+    const v0 = this.lastSpeed
+    this.lastT = t
+    this.lastEast = east
+    this.lastNorth = north
+    this.lastSpeed = speed
+    if (!(t > previousT)) return null
+
+    const finish = this.gates.length - 1
+    if (this.timing && this.nextGate !== finish) {
+      const crossing = this.crossing(this.nextGate, x0, y0, east, north)
+      if (crossing >= 0) {
+        const time = interpolate(previousT, t, crossing, v0, speed)
+        this.splitSector(time)
+        this.nextGate++
+      }
+    }
+
+    const crossing = this.crossing(finish, x0, y0, east, north)
+    if (crossing < 0) return null
+    const time = interpolate(previousT, t, crossing, v0, speed)
+    if (time - this.lastCrossing < MIN_LAP_TIME) return null
+    this.lastCrossing = time
+    const lap = this.timing ? this.finishLap(time) : null
+    this.lapStart = time
+    this.sectors = []
+    this.nextGate = 0
+    return lap
+  }
+
+  reset() {
+    this.laps.length = 0
+    this.bestLap = -1
+    this.bestSectors.fill(Infinity)
+    this.nextGate = 0
+    this.lapStart = this.lastCrossing = this.lastT = NaN
+    this.sectors = []
+  }
+
+  // Where along the path from (x0, y0) to (x1, y1), as a fraction, it
+  // crosses gate g in the driving direction; -1 if it doesn't
+  private crossing(g: number, x0: number, y0: number, x1: number, y1: number) {
+    const gate = this.gates[g]
+    const dx = x1 - x0
+    const dy = y1 - y0
+    if (dx * this.directionX[g] + dy * this.directionY[g] <= 0) return -1
+    const gx = gate.x2 - gate.x1
+    const gy = gate.y2 - gate.y1
+    const denominator = dx * gy - dy * gx
+    if (denominator === 0) return -1
+    const ox = gate.x1 - x0
+    const oy = gate.y1 - y0
+    const along = (ox * gy - oy * gx) / denominator
+    const across = (ox * dy - oy * dx) / denominator
+    return along >= 0 && along < 1 && across >= 0 && across <= 1 ? along : -1
+  }
+
+  private splitSector(time: number) {
+    const sector = this.sectors.length
+    const start = sector === 0 ? this.lapStart : this.lapStart + this.sectorSum()
+    const split = time - start
+    this.sectors.push(split)
+    this.sectorListeners.forEach((listener) => listener(sector, split))
+  }
+
+  private finishLap(time: number): LapRecord {
+    // Sectors whose gates were missed count as unknown
+    const finish = this.gates.length - 1
+    const complete = this.nextGate === finish
+    while (this.sectors.length < finish) this.sectors.push(NaN)
+    const last = time - this.lapStart - (complete ? this.sectorSum() : 0)
+    this.sectors.push(complete ? last : NaN)
+    if (complete) this.sectorListeners.forEach((listener) => listener(finish, last))
+
+    const record: LapRecord = {
+      lap: this.laps.length + 1,
+      start: this.lapStart,
+      time: time - this.lapStart,
+      sectors: this.sectors,
+      complete,
+    }
+    this.laps.push(record)
+    if (complete) {
+      const best = this.bestLap >= 0 ? this.laps[this.bestLap].time : Infinity
+      if (record.time < best) this.bestLap = this.laps.length - 1
+      record.sectors.forEach((split, i) => {
+        this.bestSectors[i] = Math.min(this.bestSectors[i], split)
+      })
+    }
+    this.listeners.forEach((listener) => listener(record))
+    return record
+  }
+
+  private sectorSum() {
+    let sum = 0
+    for (const split of this.sectors) sum += split
+    return sum
+  }
+}
+
+// Time at distance fraction f between two samples. With both speeds known
+// the car is taken to accelerate uniformly, so the fraction of time differs
+// from the fraction of distance when it is braking or accelerating.
+function interpolate(t0: number, t1: number, f: number, v0: number, v1: number) {
+  const dt = t1 - t0
+  if (!(v0 > 0 && v1 > 0) || v0 === v1) return t0 + f * dt
+  // Distance fraction covered by time fraction τ:
+  // (v0 τ + (v1 − v0) τ² / 2) / ((v0 + v1) / 2) = f
+  const a = (v1 - v0) / 2
+  const c = (f * (v0 + v1)) / 2
+  const tau = (2 * c) / (v0 + Math.sqrt(v0 * v0 + 4 * a * c))
+  return t0 + tau * dt
+}
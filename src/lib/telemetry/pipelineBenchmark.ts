@@ -0,0 +1,324 @@
+import { BenchEnvironment, benchEnvironment } from '@/lib/bench/results'
+import { SampleSummary, summarize } from '@/lib/bench/stats'
+import {
+  SyntheticSession,
+  syntheticCircuits,
+  syntheticTrackModel,
+} from '@/lib/bench/syntheticSession'
+import { FusionFilter } from './fusion'
+import type { FixChunk } from './fusion'
+import { PoseBatch } from './ingest'
+import type { GpsChunk, ImuChunk } from './ingest'
+import { ReplayPipeline, SensorRecording } from './replay'
+import type { SensorSource } from './replay'
+import type { TrackModel } from './track'
+import { projectToPlane } from './trace'
+
+export type PipelineStage = 'ingest' | 'fusion' | 'projection' | 'envelope' | 'voice'
+
+// Live from the generator, a replay of a recording of that same synthetic
+// data, or a session recorded on a real track passed in as `recordings`
+export type PipelineSource = 'synthetic' | 'replayed-synthetic' | 'recorded'
+
+export interface PipelineStageResult {
+  stage: PipelineStage
+  // What one measurement covers: a one-second chunk of data, or a lap
+  per: 'chunk' | 'lap'
+  ms: SampleSummary
+  // The p99 may not exceed this
+  budgetMs: number
+  failed: boolean
+}
+
+export interface PipelineBenchmarkResult {
+  circuit: string
+  source: PipelineSource
+  laps: number
+  messages: number
+  // Raw sensor samples (IMU + GPS) through the live pipeline per second
+  samplesPerSecond: number
+  realtimeFactor: number
+  stages: PipelineStageResult[]
+  // Replay digest; a synthetic circuit's recorded run must match its live one
+  digest: string
+  // The known-good outcome for this circuit and length, if there is one
+  expected: PipelineExpectation | null
+  matchesExpected: boolean | null
+}
+
+export interface PipelineExpectation {
+  digest: string
+  laps: number
+  messages: number
+}
+
+export interface PipelineBenchmarkReport {
+  environment: BenchEnvironment
+  seconds: number
+  budgets: Record<PipelineStage, number>
+  // Whether every synthetic circuit's recording replayed to its live run
+  deterministic: boolean
+  failed: boolean
+  results: PipelineBenchmarkResult[]
+}
+
+// A session recorded on a real track, with the model it was driven on.
+// Chunks should hold about a second each, as the chunk budgets assume.
+export interface PipelineRecording {
+  name: string
+  model: TrackModel
+  recording: SensorRecording
+}
+
+interface PipelineBenchmarkOptions {
+  seconds?: number
+  circuits?: string[]
+  // Recorded sessions measured after the synthetic circuits, in full
+  recordings?: PipelineRecording[]
+  budgets?: Partial<Record<PipelineStage, number>>
+}
+
+// p99 budgets in ms: per one-second chunk of 1 kHz IMU + 25 Hz GPS, and per
+// lap for the envelope check and learning. A few times what a desktop
+// browser measures, so real regressions fail and run-to-run noise doesn't.
+const DEFAULT_BUDGETS: Record<PipelineStage, number> = {
+  // Ring buffers, time alignment and fusion, as run live
+  ingest: 10,
+  // The filter alone, through its batch API
+  fusion: 8,
+  // Track projection, lap timing and lap quality on the decimated samples
+  projection: 5,
+  envelope: 20,
+  voice: 5,
+}
+
+// Known-good outcomes of the synthetic circuits, by circuit and run length
+// in seconds. The generator is seeded, so any change here is a change in
+// pipeline behaviour: check it was meant, then update the values.
+const EXPECTED: Record<string, Record<number, PipelineExpectation>> = {
+  karting: {
+    300: { digest: '9307de7c', laps: 5, messages: 0 },
+    600: { digest: '1306688d', laps: 11, messages: 2 },
+  },
+  club: {
+    300: { digest: '18921fc5', laps: 3, messages: 0 },
+    600: { digest: '5ba8d47d', laps: 7, messages: 0 },
+  },
+  long: {
+    300: { digest: '9b7a87e6', laps: 1, messages: 0 },
+    600: { digest: '0c2c4230', laps: 4, messages: 0 },
+  },
+}
+
+// Shortest synthetic run: long enough for every circuit to finish a lap, so
+// the envelope stage is timed on each. Shorter requests are raised to it.
+const MIN_SECONDS = 300
+
+// Seconds of data run unmeasured before the suite, and chunks at the start
+// of each run left out of the timings, while the JIT settles; short
+// recordings skip at most a quarter of their chunks
+const WARMUP_SECONDS = 120
+const WARMUP_CHUNKS = 20
+
+const stages: PipelineStage[] = ['ingest', 'fusion', 'projection', 'envelope', 'voice']
+
+// Runs every circuit through the replay pipeline twice: live from the
+// synthetic generator, then replayed from a recording of the same data.
+// Any recorded sessions passed in are replayed after them. Each stage is
+// timed on its own and checked against its budget.
+export async function runPipelineBenchmark({
+  seconds: requested = 600,
+  circuits = syntheticCircuits.map((circuit) => circuit.name),
+  recordings = [],
+  budgets = {},
+}: PipelineBenchmarkOptions = {}): Promise<PipelineBenchmarkReport> {
+  const seconds = Math.max(MIN_SECONDS, Math.floor(requested))
+  const limits = { ...DEFAULT_BUDGETS, ...budgets }
+  const results: PipelineBenchmarkResult[] = []
+  let deterministic = true
+
+  // One unmeasured run first, so the first circuit isn't timed cold
+  const warmup = new SyntheticSession(syntheticCircuits[0])
+  const warmupModel = syntheticTrackModel(warmup.track)
+  const warmupSource = liveSource(warmup, WARMUP_SECONDS)
+  measure('warmup', 'synthetic', warmupSource, warmupModel, WARMUP_SECONDS, limits)
+
+  for (const circuit of syntheticCircuits) {
+    if (!circuits.includes(circuit.name)) continue
+    // The generator is seeded, so a second session gives the same data to
+    // record, without the recording's allocations landing in the live run
+    const session = new SyntheticSession(circuit)
+    const model = syntheticTrackModel(session.track)
+    const live = liveSource(session, seconds)
+    const copy = new SyntheticSession(circuit)
+    const recording = new SensorRecording(copy.origin)
+    for (let chunk = 0; chunk < seconds; chunk++) {
+      const { imu, gps } = copy.next()
+      recording.append(imu, gps)
+    }
+
+    let digest = ''
+    for (const [source, data] of [
+      ['synthetic', live],
+      ['replayed-synthetic', recording],
+    ] as const) {
+      // Let the event loop breathe between runs so GC can run outside the window
+      await new Promise((resolve) => setTimeout(resolve, 50))
+      const result = measure(circuit.name, source, data, model, seconds, limits)
+      const expected = EXPECTED[circuit.name]?.[seconds] ?? null
+      result.expected = expected
+      result.matchesExpected = expected && matches(result, expected)
+      if (source === 'synthetic') digest = result.digest
+      else if (result.digest !== digest) deterministic = false
+      results.push(result)
+    }
+  }
+
+  for (const { name, model, recording } of recordings) {
+    await new Promise((resolve) => setTimeout(resolve, 50))
+    recording.rewind()
+    results.push(measure(name, 'recorded', recording, model, recording.chunkCount, limits))
+  }
+
+  const failed =
+    !deterministic ||
+    results.some(
+      (result) =>
+        result.matchesExpected === false || result.stages.some((stage) => stage.failed)
+    )
+  return {
+    environment: benchEnvironment(),
+    seconds,
+    budgets: limits,
+    deterministic,
+    failed,
+    results,
+  }
+}
+
+function matches(result: PipelineBenchmarkResult, expected: PipelineExpectation) {
+  return (
+    result.digest === expected.digest &&
+    result.laps === expected.laps &&
+    result.messages === expected.messages
+  )
+}
+
+// Generates the session chunk by chunk as it is consumed
+function liveSource(session: SyntheticSession, seconds: number): SensorSource {
+  let chunks = 0
+  return {
+    origin: session.origin,
+    next: () => (chunks++ < seconds ? session.next() : null),
+  }
+}
+
+function measure(
+  circuit: string,
+  source: PipelineSource,
+  data: SensorSource,
+  model: TrackModel,
+  // Chunks the source holds, one second each
+  seconds: number,
+  budgets: Record<PipelineStage, number>
+): PipelineBenchmarkResult {
+  const pipeline = new ReplayPipeline(model, data.origin)
+  const warmupChunks = Math.min(WARMUP_CHUNKS, Math.floor(seconds / 4))
+  const timings = Object.fromEntries(
+    stages.map((stage) => [stage, new Float64Array(seconds)])
+  ) as Record<PipelineStage, Float64Array>
+  let chunks = 0
+  let lapsTimed = 0
+  let samples = 0
+  let pipelineMs = 0
+
+  // A second filter, fed the same data through processBatch, times fusion
+  // on its own; the pipeline's own filter runs inside the ingest stage
+  const filter = new FusionFilter()
+  let poses = new PoseBatch(1000)
+  let east = new Float64Array(64)
+  let north = new Float64Array(64)
+  const fuseAlone = (imu: ImuChunk, gps: GpsChunk) => {
+    const count = gps.t.length
+    if (count > east.length) {
+      east = new Float64Array(count)
+      north = new Float64Array(count)
+    }
+    if (imu.t.length > poses.capacity) poses = new PoseBatch(imu.t.length)
+    projectToPlane(gps.lat, gps.lon, count, east, north, data.origin.lat, data.origin.lon)
+    const fixes: FixChunk = {
+      t: gps.t,
+      east: east.subarray(0, count),
+      north: north.subarray(0, count),
+      speed: gps.speed,
+      hdop: gps.hdop,
+    }
+    poses.length = 0
+    filter.processBatch(imu, fixes, poses)
+  }
+
+  for (let chunk = data.next(); chunk; chunk = data.next()) {
+    const { imu, gps } = chunk
+    const timed = chunks >= warmupChunks
+    if (timed) samples += imu.t.length + gps.t.length
+
+    let start = performance.now()
+    pipeline.fuse(imu, gps)
+    const ingestMs = performance.now() - start
+
+    start = performance.now()
+    fuseAlone(imu, gps)
+    const fusionMs = performance.now() - start
+
+    start = performance.now()
+    pipeline.track()
+    const projectionMs = performance.now() - start
+
+    const laps = pipeline.laps.length
+    start = performance.now()
+    pipeline.learn()
+    const envelopeMs = performance.now() - start
+
+    start = performance.now()
+    pipeline.decide()
+    const voiceMs = performance.now() - start
+
+    pipeline.hashSamples()
+    chunks++
+    if (!timed) continue
+    const at = chunks - warmupChunks - 1
+    timings.ingest[at] = ingestMs
+    timings.fusion[at] = fusionMs
+    timings.projection[at] = projectionMs
+    timings.voice[at] = voiceMs
+    if (pipeline.laps.length > laps) timings.envelope[lapsTimed++] = envelopeMs
+    pipelineMs += ingestMs + projectionMs + envelopeMs + voiceMs
+  }
+  pipeline.process(null, null)
+  const timedChunks = Math.max(0, chunks - warmupChunks)
+
+  return {
+    circuit,
+    source,
+    laps: pipeline.laps.length,
+    messages: pipeline.messages.length,
+    samplesPerSecond: pipelineMs > 0 ? Math.round(samples / (pipelineMs / 1000)) : 0,
+    realtimeFactor: pipelineMs > 0 ? Math.round((timedChunks * 1000) / pipelineMs) : 0,
+    stages: stages.map((stage): PipelineStageResult => {
+      const count = stage === 'envelope' ? lapsTimed : timedChunks
+      const ms = summarize(timings[stage], count)
+      return {
+        stage,
+        per: stage === 'envelope' ? 'lap' : 'chunk',
+        ms,
+        budgetMs: budgets[stage],
+        // Nothing timed means the budget went unchecked, which isn't a pass;
+        // the envelope stage needs a run long enough to finish a lap
+        failed: count === 0 || ms.p99 > budgets[stage],
+      }
+    }),
+    digest: pipeline.digest,
+    expected: null,
+    matchesExpected: null,
+  }
+}
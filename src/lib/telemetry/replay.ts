@@ -0,0 +1,471 @@
+// Deterministic session replay. Recorded sensor data is fed through the same
+// stages as a live session: fusion, track projection, lap timing and quality,
+// envelope and corner learning, and the voice coach. The stages are built
+// fresh for every run and only ever see session time, so the outputs are
+// bit-identical however fast the replay runs; pacing at 1x or Nx only adds
+// waits between chunks.
+
+import type { CoachMessage } from './coach'
+import { VoiceCoach } from './coach'
+import { CornerLearner } from './cornerLearning'
+import { trackCorners } from './corners'
+import { GripEnvelope, smoothSamples } from './envelope'
+import type { EnvelopeCheck } from './envelope'
+import { SensorIngest } from './ingest'
+import type { GpsChunk, ImuChunk, PoseBatch } from './ingest'
+import { LapQualityClassifier } from './lapQuality'
+import type { LapVerdict } from './lapQuality'
+import { LapTimer } from './lapTiming'
+import type { LapRecord } from './lapTiming'
+import type { TrackModel } from './track'
+import { TrackCursor, TrackIndex } from './trackIndex'
+
+// Raw sensor data in session order. Chunks may be views that the next call
+// reuses.
+export interface SensorSource {
+  readonly origin: { lat: number; lon: number }
+  next(): { imu: ImuChunk; gps: GpsChunk } | null
+}
+
+// A session's raw sensor chunks held in memory, e.g. captured from a live
+// ingest or a synthetic session, to be replayed any number of times
+export class SensorRecording implements SensorSource {
+  readonly origin: { lat: number; lon: number }
+  private readonly chunks: { imu: ImuChunk; gps: GpsChunk }[] = []
+  private position = 0
+
+  constructor(origin: { lat: number; lon: number }) {
+    this.origin = origin
+  }
+
+  // Chunks recorded, each one a next() call
+  get chunkCount() {
+    return this.chunks.length
+  }
+
+  // Seconds of data recorded, by IMU time
+  get duration() {
+    const first = this.chunks[0]?.imu.t
+    const last = this.chunks[this.chunks.length - 1]?.imu.t
+    return first && last && last.length > 0 ? last[last.length - 1] - first[0] : 0
+  }
+
+  // Copies one chunk of each stream, so the caller may reuse its buffers
+  append(imu: ImuChunk, gps: GpsChunk) {
+    this.chunks.push({
+      imu: {
+        t: Float64Array.from(imu.t),
+        ax: Float64Array.from(imu.ax),
+        ay: Float64Array.from(imu.ay),
+        yawRate: Float64Array.from(imu.yawRate),
+      },
+      gps: {
+        t: Float64Array.from(gps.t),
+        lat: Float64Array.from(gps.lat),
+        lon: Float64Array.from(gps.lon),
+        speed: Float64Array.from(gps.speed),
+        hdop: Float64Array.from(gps.hdop),
+      },
+    })
+  }
+
+  next() {
+    return this.position < this.chunks.length ? this.chunks[this.position++] : null
+  }
+
+  rewind() {
+    this.position = 0
+  }
+}
+
+export interface ReplayLap {
+  record: LapRecord
+  verdict: LapVerdict
+  // Envelope check against what had been learned before the lap; null for
+  // rejected laps, which are never learned from
+  check: EnvelopeCheck | null
+}
+
+export interface ReplayResult {
+  laps: ReplayLap[]
+  messages: CoachMessage[]
+  // Samples after decimation, and session seconds covered
+  samples: number
+  duration: number
+  wallMs: number
+  // FNV-1a over every sample, lap and message; equal digests mean equal runs
+  digest: string
+}
+
+export interface ReplayOptions {
+  // Multiple of real time; Infinity runs as fast as the stages allow
+  speed?: number
+  signal?: AbortSignal
+}
+
+// Fused poses are box-averaged down to this period (100 Hz) before the track
+// stages, which is plenty for timing and learning and keeps 1 kHz IMU cheap
+const SAMPLE_PERIOD = 0.01
+// Samples held per lap before the buffers grow; ~2 min at 100 Hz
+const INITIAL_LAP_SAMPLES = 12000
+// Smoothing of lap accelerations before learning, ±samples
+const LEARN_HALF_WIDTH = 2
+// At full speed, hand the event loop back this often (ms of work)
+const YIELD_INTERVAL = 50
+const FNV_OFFSET = 0x811c9dc5
+const FNV_PRIME = 0x01000193
+
+// Growable columns of decimated samples
+class SampleColumns {
+  t: Float64Array
+  east: Float64Array
+  north: Float64Array
+  speed: Float64Array
+  ax: Float64Array
+  ay: Float64Array
+  s: Float64Array
+  offset: Float64Array
+  length = 0
+
+  constructor(capacity: number) {
+    this.t = new Float64Array(capacity)
+    this.east = new Float64Array(capacity)
+    this.north = new Float64Array(capacity)
+    this.speed = new Float64Array(capacity)
+    this.ax = new Float64Array(capacity)
+    this.ay = new Float64Array(capacity)
+    this.s = new Float64Array(capacity)
+    this.offset = new Float64Array(capacity)
+  }
+
+  // Index of a new row, growing the columns when full
+  push() {
+    if (this.length === this.t.length) {
+      const capacity = this.length * 2
+      this.t = grow(this.t, capacity)
+      this.east = grow(this.east, capacity)
+      this.north = grow(this.north, capacity)
+      this.speed = grow(this.speed, capacity)
+      this.ax = grow(this.ax, capacity)
+      this.ay = grow(this.ay, capacity)
+      this.s = grow(this.s, capacity)
+      this.offset = grow(this.offset, capacity)
+    }
+    return this.length++
+  }
+}
+
+function grow(column: Float64Array, capacity: number) {
+  const grown = new Float64Array(capacity)
+  grown.set(column)
+  return grown
+}
+
+// The live pipeline, one chunk of raw sensor data at a time. Each stage is
+// a method so benchmarks can time them separately; process() runs them all.
+export class ReplayPipeline {
+  readonly model: TrackModel
+  readonly ingest: SensorIngest
+  readonly cursor: TrackCursor
+  readonly timer: LapTimer
+  readonly quality: LapQualityClassifier
+  readonly envelope: GripEnvelope
+  readonly learner: CornerLearner
+  readonly coach: VoiceCoach
+  readonly laps: ReplayLap[] = []
+  readonly messages: CoachMessage[] = []
+  // Decimated samples of the current chunk
+  readonly samples = new SampleColumns(256)
+  sampleCount = 0
+
+  // The lap in progress, and the last finished one waiting for the learning
+  // stage with its accelerations smoothed
+  private readonly lap = new SampleColumns(INITIAL_LAP_SAMPLES)
+  private readonly finished: ReplayLap[] = []
+  private finishedS = new Float64Array(INITIAL_LAP_SAMPLES)
+  private finishedSpeed = new Float64Array(INITIAL_LAP_SAMPLES)
+  private finishedOffset = new Float64Array(INITIAL_LAP_SAMPLES)
+  private finishedAx = new Float64Array(INITIAL_LAP_SAMPLES)
+  private finishedAy = new Float64Array(INITIAL_LAP_SAMPLES)
+  private finishedCount = 0
+  // GPS fixes of the current chunk, for the lap quality stage
+  private fixT = new Float64Array(64)
+  private fixHdop = new Float64Array(64)
+  private fixCount = 0
+  // Running box average down to SAMPLE_PERIOD
+  private bin = NaN
+  private binAx = 0
+  private binAy = 0
+  private binSpeed = 0
+  private binPoses = 0
+  private lastT = 0
+  private lastEast = 0
+  private lastNorth = 0
+  private hash = FNV_OFFSET
+
+  constructor(model: TrackModel, origin: { lat: number; lon: number }) {
+    this.model = model
+    this.ingest = new SensorIngest({ origin: model.origin ?? origin })
+    this.ingest.subscribe((batch) => this.decimate(batch))
+    this.cursor = new TrackCursor(new TrackIndex(model))
+    this.timer = new LapTimer(model)
+    this.quality = new LapQualityClassifier(model)
+    const corners = trackCorners(model)
+    this.envelope = new GripEnvelope(model, corners.zones)
+    this.learner = new CornerLearner(model, corners.zones)
+    this.coach = new VoiceCoach(corners, this.envelope, this.learner)
+  }
+
+  get digest() {
+    return (this.hash >>> 0).toString(16).padStart(8, '0')
+  }
+
+  // All stages for one chunk; a null chunk flushes the end of the session
+  process(imu: ImuChunk | null, gps: GpsChunk | null) {
+    this.fuse(imu, gps)
+    this.track()
+    this.learn()
+    this.decide()
+    this.hashSamples()
+  }
+
+  // Stage 1: ingest and fusion, then decimation of the poses
+  fuse(imu: ImuChunk | null, gps: GpsChunk | null) {
+    this.samples.length = 0
+    this.fixCount = 0
+    if (gps) {
+      const count = gps.t.length
+      if (count > this.fixT.length) {
+        this.fixT = new Float64Array(count)
+        this.fixHdop = new Float64Array(count)
+      }
+      this.fixT.set(gps.t)
+      this.fixHdop.set(gps.hdop)
+      this.fixCount = count
+      this.ingest.pushGps(gps)
+    }
+    if (imu) this.ingest.pushImu(imu)
+    if (!imu && !gps) {
+      this.ingest.flush()
+      if (this.binPoses > 0) this.emitBin()
+    }
+    this.sampleCount += this.samples.length
+  }
+
+  // Stage 2: track projection, lap timing and lap quality
+  track() {
+    const { samples, cursor, timer, quality, lap } = this
+    let fix = 0
+    for (let i = 0; i < samples.length; i++) {
+      const t = samples.t[i]
+      while (fix < this.fixCount && this.fixT[fix] <= t) {
+        quality.pushFix(this.fixT[fix], this.fixHdop[fix])
+        fix++
+      }
+      const position = cursor.update(samples.east[i], samples.north[i])
+      samples.s[i] = position.s
+      samples.offset[i] = position.offset
+
+      const wasTiming = timer.timing
+      const record = timer.push(t, samples.east[i], samples.north[i], samples.speed[i])
+      if (record) {
+        // Only one finished lap is held, so with chunks longer than a lap
+        // the previous one is learned from first
+        if (this.finished.length > 0) this.learn()
+        const end = record.start + record.time
+        this.finished.push({ record, verdict: quality.finishLap(end), check: null })
+        this.holdLap()
+      }
+      if (record || (!wasTiming && timer.timing)) {
+        quality.startLap(record ? record.start + record.time : t)
+        lap.length = 0
+      }
+      if (!timer.timing) continue
+      quality.push(t, position.s, position.offset, samples.speed[i], samples.ax[i], samples.ay[i])
+      const row = lap.push()
+      lap.s[row] = position.s
+      lap.offset[row] = position.offset
+      lap.speed[row] = samples.speed[i]
+      lap.ax[row] = samples.ax[i]
+      lap.ay[row] = samples.ay[i]
+    }
+    // Fixes after the last sample count towards the lap in progress
+    for (; fix < this.fixCount; fix++) quality.pushFix(this.fixT[fix], this.fixHdop[fix])
+  }
+
+  // Stage 3: envelope check and learning for the lap that just finished
+  learn() {
+    for (const finished of this.finished) {
+      if (finished.verdict.accepted) {
+        const lap = {
+          s: this.finishedS,
+          ax: this.finishedAx,
+          ay: this.finishedAy,
+          speed: this.finishedSpeed,
+          offset: this.finishedOffset,
+          count: this.finishedCount,
+        }
+        finished.check = this.envelope.evaluate(lap.s, lap.ax, lap.ay, lap.count)
+        this.envelope.addLap(lap.s, lap.ax, lap.ay, lap.count)
+        this.learner.addLap(lap)
+      }
+      this.laps.push(finished)
+      this.hashLap(finished)
+    }
+    this.finished.length = 0
+  }
+
+  // Stage 4: voice decisions
+  decide() {
+    const samples = this.samples
+    for (let i = 0; i < samples.length; i++) {
+      const message = this.coach.push(
+        samples.t[i],
+        samples.s[i],
+        samples.speed[i],
+        samples.ax[i],
+        samples.ay[i]
+      )
+      if (!message) continue
+      this.messages.push(message)
+      this.hashMessage(message)
+    }
+  }
+
+  private holdLap() {
+    const lap = this.lap
+    const count = lap.length
+    if (this.finishedS.length < count) {
+      const capacity = lap.t.length
+      this.finishedS = new Float64Array(capacity)
+      this.finishedSpeed = new Float64Array(capacity)
+      this.finishedOffset = new Float64Array(capacity)
+      this.finishedAx = new Float64Array(capacity)
+      this.finishedAy = new Float64Array(capacity)
+    }
+    this.finishedS.set(lap.s.subarray(0, count))
+    this.finishedSpeed.set(lap.speed.subarray(0, count))
+    this.finishedOffset.set(lap.offset.subarray(0, count))
+    smoothSamples(lap.ax, count, LEARN_HALF_WIDTH, this.finishedAx)
+    smoothSamples(lap.ay, count, LEARN_HALF_WIDTH, this.finishedAy)
+    this.finishedCount = count
+  }
+
+  private decimate(batch: PoseBatch) {
+    for (let i = 0; i < batch.length; i++) {
+      const bin = Math.floor(batch.t[i] / SAMPLE_PERIOD)
+      if (bin !== this.bin && this.binPoses > 0) this.emitBin()
+      this.bin = bin
+      this.binAx += batch.ax[i]
+      this.binAy += batch.ay[i]
+      this.binSpeed += batch.speed[i]
+      this.binPoses++
+      this.lastT = batch.t[i]
+      this.lastEast = batch.east[i]
+      this.lastNorth = batch.north[i]
+    }
+  }
+
+  private emitBin() {
+    const samples = this.samples
+    const row = samples.push()
+    samples.t[row] = this.lastT
+    samples.east[row] = this.lastEast
+    samples.north[row] = this.lastNorth
+    samples.speed[row] = this.binSpeed / this.binPoses
+    samples.ax[row] = this.binAx / this.binPoses
+    samples.ay[row] = this.binAy / this.binPoses
+    this.binAx = this.binAy = this.binSpeed = 0
+    this.binPoses = 0
+  }
+
+  // Stage 5: folds the chunk's samples into the digest
+  hashSamples() {
+    const samples = this.samples
+    const count = samples.length
+    let hash = this.hash
+    hash = fnv(hash, samples.t, count)
+    hash = fnv(hash, samples.east, count)
+    hash = fnv(hash, samples.north, count)
+    hash = fnv(hash, samples.speed, count)
+    hash = fnv(hash, samples.ax, count)
+    hash = fnv(hash, samples.ay, count)
+    hash = fnv(hash, samples.s, count)
+    hash = fnv(hash, samples.offset, count)
+    this.hash = hash
+  }
+
+  private hashLap(lap: ReplayLap) {
+    scratch[0] = lap.record.time
+    scratch[1] = lap.verdict.accepted ? lap.verdict.score : -1
+    scratch[2] = lap.check ? lap.check.maxUtilization : -1
+    this.hash = fnv(this.hash, scratch, 3)
+  }
+
+  private hashMessage(message: CoachMessage) {
+    scratch[0] = message.t
+    scratch[1] = message.corner
+    let hash = fnv(this.hash, scratch, 2)
+    for (let i = 0; i < message.text.length; i++) {
+      hash = Math.imul(hash ^ message.text.charCodeAt(i), FNV_PRIME)
+    }
+    this.hash = hash
+  }
+}
+
+const scratch = new Float64Array(3)
+
+// FNV-1a over the bits of the first `count` values, a 32-bit word at a time
+function fnv(hash: number, values: Float64Array, count: number) {
+  const words = new Uint32Array(values.buffer, values.byteOffset, count * 2)
+  for (let i = 0; i < words.length; i++) hash = Math.imul(hash ^ words[i], FNV_PRIME)
+  return hash
+}
+
+// Runs a whole source through a fresh pipeline. At a finite speed, chunks are
+// released no faster than speed × real time.
+export async function replaySession(
+  source: SensorSource,
+  model: TrackModel,
+  options: ReplayOptions = {}
+): Promise<ReplayResult> {
+  const speed = options.speed ?? Infinity
+  const pipeline = new ReplayPipeline(model, source.origin)
+  const start = performance.now()
+  let firstT = NaN
+  let lastT = NaN
+  let lastYield = start
+
+  for (let chunk = source.next(); chunk; chunk = source.next()) {
+    options.signal?.throwIfAborted()
+    pipeline.process(chunk.imu, chunk.gps)
+    const t = chunk.imu.t
+    if (t.length === 0) continue
+    if (Number.isNaN(firstT)) firstT = t[0]
+    lastT = t[t.length - 1]
+
+    const now = performance.now()
+    const due = start + ((lastT - firstT) * 1000) / speed
+    if (due > now) {
+      await wait(due - now)
+      lastYield = performance.now()
+    } else if (now - lastYield > YIELD_INTERVAL) {
+      await wait(0)
+      lastYield = performance.now()
+    }
+  }
+  pipeline.process(null, null)
+
+  return {
+    laps: pipeline.laps,
+    messages: pipeline.messages,
+    samples: pipeline.sampleCount,
+    duration: Number.isNaN(firstT) ? 0 : lastT - firstT,
+    wallMs: performance.now() - start,
+    digest: pipeline.digest,
+  }
+}
+
+function wait(ms: number) {
+  return new Promise((resolve) => setTimeout(resolve, ms))
+}
@@ -0,0 +1,151 @@
+// Lazy reader for session files too large to load whole, such as hours of
+// 1 kHz IMU. Browsers can't memory-map files, but a File or Blob can be read
+// a slice at a time, and that gives the same effect: only the footer is read
+// up front, each chunk is read and inflated when first touched, and decoded
+// chunks live in a small cache whose buffers are recycled. Walking a session
+// of any length therefore runs in flat memory.
+
+import { PoseBatch } from './ingest'
+import {
+  decodeChunk,
+  decodeFooter,
+  decodeHeader,
+  decodeTrailer,
+  decompress,
+  HEADER_BYTES,
+  TRAILER_BYTES,
+} from './sessionFormat'
+import type { SessionIndex } from './sessionFormat'
+
+// Decoded chunks kept at once; walk() needs at least three (the one being
+// yielded, the one before it, and the one being read ahead)
+const DEFAULT_CACHE_CHUNKS = 4
+
+export interface SessionFileOptions {
+  cacheChunks?: number
+}
+
+export class SessionFile {
+  readonly index: SessionIndex
+  // Compressed bytes read from the file so far, for diagnostics
+  bytesRead = 0
+
+  private readonly blob: Blob
+  private readonly cacheChunks: number
+  // Chunk index → decoded chunk, least recently used first
+  private readonly cache = new Map<number, Promise<PoseBatch>>()
+  private readonly free: PoseBatch[] = []
+
+  private constructor(blob: Blob, index: SessionIndex, cacheChunks: number) {
+    this.blob = blob
+    this.index = index
+    this.cacheChunks = Math.max(3, cacheChunks)
+  }
+
+  // Reads the header, trailer and footer; nothing else
+  static async open(blob: Blob, options: SessionFileOptions = {}) {
+    if (blob.size < HEADER_BYTES + TRAILER_BYTES) throw new Error('Not a session file')
+    const head = await blob.slice(0, HEADER_BYTES).arrayBuffer()
+    const chunkSamples = decodeHeader(new DataView(head))
+    const tail = await blob.slice(blob.size - TRAILER_BYTES).arrayBuffer()
+    const footerLength = decodeTrailer(new DataView(tail))
+    const footerStart = blob.size - TRAILER_BYTES - footerLength
+    const footer = await blob.slice(footerStart, footerStart + footerLength).arrayBuffer()
+    const index = { chunkSamples, ...decodeFooter(new DataView(footer)) }
+    return new SessionFile(blob, index, options.cacheChunks ?? DEFAULT_CACHE_CHUNKS)
+  }
+
+  get laps() {
+    return this.index.laps
+  }
+
+  // Decoded chunk, from the cache when possible. The batch belongs to the
+  // cache and is reused once cacheChunks other chunks have been read since.
+  chunk(chunk: number): Promise<PoseBatch> {
+    const cached = this.cache.get(chunk)
+    if (cached) {
+      this.cache.delete(chunk)
+      this.cache.set(chunk, cached)
+      return cached
+    }
+    if (this.cache.size >= this.cacheChunks) {
+      const [oldest, evicted] = this.cache.entries().next().value as [number, Promise<PoseBatch>]
+      this.cache.delete(oldest)
+      evicted.then((batch) => this.free.push(batch)).catch(() => {})
+    }
+    const loading = this.load(chunk)
+    this.cache.set(chunk, loading)
+    // A failed read shouldn't stay cached
+    loading.catch(() => this.cache.delete(chunk))
+    return loading
+  }
+
+  // One lap as its own batch, copied chunk by chunk out of a walk so a lap
+  // longer than the cache still reads correctly
+  async readLap(lap: number): Promise<PoseBatch> {
+    const { start, time } = this.laps[lap]
+    let samples = 0
+    for (const chunk of this.index.chunks) {
+      if (chunk.lastT >= start && chunk.firstT <= start + time) samples += chunk.samples
+    }
+    const out = new PoseBatch(samples)
+    for await (const batch of this.walk(start, start + time)) {
+      const at = out.length
+      out.t.set(batch.t.subarray(0, batch.length), at)
+      out.east.set(batch.east.subarray(0, batch.length), at)
+      out.north.set(batch.north.subarray(0, batch.length), at)
+      out.heading.set(batch.heading.subarray(0, batch.length), at)
+      out.speed.set(batch.speed.subarray(0, batch.length), at)
+      out.ax.set(batch.ax.subarray(0, batch.length), at)
+      out.ay.set(batch.ay.subarray(0, batch.length), at)
+      out.yawRate.set(batch.yawRate.subarray(0, batch.length), at)
+      out.length += batch.length
+    }
+    return out
+  }
+
+  // Walks the poses between two session times, one chunk at a time, reading
+  // the next chunk while the current one is processed. Each yielded batch's
+  // columns are views into a cached chunk, valid until the walk moves on.
+  async *walk(from: number = -Infinity, to: number = Infinity): AsyncGenerator<PoseBatch> {
+    const chunks = this.index.chunks
+    let i = chunks.findIndex((chunk) => chunk.lastT >= from)
+    if (i < 0) return
+    let next: Promise<PoseBatch> | null = this.chunk(i)
+    while (next && chunks[i].firstT <= to) {
+      const batch: PoseBatch = await next
+      next = i + 1 < chunks.length && chunks[i + 1].firstT <= to ? this.chunk(i + 1) : null
+      let start = 0
+      let end = batch.length
+      while (start < end && batch.t[start] < from) start++
+      while (end > start && batch.t[end - 1] > to) end--
+      if (start === 0 && end === batch.length) yield batch
+      else if (end > start) yield poseView(batch, start, end)
+      i++
+    }
+  }
+
+  private async load(chunk: number) {
+    const { offset, byteLength, samples } = this.index.chunks[chunk]
+    const compressed = await this.blob.slice(offset, offset + byteLength).arrayBuffer()
+    this.bytesRead += byteLength
+    const bytes = await decompress(new Uint8Array(compressed))
+    const batch = this.free.pop() ?? new PoseBatch(this.index.chunkSamples)
+    return decodeChunk(bytes, samples, batch)
+  }
+}
+
+// Rows [start, end) of a batch as views over the same memory
+export function poseView(batch: PoseBatch, start: number, end: number) {
+  const view = new PoseBatch(0)
+  view.t = batch.t.subarray(start, end)
+  view.east = batch.east.subarray(start, end)
+  view.north = batch.north.subarray(start, end)
+  view.heading = batch.heading.subarray(start, end)
+  view.speed = batch.speed.subarray(start, end)
+  view.ax = batch.ax.subarray(start, end)
+  view.ay = batch.ay.subarray(start, end)
+  view.yawRate = batch.yawRate.subarray(start, end)
+  view.length = end - start
+  return view
+}
@@ -0,0 +1,387 @@
+// On-device session storage. Fused poses are stored in chunks of a few
+// thousand samples; inside a chunk each channel is quantized, delta encoded
+// and written as zigzag varints one column after another, and the chunk is
+// then deflated. A footer indexes the chunks by time and lists the laps, so
+// one lap is read back by inflating only the chunks it spans.
+//
+// Layout: header (16 bytes) | chunks | footer | footer length (u32) | magic
+//
+// Compression uses the platform's CompressionStream, so the format needs no
+// dependency; both ends run in the browser or in Node 18+.
+
+import { PoseBatch } from './ingest'
+import type { LapRecord } from './lapTiming'
+
+type PoseChannel = 't' | 'east' | 'north' | 'heading' | 'speed' | 'ax' | 'ay' | 'yawRate'
+
+// Quantization steps are 1/scale: 0.1 ms, 1 mm, 0.1 mrad, 1 mm/s, 0.01 m/s²
+// and 0.1 mrad/s. Smooth channels are stored as second differences, which
+// are near zero at IMU rates. Non-finite values (NaN from a sensor dropout)
+// are listed ahead of each column and left out of the deltas, so they read
+// back as they were written rather than as plausible numbers.
+const CHANNELS: { name: PoseChannel; scale: number; order: 1 | 2 }[] = [
+  { name: 't', scale: 1e4, order: 2 },
+  { name: 'east', scale: 1e3, order: 2 },
+  { name: 'north', scale: 1e3, order: 2 },
+  { name: 'heading', scale: 1e4, order: 1 },
+  { name: 'speed', scale: 1e3, order: 1 },
+  { name: 'ax', scale: 1e2, order: 1 },
+  { name: 'ay', scale: 1e2, order: 1 },
+  { name: 'yawRate', scale: 1e4, order: 1 },
+]
+
+const MAGIC = 0x52545331 // 'RTS1'
+const FORMAT_VERSION = 2
+export const HEADER_BYTES = 16
+const CHUNK_ENTRY_BYTES = 28
+export const TRAILER_BYTES = 8
+const DEFAULT_CHUNK_SAMPLES = 4096
+// Varints hold up to 2^53, so at most 8 bytes each
+const MAX_VARINT_BYTES = 8
+// Non-finite values, by the code stored for them
+const NON_FINITE = [NaN, Infinity, -Infinity]
+const COMPRESSION = 'deflate'
+
+export interface SessionChunk {
+  // Byte range of the compressed chunk in the file
+  offset: number
+  byteLength: number
+  samples: number
+  firstT: number
+  lastT: number
+}
+
+export interface SessionIndex {
+  chunkSamples: number
+  samples: number
+  chunks: SessionChunk[]
+  laps: LapRecord[]
+}
+
+// Appends poses as they are produced and compresses each chunk as soon as it
+// fills, so memory stays at one chunk plus the compressed output
+export class SessionWriter {
+  readonly chunkSamples: number
+  private readonly pending: PoseBatch
+  private readonly scratch: Uint8Array
+  private readonly chunks: Promise<Uint8Array>[] = []
+  private readonly chunkTimes: number[] = []
+  private readonly laps: LapRecord[] = []
+  private samples = 0
+
+  constructor(chunkSamples: number = DEFAULT_CHUNK_SAMPLES) {
+    this.chunkSamples = chunkSamples
+    this.pending = new PoseBatch(chunkSamples)
+    // One varint per sample, finite or not, plus a count per column
+    this.scratch = new Uint8Array((chunkSamples + 1) * CHANNELS.length * MAX_VARINT_BYTES)
+  }
+
+  append(batch: PoseBatch) {
+    const pending = this.pending
+    for (let i = 0; i < batch.length; i++) {
+      const row = pending.length++
+      for (const { name } of CHANNELS) pending[name][row] = batch[name][i]
+      if (pending.length === this.chunkSamples) this.flushChunk()
+    }
+    this.samples += batch.length
+  }
+
+  // Laps go in the footer index; call as LapTimer reports them
+  addLap(lap: LapRecord) {
+    this.laps.push({ ...lap, sectors: lap.sectors.slice() })
+  }
+
+  async finish(): Promise<Blob> {
+    if (this.pending.length > 0) this.flushChunk()
+    const chunks = await Promise.all(this.chunks)
+
+    const header = new DataView(new ArrayBuffer(HEADER_BYTES))
+    header.setUint32(0, MAGIC)
+    header.setUint16(4, FORMAT_VERSION)
+    header.setUint16(6, CHANNELS.length)
+    header.setUint32(8, this.chunkSamples)
+
+    let offset = HEADER_BYTES
+    const entries: SessionChunk[] = chunks.map((bytes, i) => {
+      const entry = {
+        offset,
+        byteLength: bytes.length,
+        samples: Math.min(this.chunkSamples, this.samples - i * this.chunkSamples),
+        firstT: this.chunkTimes[2 * i],
+        lastT: this.chunkTimes[2 * i + 1],
+      }
+      offset += bytes.length
+      return entry
+    })
+    const footer = encodeFooter(entries, this.laps)
+    const trailer = new DataView(new ArrayBuffer(TRAILER_BYTES))
+    trailer.setUint32(0, footer.byteLength)
+    trailer.setUint32(4, MAGIC)
+    return new Blob([header, ...chunks, footer, trailer], { type: 'application/octet-stream' })
+  }
+
+  private flushChunk() {
+    const pending = this.pending
+    this.chunkTimes.push(pending.t[0], pending.t[pending.length - 1])
+    const length = encodeChunk(pending, this.scratch)
+    // The scratch buffer is reused, so compress a copy
+    this.chunks.push(compress(this.scratch.slice(0, length)))
+    pending.length = 0
+  }
+}
+
+// Reads laps and chunks from a whole session file held in memory
+export class SessionReader {
+  readonly index: SessionIndex
+  private readonly buffer: ArrayBuffer
+
+  constructor(buffer: ArrayBuffer) {
+    this.buffer = buffer
+    this.index = decodeIndex(buffer)
+  }
+
+  get laps() {
+    return this.index.laps
+  }
+
+  async readChunk(chunk: number): Promise<PoseBatch> {
+    const { offset, byteLength, samples } = this.index.chunks[chunk]
+    const bytes = await decompress(new Uint8Array(this.buffer, offset, byteLength))
+    return decodeChunk(bytes, samples)
+  }
+
+  // Poses of one lap, inflating only the chunks it overlaps
+  async readLap(lap: number): Promise<PoseBatch> {
+    return readTimeRange(this.index, this.laps[lap], (chunk) => this.readChunk(chunk))
+  }
+}
+
+// Shared by readers over any storage: gathers the poses in [start,
+// start + time] of a lap from the chunks that overlap it
+export async function readTimeRange(
+  index: SessionIndex,
+  lap: Pick<LapRecord, 'start' | 'time'>,
+  readChunk: (chunk: number) => Promise<PoseBatch>
+): Promise<PoseBatch> {
+  const from = lap.start
+  const to = lap.start + lap.time
+  const overlapping: number[] = []
+  let samples = 0
+  index.chunks.forEach((chunk, i) => {
+    if (chunk.lastT >= from && chunk.firstT <= to) {
+      overlapping.push(i)
+      samples += chunk.samples
+    }
+  })
+
+  const batches = await Promise.all(overlapping.map(readChunk))
+  const out = new PoseBatch(samples)
+  for (const batch of batches) {
+    for (let i = 0; i < batch.length; i++) {
+      const t = batch.t[i]
+      if (t < from || t > to) continue
+      const row = out.length++
+      for (const { name } of CHANNELS) out[name][row] = batch[name][i]
+    }
+  }
+  return out
+}
+
+// The footer and chunk table of a whole file in memory
+export function decodeIndex(buffer: ArrayBuffer): SessionIndex {
+  if (buffer.byteLength < HEADER_BYTES + TRAILER_BYTES) throw new Error('Not a session file')
+  const chunkSamples = decodeHeader(new DataView(buffer, 0, HEADER_BYTES))
+  const footerLength = decodeTrailer(new DataView(buffer, buffer.byteLength - TRAILER_BYTES))
+  const footerStart = buffer.byteLength - TRAILER_BYTES - footerLength
+  const footer = decodeFooter(new DataView(buffer, footerStart, footerLength))
+  return { chunkSamples, ...footer }
+}
+
+// Checks the header and returns the chunk size
+export function decodeHeader(view: DataView) {
+  if (view.getUint32(0) !== MAGIC) throw new Error('Not a session file')
+  if (view.getUint16(4) !== FORMAT_VERSION) {
+    throw new Error(`Unsupported session format ${view.getUint16(4)}`)
+  }
+  return view.getUint32(8)
+}
+
+// Checks the trailer and returns the footer length
+export function decodeTrailer(view: DataView) {
+  if (view.getUint32(4) !== MAGIC) throw new Error('Not a session file')
+  return view.getUint32(0)
+}
+
+// Footer: chunk count, 28-byte chunk entries, lap count, then per lap its
+// start, time, completeness and sector times
+function encodeFooter(chunks: SessionChunk[], laps: LapRecord[]) {
+  const lapBytes = laps.reduce((sum, lap) => sum + 28 + lap.sectors.length * 8, 0)
+  const buffer = new ArrayBuffer(8 + chunks.length * CHUNK_ENTRY_BYTES + lapBytes)
+  const view = new DataView(buffer)
+  let at = 0
+  view.setUint32(at, chunks.length)
+  at += 4
+  for (const chunk of chunks) {
+    view.setUint32(at, chunk.offset)
+    view.setUint32(at + 4, chunk.byteLength)
+    view.setUint32(at + 8, chunk.samples)
+    view.setFloat64(at + 12, chunk.firstT)
+    view.setFloat64(at + 20, chunk.lastT)
+    at += CHUNK_ENTRY_BYTES
+  }
+  view.setUint32(at, laps.length)
+  at += 4
+  for (const lap of laps) {
+    view.setUint32(at, lap.lap)
+    view.setFloat64(at + 4, lap.start)
+    view.setFloat64(at + 12, lap.time)
+    view.setUint32(at + 20, lap.complete ? 1 : 0)
+    view.setUint32(at + 24, lap.sectors.length)
+    at += 28
+    for (const split of lap.sectors) {
+      view.setFloat64(at, split)
+      at += 8
+    }
+  }
+  return buffer
+}
+
+export function decodeFooter(view: DataView) {
+  let at = 0
+  const chunks: SessionChunk[] = []
+  const chunkCount = view.getUint32(at)
+  at += 4
+  let samples = 0
+  for (let i = 0; i < chunkCount; i++, at += CHUNK_ENTRY_BYTES) {
+    const chunk = {
+      offset: view.getUint32(at),
+      byteLength: view.getUint32(at + 4),
+      samples: view.getUint32(at + 8),
+      firstT: view.getFloat64(at + 12),
+      lastT: view.getFloat64(at + 20),
+    }
+    samples += chunk.samples
+    chunks.push(chunk)
+  }
+  const laps: LapRecord[] = []
+  const lapCount = view.getUint32(at)
+  at += 4
+  for (let i = 0; i < lapCount; i++) {
+    const sectorCount = view.getUint32(at + 24)
+    const sectors = Array.from({ length: sectorCount }, (_, k) =>
+      view.getFloat64(at + 28 + k * 8)
+    )
+    laps.push({
+      lap: view.getUint32(at),
+      start: view.getFloat64(at + 4),
+      time: view.getFloat64(at + 12),
+      sectors,
+      complete: view.getUint32(at + 20) === 1,
+    })
+    at += 28 + sectorCount * 8
+  }
+  return { samples, chunks, laps }
+}
+
+// Writes the chunk's columns into `out`; returns the bytes used. Each column
+// is the count of its non-finite samples, one varint per such sample (the
+// gap since the last one and which value it is), then the finite deltas.
+function encodeChunk(batch: PoseBatch, out: Uint8Array) {
+  let at = 0
+  for (const { name, scale, order } of CHANNELS) {
+    const column = batch[name]
+    let nonFinite = 0
+    for (let i = 0; i < batch.length; i++) if (!Number.isFinite(column[i])) nonFinite++
+    at = writeVarint(out, at, nonFinite)
+    for (let i = 0, last = 0; nonFinite > 0 && i < batch.length; i++) {
+      if (Number.isFinite(column[i])) continue
+      const code = Number.isNaN(column[i]) ? 0 : column[i] > 0 ? 1 : 2
+      at = writeVarint(out, at, (i - last) * NON_FINITE.length + code)
+      last = i
+    }
+
+    let previous = 0
+    let previousDelta = 0
+    for (let i = 0; i < batch.length; i++) {
+      if (!Number.isFinite(column[i])) continue
+      const value = Math.round(column[i] * scale)
+      const delta = value - previous
+      at = writeVarint(out, at, order === 2 ? delta - previousDelta : delta)
+      previous = value
+      previousDelta = delta
+    }
+  }
+  return at
+}
+
+// Decodes into `batch`, which needs room for the samples; readers that walk
+// a session recycle their batches this way
+export function decodeChunk(
+  bytes: Uint8Array,
+  samples: number,
+  batch: PoseBatch = new PoseBatch(samples)
+) {
+  batch.length = samples
+  const cursor = { at: 0 }
+  const listed = { at: 0 }
+  for (const { name, scale, order } of CHANNELS) {
+    const column = batch[name]
+    // The non-finite list is read alongside the values, which follow it
+    let nonFinite = readVarint(bytes, cursor)
+    listed.at = cursor.at
+    for (let k = 0; k < nonFinite; k++) readVarint(bytes, cursor)
+    // Next non-finite sample, as index * NON_FINITE.length + code
+    let next = nonFinite > 0 ? readVarint(bytes, listed) : -1
+    let nextIndex = Math.floor(next / NON_FINITE.length)
+
+    let value = 0
+    let delta = 0
+    for (let i = 0; i < samples; i++) {
+      if (i === nextIndex) {
+        column[i] = NON_FINITE[next % NON_FINITE.length]
+        next = --nonFinite > 0 ? i * NON_FINITE.length + readVarint(bytes, listed) : -1
+        nextIndex = Math.floor(next / NON_FINITE.length)
+        continue
+      }
+      const stored = readVarint(bytes, cursor)
+      delta = order === 2 ? delta + stored : stored
+      value += delta
+      column[i] = value / scale
+    }
+  }
+  return batch
+}
+
+// Zigzag LEB128 with arithmetic rather than bit operations, which would
+// truncate to 32 bits
+function writeVarint(out: Uint8Array, at: number, value: number) {
+  let zigzag = value >= 0 ? value * 2 : -value * 2 - 1
+  while (zigzag >= 0x80) {
+    out[at++] = (zigzag % 0x80) | 0x80
+    zigzag = Math.floor(zigzag / 0x80)
+  }
+  out[at++] = zigzag
+  return at
+}
+
+function readVarint(bytes: Uint8Array, cursor: { at: number }) {
+  let zigzag = 0
+  let multiplier = 1
+  let byte: number
+  do {
+    byte = bytes[cursor.at++]
+    zigzag += (byte & 0x7f) * multiplier
+    multiplier *= 0x80
+  } while (byte & 0x80)
+  return zigzag % 2 === 0 ? zigzag / 2 : -(zigzag + 1) / 2
+}
+
+async function compress(bytes: Uint8Array) {
+  const stream = new Blob([bytes]).stream().pipeThrough(new CompressionStream(COMPRESSION))
+  return new Uint8Array(await new Response(stream).arrayBuffer())
+}
+
+export async function decompress(bytes: Uint8Array) {
+  const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream(COMPRESSION))
+  return new Uint8Array(await new Response(stream).arrayBuffer())
+}
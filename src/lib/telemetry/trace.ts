@@ -0,0 +1,278 @@
+// Recorded GPS traces: an append-only columnar buffer for streamed samples,
+// a local planar projection and a budgeted Douglas–Peucker decimator.
+
+export interface TraceChunk {
+  lat: ArrayLike<number>
+  lon: ArrayLike<number>
+  // m/s
+  speed: ArrayLike<number>
+}
+
+export const EARTH_RADIUS_M = 6371008.8
+export const DEG_TO_RAD = Math.PI / 180
+
+// Grows by doubling so appending a long session in small chunks stays amortized O(1)
+export class TelemetryTraceBuffer {
+  lat = new Float64Array(1024)
+  lon = new Float64Array(1024)
+  speed = new Float32Array(1024)
+  length = 0
+  // Bumped on every append so consumers can cheaply tell whether to rebuild
+  version = 0
+
+  private listeners = new Set<(chunk: TraceChunk) => void>()
+
+  append(chunk: TraceChunk) {
+    const count = Math.min(chunk.lat.length, chunk.lon.length, chunk.speed.length)
+    if (count === 0) return
+    this.reserve(this.length + count)
+
+    for (let i = 0; i < count; i++) {
+      this.lat[this.length + i] = chunk.lat[i]
+      this.lon[this.length + i] = chunk.lon[i]
+      this.speed[this.length + i] = chunk.speed[i]
+    }
+    this.length += count
+    this.version++
+    this.listeners.forEach((listener) => listener(chunk))
+  }
+
+  // Copy of everything appended so far as one chunk, e.g. to post to a worker
+  snapshot(): TraceChunk {
+    return {
+      lat: this.lat.slice(0, this.length),
+      lon: this.lon.slice(0, this.length),
+      speed: this.speed.slice(0, this.length),
+    }
+  }
+
+  subscribe(listener: (chunk: TraceChunk) => void) {
+    this.listeners.add(listener)
+    return () => {
+      this.listeners.delete(listener)
+    }
+  }
+
+  private reserve(capacity: number) {
+    if (capacity <= this.lat.length) return
+    let next = this.lat.length
+    while (next < capacity) next *= 2
+
+    const lat = new Float64Array(next)
+    const lon = new Float64Array(next)
+    const speed = new Float32Array(next)
+    lat.set(this.lat.subarray(0, this.length))
+    lon.set(this.lon.subarray(0, this.length))
+    speed.set(this.speed.subarray(0, this.length))
+    this.lat = lat
+    this.lon = lon
+    this.speed = speed
+  }
+}
+
+// Equirectangular projection around (lat0, lon0) into metres east/north.
+// Accurate to well under a metre across a circuit-sized area.
+export function projectToPlane(
+  lat: ArrayLike<number>,
+  lon: ArrayLike<number>,
+  count: number,
+  east: Float64Array,
+  north: Float64Array,
+  lat0: number = lat[0],
+  lon0: number = lon[0]
+) {
+  const kx = Math.cos(lat0 * DEG_TO_RAD) * EARTH_RADIUS_M * DEG_TO_RAD
+  const ky = EARTH_RADIUS_M * DEG_TO_RAD
+  for (let i = 0; i < count; i++) {
+    east[i] = (lon[i] - lon0) * kx
+    north[i] = (lat[i] - lat0) * ky
+  }
+}
+
+// Samples per block of TraceDecimator; full blocks are never decimated again
+const DECIMATION_BLOCK = 4096
+
+// Squared distance from point i to the segment a-b
+function segmentDistanceSq(x: Float64Array, y: Float64Array, i: number, a: number, b: number) {
+  const dx = x[b] - x[a]
+  const dy = y[b] - y[a]
+  const lengthSq = dx * dx + dy * dy
+  let px = x[i] - x[a]
+  let py = y[i] - y[a]
+  if (lengthSq > 0) {
+    const t = Math.max(0, Math.min(1, (px * dx + py * dy) / lengthSq))
+    px -= t * dx
+    py -= t * dy
+  }
+  return px * px + py * py
+}
+
+// Budgeted Douglas–Peucker. Every point gets the tolerance at which DP would
+// first keep it (capped by its parent's, so the ordering is monotonic), then
+// the `budget` most significant points are kept. Corners, being far from the
+// chord, survive first; speedWeight (metres per m/s) also keeps points where
+// speed departs from the chord's interpolation, i.e. braking and exits.
+//
+// The trace is split into fixed blocks that are decimated on their own, so a
+// full block's significances never change again. A growing trace only re-runs
+// DP over its last block, and picking the budget threshold is a linear-time
+// selection, so each rebuild is O(block log block + count) with no
+// allocations once the scratch arrays have grown to the trace.
+export class TraceDecimator {
+  private significance = new Float64Array(0)
+  private selection = new Float64Array(0)
+  private readonly stack = new Int32Array(DECIMATION_BLOCK * 2)
+  // Samples whose significance is final, and the weight it was computed with
+  private final = 0
+  private speedWeight = NaN
+
+  // Forget cached significances, e.g. when the trace is replaced rather
+  // than appended to
+  reset() {
+    this.final = 0
+  }
+
+  // Writes ascending sample indices into `out` and returns how many were kept
+  decimate(
+    x: Float64Array,
+    y: Float64Array,
+    speed: ArrayLike<number>,
+    count: number,
+    budget: number,
+    out: Uint32Array,
+    speedWeight = 0
+  ) {
+    if (count <= budget) {
+      for (let i = 0; i < count; i++) out[i] = i
+      return count
+    }
+
+    if (speedWeight !== this.speedWeight || count < this.final) this.final = 0
+    this.speedWeight = speedWeight
+    if (this.significance.length < count) {
+      const capacity = Math.max(count, this.significance.length * 2)
+      const grown = new Float64Array(capacity)
+      grown.set(this.significance.subarray(0, this.final))
+      this.significance = grown
+      this.selection = new Float64Array(capacity)
+    }
+
+    const significance = this.significance
+    const last = count - 1
+    for (let a = this.final; a < last; a += DECIMATION_BLOCK) {
+      const b = Math.min(a + DECIMATION_BLOCK, last)
+      // Block boundaries rank just below the ends of the whole trace
+      significance[a] = a === 0 ? Infinity : Number.MAX_VALUE
+      significance[b] = b === last ? Infinity : Number.MAX_VALUE
+      this.decimateBlock(x, y, speed, a, b, speedWeight)
+      if (b - a === DECIMATION_BLOCK) this.final = b
+    }
+
+    const selection = this.selection
+    selection.set(significance.subarray(0, count))
+    const threshold = selectNth(selection, count, count - budget)
+    let ties = budget
+    for (let i = 0; i < count; i++) {
+      if (significance[i] > threshold) ties--
+    }
+
+    let kept = 0
+    for (let i = 0; i < count; i++) {
+      if (significance[i] > threshold || (significance[i] === threshold && ties-- > 0)) {
+        out[kept++] = i
+      }
+    }
+    return kept
+  }
+
+  // DP over the samples strictly between start and end, whose significance
+  // is already set
+  private decimateBlock(
+    x: Float64Array,
+    y: Float64Array,
+    speed: ArrayLike<number>,
+    start: number,
+    end: number,
+    speedWeight: number
+  ) {
+    const significance = this.significance
+    // Explicit stack of [start, end] ranges; DP depth is unbounded on long traces
+    const stack = this.stack
+    let top = 0
+    stack[top++] = start
+    stack[top++] = end
+
+    while (top > 0) {
+      const b = stack[--top]
+      const a = stack[--top]
+      if (b - a < 2) continue
+
+      const parent = Math.min(significance[a], significance[b])
+      let worst = -1
+      let worstIndex = a + 1
+      for (let i = a + 1; i < b; i++) {
+        let error = segmentDistanceSq(x, y, i, a, b)
+        if (speedWeight > 0) {
+          const expected = speed[a] + ((speed[b] - speed[a]) * (i - a)) / (b - a)
+          const speedError = (speed[i] - expected) * speedWeight
+          error = Math.max(error, speedError * speedError)
+        }
+        if (error > worst) {
+          worst = error
+          worstIndex = i
+        }
+      }
+
+      significance[worstIndex] = Math.min(Math.sqrt(worst), parent)
+      stack[top++] = a
+      stack[top++] = worstIndex
+      stack[top++] = worstIndex
+      stack[top++] = b
+    }
+  }
+}
+
+// One-off decimation; keep a TraceDecimator to rebuild a growing trace
+export function decimateTrace(
+  x: Float64Array,
+  y: Float64Array,
+  speed: ArrayLike<number>,
+  count: number,
+  budget: number,
+  out: Uint32Array,
+  speedWeight = 0
+) {
+  return new TraceDecimator().decimate(x, y, speed, count, budget, out, speedWeight)
+}
+
+// The k-th smallest of the first `count` values (Hoare's selection with a
+// median-of-three pivot); reorders them in place
+function selectNth(values: Float64Array, count: number, k: number) {
+  let left = 0
+  let right = count - 1
+  while (right > left) {
+    const middle = (left + right) >> 1
+    if (values[middle] < values[left]) swap(values, middle, left)
+    if (values[right] < values[left]) swap(values, right, left)
+    if (values[right] < values[middle]) swap(values, right, middle)
+    const pivot = values[middle]
+
+    let i = left
+    let j = right
+    while (i <= j) {
+      while (values[i] < pivot) i++
+      while (values[j] > pivot) j--
+      if (i <= j) swap(values, i++, j--)
+    }
+    if (k <= j) right = j
+    else if (k >= i) left = i
+    else return values[k]
+  }
+  return values[k]
+}
+
+function swap(values: Float64Array, i: number, j: number) {
+  const value = values[i]
+  values[i] = values[j]
+  values[j] = value
+}
@@ -0,0 +1,126 @@
+// Arc-length parameterized track model: a closed centreline sampled every
+// `step` metres from the start/finish line, with heading, curvature and the
+// width either side, plus the start/finish and sector gates.
+
+export interface TrackGate {
+  // Station the gate crosses the centreline at
+  index: number
+  // Endpoints in metres east/north, left of the centreline first
+  x1: number
+  y1: number
+  x2: number
+  y2: number
+}
+
+export interface TrackModel {
+  // Projection origin the positions are relative to, if known
+  origin: { lat: number; lon: number } | null
+  // Metres between stations; station i is at arc length i * step
+  step: number
+  length: number
+  x: Float64Array
+  y: Float64Array
+  // Radians anticlockwise from east
+  heading: Float32Array
+  // 1/m, positive turning left
+  curvature: Float32Array
+  // Metres from the centreline to each edge
+  widthLeft: Float32Array
+  widthRight: Float32Array
+  startFinish: TrackGate
+  // Sector boundaries after the start/finish line, in driving order
+  sectors: TrackGate[]
+  // Laps merged into the model so far
+  laps: number
+  // Bumped whenever the geometry changes
+  version: number
+}
+
+// How far past the edges timing gates reach, in metres
+const GATE_MARGIN = 5
+
+export function trackGate(
+  model: Pick<TrackModel, 'x' | 'y' | 'heading' | 'widthLeft' | 'widthRight'>,
+  index: number
+): TrackGate {
+  const normalX = -Math.sin(model.heading[index])
+  const normalY = Math.cos(model.heading[index])
+  const left = model.widthLeft[index] + GATE_MARGIN
+  const right = model.widthRight[index] + GATE_MARGIN
+  return {
+    index,
+    x1: model.x[index] + normalX * left,
+    y1: model.y[index] + normalY * left,
+    x2: model.x[index] - normalX * right,
+    y2: model.y[index] - normalY * right,
+  }
+}
+
+// Station at or before arc length s, wrapping around the lap
+export function stationAt(model: TrackModel, s: number) {
+  const count = model.x.length
+  const index = Math.floor(s / model.step) % count
+  return index < 0 ? index + count : index
+}
+
+const MAGIC = 0x52544b31 // 'RTK1'
+const HEADER_BYTES = 40
+
+// Compact binary form: a small header, the gate stations, then Float32
+// columns; positions keep millimetre precision on circuits up to ~30 km
+export function encodeTrackModel(model: TrackModel): ArrayBuffer {
+  const count = model.x.length
+  const sectorBytes = model.sectors.length * 4
+  const buffer = new ArrayBuffer(HEADER_BYTES + sectorBytes + count * 6 * 4)
+  const view = new DataView(buffer)
+  view.setUint32(0, MAGIC)
+  view.setUint32(4, count)
+  view.setFloat32(8, model.step)
+  view.setUint32(12, model.laps)
+  view.setFloat64(16, model.origin?.lat ?? NaN)
+  view.setFloat64(24, model.origin?.lon ?? NaN)
+  view.setUint32(32, model.startFinish.index)
+  view.setUint32(36, model.sectors.length)
+  model.sectors.forEach((gate, i) => view.setUint32(HEADER_BYTES + i * 4, gate.index))
+
+  const columns = new Float32Array(buffer, HEADER_BYTES + sectorBytes)
+  const { x, y, heading, curvature, widthLeft, widthRight } = model
+  const sources = [x, y, heading, curvature, widthLeft, widthRight]
+  sources.forEach((source, i) => columns.set(source, i * count))
+  return buffer
+}
+
+export function decodeTrackModel(buffer: ArrayBuffer): TrackModel {
+  const view = new DataView(buffer)
+  if (view.getUint32(0) !== MAGIC) throw new Error('Not a track model')
+  const count = view.getUint32(4)
+  const step = view.getFloat32(8)
+  const lat = view.getFloat64(16)
+  const lon = view.getFloat64(24)
+  const sectorCount = view.getUint32(36)
+  const sectorIndices = Array.from({ length: sectorCount }, (_, i) =>
+    view.getUint32(HEADER_BYTES + i * 4)
+  )
+
+  const columns = new Float32Array(buffer, HEADER_BYTES + sectorCount * 4, count * 6)
+  const column = (i: number) => columns.slice(i * count, (i + 1) * count)
+  const geometry = {
+    x: Float64Array.from(column(0)),
+    y: Float64Array.from(column(1)),
+    heading: column(2),
+    curvature: column(3),
+    widthLeft: column(4),
+    widthRight: column(5),
+  }
+
+  return {
+    origin: Number.isNaN(lat) ? null : { lat, lon },
+    step,
+    length: count * step,
+    ...geometry,
+    startFinish: trackGate(geometry, view.getUint32(32)),
+    sectors: sectorIndices.map((index) => trackGate(geometry, index)),
+    laps: view.getUint32(12),
+    version: 0,
+  }
+}
@@ -0,0 +1,545 @@
+// Builds a TrackModel from fused laps. The first closed lap becomes the
+// reference line; every later lap is projected onto it and folded into
+// running per-station statistics of lateral offset, so adding a lap costs
+// O(lap samples + stations) and old laps are never revisited.
+
+import type { PoseBatch } from './ingest'
+import { TrackModel, trackGate } from './track'
+
+export interface TrackBuilderOptions {
+  // Metres between centreline stations
+  step?: number
+  sectors?: number
+  origin?: { lat: number; lon: number }
+}
+
+// Poses slower than this (m/s) are ignored: pit stops, grid, paddock
+const MIN_SPEED = 3
+// Spacing of the points kept from the pose stream, metres
+const MIN_POINT_SPACING = 1
+// The first lap closes when the car comes back within this radius of any
+// point it passed at least MIN_LAP_LENGTH earlier, heading the same way. A
+// pit lane runs further than this from the racing line, so a session that
+// starts in one closes where the pit exit joins the track.
+const CLOSE_RADIUS = 8
+const MIN_LAP_LENGTH = 300
+// The closest revisit wins once the car is this far past it, metres
+const CLOSE_WINDOW = 2 * CLOSE_RADIUS
+// Same heading: within 45° over the directions across ±HEADING_SPAN points
+const CLOSE_HEADING = Math.SQRT1_2
+const HEADING_SPAN = 5
+// Points older than this along the path are dropped, so the buffer stays
+// bounded while no lap closes; longer than any circuit's lap
+const MAX_LAP_LENGTH = 30000
+// Samples further than this from the reference line are offs or pit lanes
+const MAX_OFFSET = 25
+// Gaps longer than this along the track are not interpolated across
+const MAX_GAP = 50
+// A lap must cover this share of the stations to be merged
+const MIN_COVERAGE = 0.9
+// Driven lines are car centres; edges sit a half car width further out
+const CAR_HALF_WIDTH = 0.9
+// Smoothing half-spans, metres
+const SMOOTHING_SPAN = 4
+const CURVATURE_SPAN = 5
+// Below this |curvature| (1/m) a station counts as straight
+const STRAIGHT_CURVATURE = 1 / 500
+
+export class TrackBuilder {
+  model: TrackModel | null = null
+
+  private readonly step: number
+  private readonly sectorCount: number
+  private readonly origin: { lat: number; lon: number } | null
+  private readonly listeners = new Set<(model: TrackModel) => void>()
+
+  // Reference line (the first lap) and its unit normals
+  private refX = new Float64Array(0)
+  private refY = new Float64Array(0)
+  private normalX = new Float64Array(0)
+  private normalY = new Float64Array(0)
+  // Running lateral offset statistics per station
+  private offsetCount = new Uint32Array(0)
+  private offsetMean = new Float64Array(0)
+  private offsetMin = new Float64Array(0)
+  private offsetMax = new Float64Array(0)
+  // One lap's interpolated offsets, NaN where the lap left no sample
+  private lapOffset = new Float64Array(0)
+
+  // Points of the lap in progress, from the pose stream, with the distance
+  // driven to each from the first
+  private pointX = new Float64Array(4096)
+  private pointY = new Float64Array(4096)
+  private pointS = new Float64Array(4096)
+  private pointCount = 0
+  // Closest revisit so far while the first lap closes: the point reached
+  // and the earlier point it revisits
+  private closestDistance = Infinity
+  private closestIndex = -1
+  private closestMatch = -1
+  private streamCursor = -1
+  private streamS = 0
+
+  constructor(options: TrackBuilderOptions = {}) {
+    this.step = options.step ?? 1
+    this.sectorCount = options.sectors ?? 3
+    this.origin = options.origin ?? null
+  }
+
+  subscribe(listener: (model: TrackModel) => void) {
+    this.listeners.add(listener)
+    return () => {
+      this.listeners.delete(listener)
+    }
+  }
+
+  // Streaming input: splits fused poses into laps and merges each one as it
+  // completes, by loop closure until a model exists and by the start/finish
+  // line afterwards
+  push(batch: PoseBatch) {
+    for (let i = 0; i < batch.length; i++) {
+      if (batch.speed[i] < MIN_SPEED) continue
+      const x = batch.east[i]
+      const y = batch.north[i]
+      let s = 0
+      if (this.pointCount > 0) {
+        const last = this.pointCount - 1
+        const spacing = Math.hypot(x - this.pointX[last], y - this.pointY[last])
+        if (spacing < MIN_POINT_SPACING) continue
+        s = this.pointS[last] + spacing
+      }
+      this.appendPoint(x, y, s)
+
+      if (this.model) this.splitAtStartFinish(x, y)
+      else this.detectLoopClosure()
+    }
+  }
+
+  // Merges one lap of positions. Returns false if the lap did not cover
+  // enough of the track to be trusted (partial laps, pit lane detours).
+  addLap(x: ArrayLike<number>, y: ArrayLike<number>, count: number = x.length) {
+    if (!this.model) {
+      if (count < 3) return false
+      this.buildReference(x, y, count)
+    } else if (!this.projectLap(x, y, count)) {
+      return false
+    } else {
+      this.mergeLap()
+    }
+    this.rebuild()
+    return true
+  }
+
+  private appendPoint(x: number, y: number, s: number) {
+    if (this.pointCount === this.pointX.length) {
+      const stale = lowerBound(this.pointS, this.pointCount, s - MAX_LAP_LENGTH)
+      if (stale > 0) {
+        this.dropPoints(stale)
+        this.closestIndex -= stale
+        this.closestMatch -= stale
+        if (this.closestMatch < 0) this.resetClosure()
+      } else {
+        this.pointX = grow(this.pointX)
+        this.pointY = grow(this.pointY)
+        this.pointS = grow(this.pointS)
+      }
+    }
+    this.pointX[this.pointCount] = x
+    this.pointY[this.pointCount] = y
+    this.pointS[this.pointCount] = s
+    this.pointCount++
+  }
+
+  // The first lap runs from the point the car revisits to the closest
+  // approach to it; anything driven before that point (a pit exit, the
+  // paddock) is left out of the reference line
+  private detectLoopClosure() {
+    const last = this.pointCount - 1
+    const match = this.findRevisit(last)
+    if (match >= 0) {
+      const distance = Math.hypot(
+        this.pointX[last] - this.pointX[match],
+        this.pointY[last] - this.pointY[match]
+      )
+      if (distance < this.closestDistance) {
+        this.closestDistance = distance
+        this.closestIndex = last
+        this.closestMatch = match
+        return
+      }
+    }
+    if (this.closestIndex < 0) return
+    if (this.pointS[last] - this.pointS[this.closestIndex] < CLOSE_WINDOW) return
+
+    const from = this.closestMatch
+    const end = this.closestIndex
+    this.addLap(this.pointX.subarray(from), this.pointY.subarray(from), end - from)
+    this.startNextLap(end)
+  }
+
+  // Closest earlier point within CLOSE_RADIUS of point i, at least a
+  // MIN_LAP_LENGTH back and heading the same way; -1 if there is none
+  private findRevisit(i: number) {
+    const x = this.pointX
+    const y = this.pointY
+    const s = this.pointS
+    const limit = s[i] - MIN_LAP_LENGTH
+    const [headingX, headingY] = this.direction(i)
+    let best = -1
+    let bestDistance = CLOSE_RADIUS
+    for (let j = 0; j < i && s[j] <= limit; ) {
+      const distance = Math.hypot(x[i] - x[j], y[i] - y[j])
+      if (distance < bestDistance) {
+        const [alongX, alongY] = this.direction(j)
+        if (alongX * headingX + alongY * headingY > CLOSE_HEADING) {
+          best = j
+          bestDistance = distance
+        }
+      }
+      // The path from point j gets no closer any faster than it is driven,
+      // so skip the points it cannot reach the radius by
+      const reach = s[j] + distance - bestDistance
+      j = reach > s[j + 1] ? lowerBound(s, i, reach, j + 1) : j + 1
+    }
+    return best
+  }
+
+  // Unit direction of travel at point i, across ±HEADING_SPAN points
+  private direction(i: number) {
+    const from = Math.max(0, i - HEADING_SPAN)
+    const to = Math.min(this.pointCount - 1, i + HEADING_SPAN)
+    const dx = this.pointX[to] - this.pointX[from]
+    const dy = this.pointY[to] - this.pointY[from]
+    const length = Math.hypot(dx, dy) || 1
+    return [dx / length, dy / length]
+  }
+
+  // After the first lap, laps end where the projected arc length wraps
+  private splitAtStartFinish(x: number, y: number) {
+    const model = this.model!
+    this.streamCursor = nearestStation(this.refX, this.refY, x, y, this.streamCursor)
+    const s = this.streamCursor * model.step
+    const wrapped = this.streamS - s > model.length / 2
+    this.streamS = s
+    if (!wrapped) return
+
+    // Partial laps (the rest of the first loop, pit exits) fail the coverage check
+    this.addLap(this.pointX, this.pointY, this.pointCount - 1)
+    this.startNextLap(this.pointCount - 1)
+  }
+
+  // Keeps points from `from` on as the start of the next lap
+  private startNextLap(from: number) {
+    this.dropPoints(from)
+    this.resetClosure()
+  }
+
+  private dropPoints(count: number) {
+    const offset = this.pointS[count]
+    this.pointX.copyWithin(0, count, this.pointCount)
+    this.pointY.copyWithin(0, count, this.pointCount)
+    this.pointS.copyWithin(0, count, this.pointCount)
+    this.pointCount -= count
+    for (let i = 0; i < this.pointCount; i++) this.pointS[i] -= offset
+  }
+
+  private resetClosure() {
+    this.closestDistance = Infinity
+    this.closestIndex = -1
+    this.closestMatch = -1
+  }
+
+  // Resamples the first lap by arc length into the reference line, picks the
+  // start/finish and sector stations and rotates the line to start at S/F
+  private buildReference(x: ArrayLike<number>, y: ArrayLike<number>, count: number) {
+    // Cumulative length around the closed loop, including the closing segment
+    const distance = new Float64Array(count + 1)
+    for (let i = 1; i <= count; i++) {
+      const j = i % count
+      distance[i] = distance[i - 1] + Math.hypot(x[j] - x[i - 1], y[j] - y[i - 1])
+    }
+    const stations = Math.max(3, Math.round(distance[count] / this.step))
+    const spacing = distance[count] / stations
+    const sampleX = new Float64Array(stations)
+    const sampleY = new Float64Array(stations)
+    for (let k = 0, i = 0; k < stations; k++) {
+      const target = k * spacing
+      while (distance[i + 1] < target) i++
+      const j = (i + 1) % count
+      const f = (target - distance[i]) / (distance[i + 1] - distance[i] || 1)
+      sampleX[k] = x[i] + (x[j] - x[i]) * f
+      sampleY[k] = y[i] + (y[j] - y[i]) * f
+    }
+
+    const heading = new Float32Array(stations)
+    const curvature = new Float32Array(stations)
+    deriveGeometry(sampleX, sampleY, spacing, heading, curvature)
+    const start = findStraightMiddle(curvature)
+
+    this.refX = rotate(sampleX, start)
+    this.refY = rotate(sampleY, start)
+    this.normalX = new Float64Array(stations)
+    this.normalY = new Float64Array(stations)
+    const refHeading = rotate(heading, start)
+    for (let k = 0; k < stations; k++) {
+      this.normalX[k] = -Math.sin(refHeading[k])
+      this.normalY[k] = Math.cos(refHeading[k])
+    }
+
+    this.offsetCount = new Uint32Array(stations).fill(1)
+    this.offsetMean = new Float64Array(stations)
+    this.offsetMin = new Float64Array(stations)
+    this.offsetMax = new Float64Array(stations)
+    this.lapOffset = new Float64Array(stations)
+
+    const rotatedCurvature = rotate(curvature, start)
+    const sectors: number[] = []
+    for (let k = 1; k < this.sectorCount; k++) {
+      const target = Math.round((k * stations) / this.sectorCount)
+      sectors.push(findStraightNear(rotatedCurvature, target))
+    }
+
+    this.model = {
+      origin: this.origin,
+      step: spacing,
+      length: distance[count],
+      x: new Float64Array(stations),
+      y: new Float64Array(stations),
+      heading: new Float32Array(stations),
+      curvature: new Float32Array(stations),
+      widthLeft: new Float32Array(stations),
+      widthRight: new Float32Array(stations),
+      startFinish: { index: 0, x1: 0, y1: 0, x2: 0, y2: 0 },
+      sectors: sectors.map((index) => ({ index, x1: 0, y1: 0, x2: 0, y2: 0 })),
+      laps: 0,
+      version: 0,
+    }
+    this.streamCursor = -1
+  }
+
+  // Lateral offset of the lap at every station it passes, interpolated
+  // between samples. Returns whether the lap covered enough stations.
+  private projectLap(x: ArrayLike<number>, y: ArrayLike<number>, count: number) {
+    const model = this.model!
+    const stations = this.refX.length
+    const lapOffset = this.lapOffset
+    lapOffset.fill(NaN)
+
+    let cursor = -1
+    let previousS = NaN
+    let previousOffset = NaN
+    let covered = 0
+    for (let i = 0; i < count; i++) {
+      cursor = nearestStation(this.refX, this.refY, x[i], y[i], cursor)
+      const { s, offset } = this.project(cursor, x[i], y[i])
+      if (Math.abs(offset) > MAX_OFFSET) {
+        previousS = NaN
+        continue
+      }
+
+      let ds = s - previousS
+      if (ds < -model.length / 2) ds += model.length
+      if (ds > 0 && ds <= MAX_GAP) {
+        // Every station in (previousS, s] gets an interpolated offset
+        const first = Math.floor(previousS / model.step) + 1
+        const last = Math.floor((previousS + ds) / model.step)
+        for (let k = first; k <= last; k++) {
+          const station = ((k % stations) + stations) % stations
+          const f = (k * model.step - previousS) / ds
+          if (Number.isNaN(lapOffset[station])) covered++
+          lapOffset[station] = previousOffset + (offset - previousOffset) * f
+        }
+      }
+      if (!(ds <= 0)) {
+        previousS = s
+        previousOffset = offset
+      }
+    }
+    return covered >= stations * MIN_COVERAGE
+  }
+
+  // Arc length and signed lateral offset (positive left) of a point near station i
+  private project(station: number, x: number, y: number) {
+    const model = this.model!
+    const stations = this.refX.length
+    const next = (station + 1) % stations
+    const previous = (station + stations - 1) % stations
+    // Project onto whichever neighbouring segment the point lies along
+    let from = station
+    let to = next
+    const dx = x - this.refX[station]
+    const dy = y - this.refY[station]
+    const alongX = this.refX[next] - this.refX[station]
+    const alongY = this.refY[next] - this.refY[station]
+    if (dx * alongX + dy * alongY < 0) {
+      from = previous
+      to = station
+    }
+    const segmentX = this.refX[to] - this.refX[from]
+    const segmentY = this.refY[to] - this.refY[from]
+    const lengthSq = segmentX * segmentX + segmentY * segmentY || 1
+    const px = x - this.refX[from]
+    const py = y - this.refY[from]
+    const t = Math.max(0, Math.min(1, (px * segmentX + py * segmentY) / lengthSq))
+    const offset = (px * -segmentY + py * segmentX) / Math.sqrt(lengthSq)
+    return { s: (from + t) * model.step, offset }
+  }
+
+  private mergeLap() {
+    const stations = this.refX.length
+    for (let k = 0; k < stations; k++) {
+      const offset = this.lapOffset[k]
+      if (Number.isNaN(offset)) continue
+      const count = ++this.offsetCount[k]
+      this.offsetMean[k] += (offset - this.offsetMean[k]) / count
+      this.offsetMin[k] = Math.min(this.offsetMin[k], offset)
+      this.offsetMax[k] = Math.max(this.offsetMax[k], offset)
+    }
+  }
+
+  // Centreline = reference + mean offset; width = spread of driven lines
+  private rebuild() {
+    const model = this.model!
+    const stations = this.refX.length
+    for (let k = 0; k < stations; k++) {
+      const mean = this.offsetMean[k]
+      model.x[k] = this.refX[k] + this.normalX[k] * mean
+      model.y[k] = this.refY[k] + this.normalY[k] * mean
+      model.widthLeft[k] = this.offsetMax[k] - mean + CAR_HALF_WIDTH
+      model.widthRight[k] = mean - this.offsetMin[k] + CAR_HALF_WIDTH
+    }
+    deriveGeometry(model.x, model.y, model.step, model.heading, model.curvature)
+    model.startFinish = trackGate(model, 0)
+    model.sectors = model.sectors.map((gate) => trackGate(model, gate.index))
+    model.laps++
+    model.version++
+    this.listeners.forEach((listener) => listener(model))
+  }
+}
+
+// First index in [from, count) whose value is at least `target`, in a sorted array
+function lowerBound(values: Float64Array, count: number, target: number, from: number = 0) {
+  let low = from
+  let high = count
+  while (low < high) {
+    const middle = (low + high) >> 1
+    if (values[middle] < target) low = middle + 1
+    else high = middle
+  }
+  return low
+}
+
+function grow(values: Float64Array) {
+  const grown = new Float64Array(values.length * 2)
+  grown.set(values)
+  return grown
+}
+
+// Walks from `cursor` to the locally nearest station; a negative cursor
+// starts with a full scan
+function nearestStation(x: Float64Array, y: Float64Array, px: number, py: number, cursor: number) {
+  const count = x.length
+  if (cursor < 0) {
+    let best = Infinity
+    for (let i = 0; i < count; i++) {
+      const d = (x[i] - px) ** 2 + (y[i] - py) ** 2
+      if (d < best) {
+        best = d
+        cursor = i
+      }
+    }
+    return cursor
+  }
+
+  let best = (x[cursor] - px) ** 2 + (y[cursor] - py) ** 2
+  for (let direction = 1; direction >= -1; direction -= 2) {
+    for (;;) {
+      const next = (cursor + direction + count) % count
+      const d = (x[next] - px) ** 2 + (y[next] - py) ** 2
+      if (d >= best) break
+      best = d
+      cursor = next
+    }
+  }
+  return cursor
+}
+
+// Heading from a lightly smoothed copy of the line; curvature as the change
+// in heading across ±CURVATURE_SPAN
+function deriveGeometry(
+  x: Float64Array,
+  y: Float64Array,
+  step: number,
+  heading: Float32Array,
+  curvature: Float32Array
+) {
+  const count = x.length
+  const smooth = Math.max(1, Math.round(SMOOTHING_SPAN / step))
+  const span = Math.max(1, Math.round(CURVATURE_SPAN / step))
+  const smoothX = circularMean(x, smooth)
+  const smoothY = circularMean(y, smooth)
+  for (let i = 0; i < count; i++) {
+    const next = (i + 1) % count
+    const previous = (i + count - 1) % count
+    heading[i] = Math.atan2(smoothY[next] - smoothY[previous], smoothX[next] - smoothX[previous])
+  }
+  for (let i = 0; i < count; i++) {
+    let turn = heading[(i + span) % count] - heading[(i - span + count) % count]
+    turn -= Math.round(turn / (2 * Math.PI)) * 2 * Math.PI
+    curvature[i] = turn / (2 * span * step)
+  }
+}
+
+function circularMean(values: Float64Array, halfWidth: number) {
+  const count = values.length
+  const out = new Float64Array(count)
+  let sum = 0
+  for (let k = -halfWidth; k <= halfWidth; k++) sum += values[(k + count) % count]
+  for (let i = 0; i < count; i++) {
+    out[i] = sum / (2 * halfWidth + 1)
+    sum += values[(i + halfWidth + 1) % count] - values[(i - halfWidth + count) % count]
+  }
+  return out
+}
+
+// Middle of the longest straight, where start/finish lines usually are
+function findStraightMiddle(curvature: Float32Array) {
+  const count = curvature.length
+  let bestStart = 0
+  let bestLength = 0
+  let runStart = -1
+  // Two passes so a straight across index 0 is measured whole
+  for (let i = 0; i < 2 * count; i++) {
+    const straight = Math.abs(curvature[i % count]) < STRAIGHT_CURVATURE
+    if (straight && runStart < 0) runStart = i
+    if ((!straight || i === 2 * count - 1) && runStart >= 0) {
+      const length = Math.min(i - runStart, count)
+      if (length > bestLength) {
+        bestLength = length
+        bestStart = runStart
+      }
+      runStart = -1
+    }
+  }
+  return (bestStart + Math.floor(bestLength / 2)) % count
+}
+
+// Straightest station within a twelfth of a lap of `target`, so sector
+// gates avoid corners
+function findStraightNear(curvature: Float32Array, target: number) {
+  const count = curvature.length
+  const reach = Math.floor(count / 12)
+  let best = target
+  for (let k = target - reach; k <= target + reach; k++) {
+    const i = ((k % count) + count) % count
+    if (Math.abs(curvature[i]) < Math.abs(curvature[best])) best = i
+  }
+  return best
+}
+
+function rotate<T extends Float64Array | Float32Array>(values: T, start: number): T {
+  const out = values.slice() as T
+  out.set(values.subarray(start))
+  out.set(values.subarray(0, start), values.length - start)
+  return out
+}
@@ -0,0 +1,225 @@
+// "Where am I on the track": projects positions onto the centreline of a
+// TrackModel as arc length and lateral offset. A uniform grid over the
+// centreline segments answers cold queries; a TrackCursor follows the car
+// from segment to segment, so live projection is amortized O(1) per sample.
+
+import type { TrackModel } from './track'
+
+export interface TrackPosition {
+  // Arc length from the start/finish line, metres
+  s: number
+  // Signed distance from the centreline, positive left
+  offset: number
+  // Segment from station `segment` to the next one
+  segment: number
+}
+
+// Metres per grid cell; a few times the station step keeps cells small
+const DEFAULT_CELL_SIZE = 20
+// Past the edges by this much (metres) a cursor result is doubted and
+// checked against the grid, e.g. after a GPS jump
+const OFF_TRACK_MARGIN = 10
+// Longest walk (in segments) a cursor takes before asking the grid instead
+const MAX_WALK = 64
+
+export class TrackIndex {
+  readonly model: TrackModel
+  readonly cellSize: number
+  private readonly minX: number
+  private readonly minY: number
+  private readonly columns: number
+  private readonly rows: number
+  // Segments per cell in compressed rows: cell c owns
+  // cellSegments[cellStart[c] .. cellStart[c + 1])
+  private readonly cellStart: Uint32Array
+  private readonly cellSegments: Uint32Array
+  // Scratch result of the last segment test
+  private t = 0
+  private cross = 0
+
+  constructor(model: TrackModel, cellSize: number = DEFAULT_CELL_SIZE) {
+    this.model = model
+    this.cellSize = cellSize
+    const { x, y } = model
+    const count = x.length
+
+    let minX = Infinity
+    let minY = Infinity
+    let maxX = -Infinity
+    let maxY = -Infinity
+    for (let i = 0; i < count; i++) {
+      minX = Math.min(minX, x[i])
+      minY = Math.min(minY, y[i])
+      maxX = Math.max(maxX, x[i])
+      maxY = Math.max(maxY, y[i])
+    }
+    this.minX = minX
+    this.minY = minY
+    this.columns = Math.floor((maxX - minX) / cellSize) + 1
+    this.rows = Math.floor((maxY - minY) / cellSize) + 1
+
+    // Two passes over every segment's bounding box: count, then fill
+    const cells = this.columns * this.rows
+    const cellStart = new Uint32Array(cells + 1)
+    const forEachCell = (segment: number, visit: (cell: number) => void) => {
+      const next = (segment + 1) % count
+      const c0 = this.column(Math.min(x[segment], x[next]))
+      const c1 = this.column(Math.max(x[segment], x[next]))
+      const r0 = this.row(Math.min(y[segment], y[next]))
+      const r1 = this.row(Math.max(y[segment], y[next]))
+      for (let r = r0; r <= r1; r++) {
+        for (let c = c0; c <= c1; c++) visit(r * this.columns + c)
+      }
+    }
+    for (let segment = 0; segment < count; segment++) {
+      forEachCell(segment, (cell) => cellStart[cell + 1]++)
+    }
+    for (let cell = 0; cell < cells; cell++) cellStart[cell + 1] += cellStart[cell]
+    const fill = cellStart.slice(0, cells)
+    const cellSegments = new Uint32Array(cellStart[cells])
+    for (let segment = 0; segment < count; segment++) {
+      forEachCell(segment, (cell) => (cellSegments[fill[cell]++] = segment))
+    }
+    this.cellStart = cellStart
+    this.cellSegments = cellSegments
+  }
+
+  // Nearest point on the whole centreline, searching outwards ring by ring
+  // until no unvisited cell can hold anything closer
+  locate(x: number, y: number, out: TrackPosition = { s: 0, offset: 0, segment: 0 }) {
+    const column = Math.floor((x - this.minX) / this.cellSize)
+    const row = Math.floor((y - this.minY) / this.cellSize)
+    if (column < 0 || row < 0 || column >= this.columns || row >= this.rows) {
+      return this.scan(x, y, out)
+    }
+
+    let best = Infinity
+    let bestSegment = 0
+    const maxRing = Math.max(this.columns, this.rows)
+    for (let ring = 0; ring <= maxRing; ring++) {
+      for (let r = row - ring; r <= row + ring; r++) {
+        if (r < 0 || r >= this.rows) continue
+        const edge = r === row - ring || r === row + ring
+        for (let c = column - ring; c <= column + ring; c += edge ? 1 : 2 * ring) {
+          if (c >= 0 && c < this.columns) {
+            const cell = r * this.columns + c
+            for (let k = this.cellStart[cell]; k < this.cellStart[cell + 1]; k++) {
+              const segment = this.cellSegments[k]
+              const distance = this.segmentDistanceSq(segment, x, y)
+              if (distance < best) {
+                best = distance
+                bestSegment = segment
+              }
+            }
+          }
+        }
+      }
+      const reach = ring * this.cellSize
+      if (best <= reach * reach) break
+    }
+    return this.resolve(bestSegment, x, y, out)
+  }
+
+  // Squared distance from a point to segment i; leaves t and cross behind
+  segmentDistanceSq(segment: number, x: number, y: number) {
+    const stationX = this.model.x
+    const stationY = this.model.y
+    const next = segment + 1 === stationX.length ? 0 : segment + 1
+    const dx = stationX[next] - stationX[segment]
+    const dy = stationY[next] - stationY[segment]
+    const px = x - stationX[segment]
+    const py = y - stationY[segment]
+    const lengthSq = dx * dx + dy * dy
+    const t = lengthSq > 0 ? Math.max(0, Math.min(1, (px * dx + py * dy) / lengthSq)) : 0
+    this.t = t
+    this.cross = lengthSq > 0 ? (dx * py - dy * px) / Math.sqrt(lengthSq) : 0
+    const ex = px - t * dx
+    const ey = py - t * dy
+    return ex * ex + ey * ey
+  }
+
+  // Fills `out` from segment i for a point
+  resolve(segment: number, x: number, y: number, out: TrackPosition) {
+    this.segmentDistanceSq(segment, x, y)
+    out.s = (segment + this.t) * this.model.step
+    out.offset = this.cross
+    out.segment = segment
+    return out
+  }
+
+  // Half-width of the track at a segment plus the off-track margin
+  plausibleOffset(segment: number) {
+    const { widthLeft, widthRight } = this.model
+    return Math.max(widthLeft[segment], widthRight[segment]) + OFF_TRACK_MARGIN
+  }
+
+  // Brute force, for points outside the grid
+  private scan(x: number, y: number, out: TrackPosition) {
+    let best = Infinity
+    let bestSegment = 0
+    for (let segment = 0; segment < this.model.x.length; segment++) {
+      const distance = this.segmentDistanceSq(segment, x, y)
+      if (distance < best) {
+        best = distance
+        bestSegment = segment
+      }
+    }
+    return this.resolve(bestSegment, x, y, out)
+  }
+
+  private column(x: number) {
+    return Math.min(this.columns - 1, Math.max(0, Math.floor((x - this.minX) / this.cellSize)))
+  }
+
+  private row(y: number) {
+    return Math.min(this.rows - 1, Math.max(0, Math.floor((y - this.minY) / this.cellSize)))
+  }
+}
+
+// Follows one car around the track. Each update starts from the previous
+// segment and walks to the locally nearest one, which between samples is
+// usually zero or one step; the grid is only consulted on the first sample
+// and when the walk ends somewhere implausible. Walking also keeps the
+// position on the right piece of track where two parts of it run close.
+export class TrackCursor {
+  readonly position: TrackPosition = { s: 0, offset: 0, segment: -1 }
+  // Grid lookups so far, for diagnostics
+  coldStarts = 0
+
+  constructor(readonly index: TrackIndex) {}
+
+  reset() {
+    this.position.segment = -1
+  }
+
+  update(x: number, y: number): TrackPosition {
+    const index = this.index
+    const position = this.position
+    if (position.segment < 0) {
+      this.coldStarts++
+      return index.locate(x, y, position)
+    }
+
+    const count = index.model.x.length
+    let segment = position.segment
+    let best = index.segmentDistanceSq(segment, x, y)
+    let walked = 0
+    for (let direction = 1; direction >= -1; direction -= 2) {
+      while (walked < MAX_WALK) {
+        const next = (segment + direction + count) % count
+        const distance = index.segmentDistanceSq(next, x, y)
+        if (distance >= best) break
+        best = distance
+        segment = next
+        walked++
+      }
+    }
+
+    const limit = index.plausibleOffset(segment)
+    if (walked >= MAX_WALK || best > limit * limit) {
+      this.coldStarts++
+      return index.locate(x, y, position)
+    }
+    return index.resolve(segment, x, y, position)
+  }
+}
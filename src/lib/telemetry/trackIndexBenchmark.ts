@@ -0,0 +1,139 @@
+import { BenchEnvironment, benchEnvironment } from '@/lib/bench/results'
+import { SampleSummary, summarize } from '@/lib/bench/stats'
+import {
+  SyntheticSession,
+  syntheticCircuits,
+  syntheticTrackModel,
+} from '@/lib/bench/syntheticSession'
+import { TrackCursor, TrackIndex, TrackPosition } from './trackIndex'
+
+export type TrackIndexBenchmarkMode = 'cursor' | 'grid' | 'scan'
+
+export interface TrackIndexBenchmarkResult {
+  mode: TrackIndexBenchmarkMode
+  queries: number
+  queriesPerSecond: number
+  // Mean cost of one query, per one-second (1 kHz) block of queries
+  nsPerQuery: SampleSummary
+  // Queries answered by the grid instead of the cursor's walk
+  coldStarts: number
+  // Queries whose arc length differs from the brute-force answer by over a metre
+  mismatches: number
+}
+
+export interface TrackIndexBenchmarkReport {
+  environment: BenchEnvironment
+  trackLength: number
+  segments: number
+  queryRate: number
+  seconds: number
+  results: TrackIndexBenchmarkResult[]
+}
+
+interface TrackIndexBenchmarkOptions {
+  seconds?: number
+  modes?: TrackIndexBenchmarkMode[]
+}
+
+// A 5 km circuit with the club circuit's character
+const circuit = { ...syntheticCircuits[1], name: 'club-5km', length: 5000 }
+
+// Brute force over every segment is O(track length), so it only runs long
+// enough to give a baseline
+const SCAN_SECONDS = 20
+
+// Projects a 1 kHz stream of positions from laps of a 5 km circuit, timing
+// the warm-start cursor against cold grid lookups and a brute-force scan
+export async function runTrackIndexBenchmark({
+  seconds = 300,
+  modes = ['cursor', 'grid', 'scan'],
+}: TrackIndexBenchmarkOptions = {}): Promise<TrackIndexBenchmarkReport> {
+  const session = new SyntheticSession(circuit)
+  const model = syntheticTrackModel(session.track)
+  const index = new TrackIndex(model)
+  const rate = session.imuRate
+  const segments = model.x.length
+  const results: TrackIndexBenchmarkResult[] = []
+
+  // Positions are generated once so every mode answers the same queries
+  const east = new Float64Array(seconds * rate)
+  const north = new Float64Array(seconds * rate)
+  for (let chunk = 0; chunk < seconds; chunk++) {
+    const { truth } = session.next()
+    east.set(truth.east, chunk * rate)
+    north.set(truth.north, chunk * rate)
+  }
+
+  const reference = new Float64Array(SCAN_SECONDS * rate)
+  const position: TrackPosition = { s: 0, offset: 0, segment: 0 }
+  for (let i = 0; i < reference.length; i++) {
+    let best = Infinity
+    for (let segment = 0; segment < segments; segment++) {
+      const distance = index.segmentDistanceSq(segment, east[i], north[i])
+      if (distance < best) {
+        best = distance
+        position.segment = segment
+      }
+    }
+    reference[i] = index.resolve(position.segment, east[i], north[i], position).s
+  }
+
+  for (const mode of modes) {
+    const blocks = mode === 'scan' ? Math.min(seconds, SCAN_SECONDS) : seconds
+    const blockNs = new Float64Array(blocks)
+    const cursor = new TrackCursor(index)
+    const s = new Float64Array(blocks * rate)
+
+    await new Promise((resolve) => setTimeout(resolve, 50))
+    for (let block = 0; block < blocks; block++) {
+      const first = block * rate
+      const start = performance.now()
+      for (let i = first; i < first + rate; i++) {
+        if (mode === 'cursor') {
+          s[i] = cursor.update(east[i], north[i]).s
+        } else if (mode === 'grid') {
+          s[i] = index.locate(east[i], north[i], position).s
+        } else {
+          let best = Infinity
+          let nearest = 0
+          for (let segment = 0; segment < segments; segment++) {
+            const distance = index.segmentDistanceSq(segment, east[i], north[i])
+            if (distance < best) {
+              best = distance
+              nearest = segment
+            }
+          }
+          s[i] = index.resolve(nearest, east[i], north[i], position).s
+        }
+      }
+      blockNs[block] = ((performance.now() - start) * 1e6) / rate
+    }
+
+    let mismatches = 0
+    for (let i = 0; i < Math.min(s.length, reference.length); i++) {
+      let difference = Math.abs(s[i] - reference[i])
+      difference = Math.min(difference, model.length - difference)
+      if (difference > 1) mismatches++
+    }
+    let totalNs = 0
+    for (let block = 0; block < blocks; block++) totalNs += blockNs[block] * rate
+
+    results.push({
+      mode,
+      queries: blocks * rate,
+      queriesPerSecond: Math.round((blocks * rate) / (totalNs / 1e9)),
+      nsPerQuery: summarize(blockNs, blocks),
+      coldStarts: mode === 'cursor' ? cursor.coldStarts : blocks * rate,
+      mismatches,
+    })
+  }
+
+  return {
+    environment: benchEnvironment(),
+    trackLength: model.length,
+    segments,
+    queryRate: rate,
+    seconds,
+    results,
+  }
+}
@@ -0,0 +1,225 @@
+// Quasi-steady-state speed profile: the fastest speed at every station that
+// the grip envelope allows. Corner limits come from curvature and lateral
+// grip; a forward pass applies the acceleration left over inside the
+// friction ellipse and a backward pass does the same for braking.
+
+import type { GripEnvelope } from './envelope'
+import type { TrackModel } from './track'
+
+export interface VelocityProfileOptions {
+  // Straight-line speed cap, m/s
+  topSpeed?: number
+}
+
+const DEFAULT_TOP_SPEED = 90
+// Curvature below this (1/m) counts as straight
+const MIN_CURVATURE = 1e-6
+
+export class VelocityProfile {
+  readonly model: TrackModel
+  readonly envelope: GripEnvelope
+  readonly topSpeed: number
+  // m/s per station: corner limit, after each pass, and the result
+  readonly limit: Float64Array
+  readonly forward: Float64Array
+  readonly backward: Float64Array
+  readonly speed: Float64Array
+  // Seconds from station i to the next
+  readonly segmentTime: Float64Array
+  lapTime = 0
+  // Stations the last solve recomputed, for diagnostics
+  touched = 0
+
+  // First station and station count of every zone, for incremental solves;
+  // a zone may run across the start/finish line
+  private readonly zoneFirst: Int32Array
+  private readonly zoneSpan: Int32Array
+  // Envelope axes the current profile was solved with
+  private readonly solvedBraking: Float32Array
+  private readonly solvedAcceleration: Float32Array
+  private readonly solvedLateral: Float32Array
+
+  constructor(model: TrackModel, envelope: GripEnvelope, options: VelocityProfileOptions = {}) {
+    this.model = model
+    this.envelope = envelope
+    this.topSpeed = options.topSpeed ?? DEFAULT_TOP_SPEED
+    const count = model.x.length
+    this.limit = new Float64Array(count)
+    this.forward = new Float64Array(count)
+    this.backward = new Float64Array(count)
+    this.speed = new Float64Array(count)
+    this.segmentTime = new Float64Array(count)
+
+    const zones = envelope.zones
+    this.zoneFirst = new Int32Array(zones.count).fill(-1)
+    this.zoneSpan = new Int32Array(zones.count)
+    for (let i = 0; i < count; i++) {
+      const zone = zones.zoneOf[i]
+      const previous = zones.zoneOf[i === 0 ? count - 1 : i - 1]
+      if (zone !== previous || (i === 0 && this.zoneFirst[zone] < 0)) this.zoneFirst[zone] = i
+      this.zoneSpan[zone]++
+    }
+    this.solvedBraking = new Float32Array(zones.count)
+    this.solvedAcceleration = new Float32Array(zones.count)
+    this.solvedLateral = new Float32Array(zones.count)
+    this.solve()
+  }
+
+  // Full solve. Both passes start at the slowest corner limit, which no
+  // acceleration or braking constraint can lower, so one lap of each is exact.
+  solve() {
+    const count = this.limit.length
+    this.rememberEnvelope()
+    let slowest = 0
+    for (let i = 0; i < count; i++) {
+      this.limit[i] = this.cornerLimit(i)
+      if (this.limit[i] < this.limit[slowest]) slowest = i
+    }
+
+    this.forward[slowest] = this.limit[slowest]
+    for (let k = 1; k < count; k++) {
+      const i = (slowest + k) % count
+      this.forward[i] = this.forwardStep(i)
+    }
+    this.backward[slowest] = this.limit[slowest]
+    for (let k = 1; k < count; k++) {
+      const i = (slowest - k + count) % count
+      this.backward[i] = this.backwardStep(i)
+    }
+
+    let lapTime = 0
+    for (let i = 0; i < count; i++) {
+      this.speed[i] = Math.min(this.forward[i], this.backward[i])
+    }
+    for (let i = 0; i < count; i++) {
+      this.segmentTime[i] = this.timeFrom(i)
+      lapTime += this.segmentTime[i]
+    }
+    this.lapTime = lapTime
+    this.touched = count
+    return lapTime
+  }
+
+  // Re-solves every zone whose envelope axes moved since the last solve,
+  // e.g. after GripEnvelope.addLap
+  update() {
+    const { braking, acceleration, lateral } = this.envelope
+    let touched = 0
+    for (let zone = 0; zone < this.zoneFirst.length; zone++) {
+      if (
+        braking[zone] !== this.solvedBraking[zone] ||
+        acceleration[zone] !== this.solvedAcceleration[zone] ||
+        lateral[zone] !== this.solvedLateral[zone]
+      ) {
+        this.solveZone(zone)
+        touched += this.touched
+      }
+    }
+    this.touched = touched
+    return this.lapTime
+  }
+
+  // Incremental solve after one zone's envelope changed. Each pass restarts
+  // at the zone and runs on until it reproduces the previous profile, which
+  // is usually the next slow corner either side rather than the whole lap.
+  solveZone(zone: number) {
+    const first = this.zoneFirst[zone]
+    const span = this.zoneSpan[zone] - 1
+    if (first < 0) return this.lapTime
+    const count = this.limit.length
+    this.solvedBraking[zone] = this.envelope.braking[zone]
+    this.solvedAcceleration[zone] = this.envelope.acceleration[zone]
+    this.solvedLateral[zone] = this.envelope.lateral[zone]
+    for (let k = 0; k <= span; k++) {
+      const i = (first + k) % count
+      this.limit[i] = this.cornerLimit(i)
+    }
+
+    // The profile is the unique fixed point of either pass, so relaxing from
+    // the old one converges whether the zone got faster or slower; the
+    // guard only bounds the work
+    const last = first + span
+    let ahead = 0
+    for (; ahead < 2 * count; ahead++) {
+      const i = (first + ahead) % count
+      const next = this.forwardStep(i)
+      if (next === this.forward[i] && ahead > span) break
+      this.forward[i] = next
+    }
+    let behind = 0
+    for (; behind < 2 * count; behind++) {
+      const i = (last - behind + 2 * count) % count
+      const next = this.backwardStep(i)
+      if (next === this.backward[i] && behind > span) break
+      this.backward[i] = next
+    }
+
+    // Changes are confined to the stations either pass visited
+    const from = last - behind + 1
+    const to = first + ahead
+    if (to - from >= count) return this.solve()
+    for (let k = from; k < to; k++) {
+      const i = (k + 2 * count) % count
+      this.speed[i] = Math.min(this.forward[i], this.backward[i])
+    }
+    let lapTime = this.lapTime
+    for (let k = from - 1; k < to; k++) {
+      const i = (k + 2 * count) % count
+      const time = this.timeFrom(i)
+      lapTime += time - this.segmentTime[i]
+      this.segmentTime[i] = time
+    }
+    this.lapTime = lapTime
+    this.touched = to - from
+    return lapTime
+  }
+
+  private cornerLimit(i: number) {
+    const curvature = Math.abs(this.model.curvature[i])
+    if (curvature < MIN_CURVATURE) return this.topSpeed
+    const lateral = this.envelope.lateral[this.envelope.zones.zoneOf[i]]
+    return Math.min(this.topSpeed, Math.sqrt(lateral / curvature))
+  }
+
+  // Speed at i reachable from i - 1 with the acceleration the ellipse leaves
+  // after cornering there
+  private forwardStep(i: number) {
+    const count = this.limit.length
+    const previous = i === 0 ? count - 1 : i - 1
+    const v = this.forward[previous]
+    const zone = this.envelope.zones.zoneOf[previous]
+    const available =
+      this.envelope.acceleration[zone] * this.remainingGrip(previous, zone, v)
+    const reach = Math.sqrt(v * v + 2 * available * this.model.step)
+    return Math.min(this.limit[i], reach)
+  }
+
+  // Speed at i from which the car can still brake to the speed at i + 1
+  private backwardStep(i: number) {
+    const count = this.limit.length
+    const next = i === count - 1 ? 0 : i + 1
+    const v = this.backward[next]
+    const zone = this.envelope.zones.zoneOf[next]
+    const available = this.envelope.braking[zone] * this.remainingGrip(next, zone, v)
+    const reach = Math.sqrt(v * v + 2 * available * this.model.step)
+    return Math.min(this.limit[i], reach)
+  }
+
+  // Share of the longitudinal axis left once cornering at v takes its part
+  private remainingGrip(i: number, zone: number, v: number) {
+    const lateral = (v * v * Math.abs(this.model.curvature[i])) / this.envelope.lateral[zone]
+    return lateral >= 1 ? 0 : Math.sqrt(1 - lateral * lateral)
+  }
+
+  private timeFrom(i: number) {
+    const next = i === this.speed.length - 1 ? 0 : i + 1
+    const average = (this.speed[i] + this.speed[next]) / 2
+    return average > 0 ? this.model.step / average : 0
+  }
+
+  private rememberEnvelope() {
+    this.solvedBraking.set(this.envelope.braking)
+    this.solvedAcceleration.set(this.envelope.acceleration)
+    this.solvedLateral.set(this.envelope.lateral)
+  }
+}